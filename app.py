@@ -1,23 +1,39 @@
-from agno.agent import Agent
-from agno.models.groq import Groq
-from agno.media import Image as AgnoImage
-from agno.tools.duckduckgo import DuckDuckGoTools
 import streamlit as st
+import streamlit.components.v1 as components
 from typing import List, Optional
 import logging
-from pathlib import Path
-import tempfile
 import os
 from datetime import datetime, timedelta
 import json
 import random
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-import base64
+import re
+import time
+from heartmend.assets import APP_CSS, CRISIS_BOX_HTML, FOOTER_HTML, HEADER_HTML, PLAYLIST_MARKDOWN, QUOTE_HTML
+from heartmend.chat import new_message, turn_metrics
+from heartmend.chat_queue import CHAT, CRISIS, get_chat_queue
+from heartmend.chat_view import DEFAULT_PAGE_SIZE, ai_message_html, history_markdown, message_html, page_count, user_message_html
+from heartmend.core import (
+    AGENT_DESCRIPTIONS, AUTO_MODEL, CHAT_WINDOW, DEFAULT_MODEL, MOOD_SCALE, MOOD_WINDOW, VISION_MODEL,
+    add_mood_entry as record_mood, cancel_prefetch, clear_conversation, follow_up_suggestions, get_export, get_mood_emoji,
+    load_agents, mood_summary, new_memory, recall_turns, router, screen_message, send_message, start_export, to_agno_images,
+    usage_ledger
+)
+from heartmend.fake_backend import is_fake_model
+from heartmend.images import IMAGE_FORMAT, prepare_images
+from heartmend.panel import Panel
+from heartmend.prefetch import get_prefetcher
+from heartmend.records import ChatRecord, MoodRecord, chat_log, mood_log
+from heartmend.resilience import UpstreamUnavailable, get_guard, metrics as resilience_metrics
+from heartmend.response_cache import get_response_cache
+from heartmend.routing import classify
+from heartmend.search_cache import get_search_cache
+from heartmend.storage import get_store, new_message_id
+from heartmend.streaming import format_stats
+from heartmend.tracing import span, tracer
+from heartmend.usage import local_day
+
+# Timed from here to the end of the script for the admin panel
+script_started = time.perf_counter()
 
 # Configure logging
 logging.basicConfig(level=logging.ERROR)
@@ -26,248 +42,69 @@ logger = logging.getLogger(__name__)
 # Get API key from environment variable or session state
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 
-# Initialize session state
-if "session_history" not in st.session_state:
-    st.session_state.session_history = []
+# Opt-in sidebar panel with per-stage latency percentiles
+ADMIN_PANEL = os.getenv("HEARTMEND_ADMIN", "").lower() in ("1", "true", "yes")
+
+# Seconds between redraws of a reply being answered on the chat queue
+POLL_INTERVAL = 0.25
+
+# Cookie holding the anonymous user id, and the shape of ids we hand out
+USER_COOKIE = "heartmend_uid"
+USER_COOKIE_MAX_AGE = 365 * 86400
+USER_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Anonymous per-browser identity, kept in a cookie so history survives reloads
+# without the id showing up in shared links, screenshots or browser history
+if "user_id" not in st.session_state:
+    cookie = st.context.cookies.get(USER_COOKIE)
+    # Not a string outside a real browser session, e.g. under AppTest
+    user_id = cookie if isinstance(cookie, str) else ""
+    link_id = st.query_params.get("uid")
+    if link_id is not None:
+        # Links from before the cookie: the first browser to open one keeps
+        # its history, later ones start fresh, and the id leaves the URL
+        del st.query_params["uid"]
+        if not USER_ID_PATTERN.fullmatch(user_id) and USER_ID_PATTERN.fullmatch(link_id) and get_store().claim_link(link_id):
+            user_id = link_id
+    if not USER_ID_PATTERN.fullmatch(user_id):
+        user_id = new_message_id()
+    if user_id != cookie:
+        components.html(
+            f"<script>parent.document.cookie = '{USER_COOKIE}={user_id}; path=/; max-age={USER_COOKIE_MAX_AGE}; SameSite=Strict';</script>",
+            height=0,
+        )
+    st.session_state.user_id = user_id
+
+# Initialize session state (loaded lazily from the store once per session, kept as compact capped logs)
 if "mood_tracker" not in st.session_state:
-    st.session_state.mood_tracker = []
+    st.session_state.mood_tracker = mood_log(get_store().recent_moods(st.session_state.user_id, MOOD_WINDOW), MOOD_WINDOW)
 if "recovery_day" not in st.session_state:
-    st.session_state.recovery_day = 0
+    st.session_state.recovery_day = get_store().get_recovery_day(st.session_state.user_id)
 if "chat_messages" not in st.session_state:
-    st.session_state.chat_messages = []
+    st.session_state.chat_messages = chat_log(get_store().recent_messages(st.session_state.user_id, CHAT_WINDOW), CHAT_WINDOW)
 if "current_agent" not in st.session_state:
     st.session_state.current_agent = "Therapist"
+if "crisis_flagged" not in st.session_state:
+    st.session_state.crisis_flagged = False
+if "chat_visible" not in st.session_state:
+    st.session_state.chat_visible = DEFAULT_PAGE_SIZE
+if "upload_nonce" not in st.session_state:
+    st.session_state.upload_nonce = 0
+if "chat_job" not in st.session_state:
+    st.session_state.chat_job = None
+
+# Days shown in the mood trend chart (None means the whole history)
+TREND_RANGES = {"30 days": 30, "90 days": 90, "1 year": 365, "All": None}
 
-# Inspirational quotes
-RECOVERY_QUOTES = [
-    "Every ending is a new beginning. 🌅",
-    "Healing is not linear, and that's okay. 💝",
-    "The best revenge is becoming your best self. 💪",
-    "This chapter closed so a better one could open. 📖",
-    "You deserve someone who chooses you every day. 🌟",
-    "Pain is temporary, but the lessons are forever. 🦋",
-    "Your value doesn't decrease based on someone's inability to see your worth. 👑"
-]
-
-# Embedded music for playlists
-PLAYLIST_MOODS = {
-    "Sad & Reflective": {
-        "description": "For when you need to feel your emotions and process the pain",
-        "songs": [
-            {
-                "title": "Someone Like You - Adele",
-                "spotify": "https://open.spotify.com/track/1zwMYTA5nlNjZxYrvBB2pV",
-                "youtube": "https://www.youtube.com/watch?v=hLQl3WQQoQ0"
-            },
-            {
-                "title": "The Night We Met - Lord Huron",
-                "spotify": "https://open.spotify.com/track/0NdAHF7HvOGZCeaKuJbK9d",
-                "youtube": "https://www.youtube.com/watch?v=KtlgYxa6BMU"
-            },
-            {
-                "title": "All Too Well - Taylor Swift",
-                "spotify": "https://open.spotify.com/track/5enxwA8aAbwZbf5qCHORXi",
-                "youtube": "https://www.youtube.com/watch?v=tollGa3S0o8"
-            },
-            {
-                "title": "Drivers License - Olivia Rodrigo",
-                "spotify": "https://open.spotify.com/track/7lPN2DXiMsVn7XUKtOW1CS",
-                "youtube": "https://www.youtube.com/watch?v=ZmDBbnmKpqQ"
-            },
-            {
-                "title": "When The Party's Over - Billie Eilish",
-                "spotify": "https://open.spotify.com/track/43zdsphuZLzwA9k4DJhU0I",
-                "youtube": "https://www.youtube.com/watch?v=pbMwTqkKSps"
-            }
-        ]
-    },
-    "Angry & Empowered": {
-        "description": "Channel your anger into empowerment and strength",
-        "songs": [
-            {
-                "title": "Since U Been Gone - Kelly Clarkson",
-                "spotify": "https://open.spotify.com/track/4TQqhwM4XZfEYSRQOGV6oh",
-                "youtube": "https://www.youtube.com/watch?v=R7UrFYvl5TE"
-            },
-            {
-                "title": "Stronger - Kanye West",
-                "spotify": "https://open.spotify.com/track/4fzsfWzRhPawzqhX8Qt9F3",
-                "youtube": "https://www.youtube.com/watch?v=PsO6ZnUZI0g"
-            },
-            {
-                "title": "We Are Never Getting Back Together - Taylor Swift",
-                "spotify": "https://open.spotify.com/track/5YqltLsjdqFtvqE7Nrysvs",
-                "youtube": "https://www.youtube.com/watch?v=WA4iX5D9Z64"
-            },
-            {
-                "title": "Good As Hell - Lizzo",
-                "spotify": "https://open.spotify.com/track/3HVWdVOQ0ZA45FuZGSfvns",
-                "youtube": "https://www.youtube.com/watch?v=SmbmeOgWsqE"
-            },
-            {
-                "title": "Truth Hurts - Lizzo",
-                "spotify": "https://open.spotify.com/track/5qmq61PeM4Y5dSQiYn9l1p",
-                "youtube": "https://www.youtube.com/watch?v=P00HMxdsVZI"
-            }
-        ]
-    },
-    "Healing & Moving On": {
-        "description": "Songs for finding peace and moving forward with confidence",
-        "songs": [
-            {
-                "title": "Flowers - Miley Cyrus",
-                "spotify": "https://open.spotify.com/track/0yLdNVWF3Srea0uzk55zFn",
-                "youtube": "https://www.youtube.com/watch?v=G7KNmW9a75Y"
-            },
-            {
-                "title": "New Rules - Dua Lipa",
-                "spotify": "https://open.spotify.com/track/2ekn2ttSfGqwhhate0LSR0",
-                "youtube": "https://www.youtube.com/watch?v=k2qgadSvNyU"
-            },
-            {
-                "title": "Survivor - Destiny's Child",
-                "spotify": "https://open.spotify.com/track/7M9gKngVEKKoSjQS6OU5Ck",
-                "youtube": "https://www.youtube.com/watch?v=Wmc8bQoL-J0"
-            },
-            {
-                "title": "Unwritten - Natasha Bedingfield",
-                "spotify": "https://open.spotify.com/track/6oSXNfHQgziUwfT7E25tBM",
-                "youtube": "https://www.youtube.com/watch?v=b7k0a5hYnSI"
-            },
-            {
-                "title": "Fight Song - Rachel Platten",
-                "spotify": "https://open.spotify.com/track/5ykquqsGJaAO4uxLfRYPIk",
-                "youtube": "https://www.youtube.com/watch?v=xo1VInw-SKc"
-            }
-        ]
-    },
-    "Self-Love Anthems": {
-        "description": "Celebrate yourself and remember your worth",
-        "songs": [
-            {
-                "title": "Love Myself - Hailee Steinfeld",
-                "spotify": "https://open.spotify.com/track/6DK3kHsJMD3PpFg83dpm5B",
-                "youtube": "https://www.youtube.com/watch?v=bMpFmHSgC4Q"
-            },
-            {
-                "title": "Scars To Your Beautiful - Alessia Cara",
-                "spotify": "https://open.spotify.com/track/0prNGof3XqfTvNDxHonvdK",
-                "youtube": "https://www.youtube.com/watch?v=MWASeaYuHZo"
-            },
-            {
-                "title": "Born This Way - Lady Gaga",
-                "spotify": "https://open.spotify.com/track/0lPQA9gKoZFvdDHLt5a8LF",
-                "youtube": "https://www.youtube.com/watch?v=wV1FrqwZyKw"
-            },
-            {
-                "title": "Confident - Demi Lovato",
-                "spotify": "https://open.spotify.com/track/1Irgqw8mSjHaEbIXi4nAhN",
-                "youtube": "https://www.youtube.com/watch?v=cwKgxxYN-_U"
-            },
-            {
-                "title": "Beautiful - Christina Aguilera",
-                "spotify": "https://open.spotify.com/track/6bxhCLjZ5N1TLJ0aJesPPQ",
-                "youtube": "https://www.youtube.com/watch?v=eAfyFTzZDMM"
-            }
-        ]
-    }
-}
-
-# Available Groq models (Vision models can handle both text and images)
-GROQ_MODELS = {
-    "Llama 4 Maverick (Recommended)": "llama-4-maverick-17b-128e-instruct",
-    "Llama 4 Scout": "llama-4-scout-17b-16e-instruct",
-    "Llama 3.2 90B Vision": "llama-3.2-90b-vision-preview",
-    "Llama 3.2 11B Vision": "llama-3.2-11b-vision-preview",
-    "Qwen 2.5 72B": "qwen-2.5-72b-versatile",
-    "Llama 3.3 70B": "llama-3.3-70b-versatile",
-}
-
-AGENT_DESCRIPTIONS = {
-    "Therapist": {
-        "emoji": "🤗",
-        "name": "Empathetic Therapist",
-        "description": "Validates feelings and provides emotional support"
-    },
-    "Closure": {
-        "emoji": "✍️",
-        "name": "Closure Specialist",
-        "description": "Helps with emotional release and moving forward"
-    },
-    "Coach": {
-        "emoji": "📅",
-        "name": "Recovery Coach",
-        "description": "Creates actionable recovery plans and routines"
-    },
-    "Honest": {
-        "emoji": "💪",
-        "name": "Straight Talker",
-        "description": "Provides direct, honest perspective"
-    }
-}
+
+# Bounded context shared by the companions (window + rolling summary)
+if "conversation_memory" not in st.session_state:
+    st.session_state.conversation_memory = new_memory(st.session_state.chat_messages)
 
 def initialize_agents(api_key: str, model_choice: str) -> dict:
-    """Initialize AI agents with Groq models"""
+    """Initialize AI agents with Groq models (cached per key and model)"""
     try:
-        model = Groq(id=model_choice, api_key=api_key)
-        
-        agents = {
-            "Therapist": Agent(
-                model=model,
-                name="Empathetic Therapist",
-                instructions=[
-                    "You are an empathetic therapist for breakup recovery.",
-                    "Listen with empathy and validate feelings without judgment.",
-                    "Use gentle humor when appropriate to lighten the mood.",
-                    "Share relatable experiences and offer comforting words.",
-                    "Analyze both text and images (if provided) for emotional context.",
-                    "Keep responses conversational, warm, and supportive."
-                ],
-                markdown=True
-            ),
-            "Closure": Agent(
-                model=model,
-                name="Closure Specialist",
-                instructions=[
-                    "You help people find emotional closure after breakups.",
-                    "Create templates for unsent messages to express feelings.",
-                    "Guide users through emotional release exercises.",
-                    "Suggest closure rituals and moving forward strategies.",
-                    "Be heartfelt, authentic, and understanding.",
-                    "Keep responses conversational and actionable."
-                ],
-                markdown=True
-            ),
-            "Coach": Agent(
-                model=model,
-                name="Recovery Coach",
-                instructions=[
-                    "You are a recovery coach focused on practical action.",
-                    "Design daily recovery challenges and self-care routines.",
-                    "Suggest social media detox strategies when needed.",
-                    "Create empowering daily activities and habits.",
-                    "Focus on actionable steps and positive momentum.",
-                    "Keep responses practical, encouraging, and conversational."
-                ],
-                markdown=True
-            ),
-            "Honest": Agent(
-                model=model,
-                name="Straight Talker",
-                tools=[DuckDuckGoTools()],
-                instructions=[
-                    "You provide honest, direct feedback about breakups.",
-                    "Give objective analysis without sugar-coating.",
-                    "Explain what went wrong clearly and factually.",
-                    "Highlight growth opportunities and future potential.",
-                    "Be blunt but constructive, never mean.",
-                    "Keep responses conversational and empowering."
-                ],
-                markdown=True
-            )
-        }
-        
-        return agents
+        return load_agents(api_key, model_choice)
     except Exception as e:
         st.error(f"Error initializing agents: {str(e)}")
         return None
@@ -278,74 +115,87 @@ def process_images_for_groq(files):
     if not files:
         return processed_images
     
-    for file in files:
-        try:
-            image_bytes = file.getvalue()
-            temp_dir = tempfile.gettempdir()
-            temp_path = os.path.join(temp_dir, f"temp_{file.name}")
-            
-            with open(temp_path, "wb") as f:
-                f.write(image_bytes)
-            
-            agno_image = AgnoImage(filepath=Path(temp_path))
-            processed_images.append(agno_image)
-        except Exception as e:
-            logger.error(f"Error processing image {file.name}: {str(e)}")
+    prepared = prepare_images([file.getvalue() for file in files])
+    for file, image_bytes in zip(files, prepared):
+        if image_bytes is None:
+            logger.error(f"Error processing image {file.name}")
             continue
+        processed_images.append(image_bytes)
     
-    return processed_images
-
-def create_pdf_report(chat_history: list, timestamp: str) -> BytesIO:
-    """Generate a PDF report of the conversation"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor='purple',
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    story = []
-    story.append(Paragraph("💔 HeartMend AI Conversation", title_style))
-    story.append(Paragraph(f"Generated on: {timestamp}", styles['Normal']))
-    story.append(Spacer(1, 0.3*inch))
-    
-    for msg in chat_history:
-        role = "You" if msg["role"] == "user" else msg.get("agent", "AI")
-        story.append(Paragraph(f"<b>{role}:</b>", styles['Heading3']))
-        clean_content = msg["content"].replace('**', '').replace('##', '').replace('*', '')
-        story.append(Paragraph(clean_content, styles['BodyText']))
-        story.append(Spacer(1, 0.2*inch))
-    
-    story.append(Spacer(1, 0.3*inch))
-    story.append(Paragraph("Made with ❤️ by HeartMend AI", styles['Normal']))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+    return to_agno_images(processed_images, IMAGE_FORMAT.lower())
 
 def add_mood_entry(mood: str, note: str = ""):
-    entry = {
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "mood": mood,
-        "note": note
-    }
-    st.session_state.mood_tracker.append(entry)
-
-def get_mood_emoji(mood: str) -> str:
-    mood_emojis = {
-        "Great": "😄",
-        "Good": "🙂",
-        "Okay": "😐",
-        "Sad": "😢",
-        "Angry": "😠"
-    }
-    return mood_emojis.get(mood, "😐")
+    entry = record_mood(st.session_state.user_id, mood, note)
+    st.session_state.mood_tracker.append(MoodRecord.from_entry(entry))
+
+def remember_chat_message(message: dict):
+    """Keep a message in the visible chat window (already persisted)"""
+    st.session_state.chat_messages.append(ChatRecord.from_message(message))
+
+def finish_chat_job(job):
+    """Move a finished queued reply into the chat window, keeping any error to show once"""
+    st.session_state.chat_job = None
+    for message in job.messages:
+        remember_chat_message(message)
+    error = None if job.future.cancelled() else job.future.exception()
+    if isinstance(error, UpstreamUnavailable):
+        st.session_state.chat_notice = ("warning", f"⏳ {str(error)}")
+    elif error is not None:
+        st.session_state.chat_notice = ("error", f"Error: {str(error)}")
+
+@st.fragment(run_every=POLL_INTERVAL)
+def show_pending_reply():
+    """Redraw the reply being answered on the chat queue; reruns the app once it's done"""
+    job = st.session_state.chat_job
+    if job is None:
+        return
+    if job.done:
+        finish_chat_job(job)
+        st.rerun()
+    agent_key, user_input = st.session_state.chat_job_meta
+    agent_info = AGENT_DESCRIPTIONS[agent_key]
+    st.markdown(user_message_html(user_input), unsafe_allow_html=True)
+    if job.partial:
+        st.markdown(ai_message_html(agent_key, job.partial, AGENT_DESCRIPTIONS), unsafe_allow_html=True)
+    elif job.started is not None:
+        st.caption(f"{agent_info['emoji']} Responding...")
+    else:
+        st.caption(f"⏳ Waiting for {agent_info['name']}...")
+
+def append_chat_message(role: str, content: str, **fields) -> dict:
+    """Add a message to the visible chat window and persist it"""
+    message = new_message(role, content, **fields)
+    get_store().add_message(st.session_state.user_id, message)
+    remember_chat_message(message)
+    return message
+
+def run_panel_turn(agents: dict, agent_keys: list, user_input: str, images: list, container, model_id: str, guard=None, context_tokens=None) -> bool:
+    """Send one message to several companions at once; return True if all answered"""
+    memory = st.session_state.conversation_memory
+    recalled = recall_turns(st.session_state.user_id, user_input, memory) if context_tokens is None else None
+    prompts = {key: memory.build_prompt(key, user_input, context_tokens, recalled) for key in agent_keys}
+    
+    append_chat_message("user", user_input)
+    with container:
+        st.markdown(user_message_html(user_input), unsafe_allow_html=True)
+        placeholders = {key: st.empty() for key in agent_keys}
+    for key in agent_keys:
+        placeholders[key].markdown(ai_message_html(key, "<i>Thinking...</i>", AGENT_DESCRIPTIONS), unsafe_allow_html=True)
+    
+    memory.add_turn("user", user_input)
+    all_answered = True
+    for panel_reply in Panel(agents, agent_keys, guard=guard).run(prompts, images=images or None):
+        key = panel_reply.agent_key
+        if panel_reply.ok:
+            placeholders[key].markdown(ai_message_html(key, panel_reply.content, AGENT_DESCRIPTIONS), unsafe_allow_html=True)
+            memory.add_turn("assistant", panel_reply.content, key)
+            metrics = turn_metrics(panel_reply.stats, prompts[key], model_id)
+            usage_ledger.record(st.session_state.user_id, key, metrics)
+            append_chat_message("assistant", panel_reply.content, agent=key, metrics=metrics)
+        else:
+            all_answered = False
+            placeholders[key].warning(f"{AGENT_DESCRIPTIONS[key]['emoji']} {AGENT_DESCRIPTIONS[key]['name']} couldn't answer: {panel_reply.error or 'cancelled'}")
+    return all_answered
 
 # Page config
 st.set_page_config(
@@ -355,86 +205,9 @@ st.set_page_config(
 )
 
 # Custom CSS
-st.markdown("""
-    <style>
-    .main-header {
-        text-align: center;
-        padding: 20px;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        border-radius: 10px;
-        color: white;
-        margin-bottom: 30px;
-    }
-    .quote-box {
-        padding: 25px;
-        background: #ffffff;
-        border-left: 5px solid #667eea;
-        border-radius: 5px;
-        margin: 20px 0;
-        font-style: italic;
-        color: #2c3e50;
-        font-size: 18px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .crisis-box {
-        background: linear-gradient(135deg, #ff6b6b 0%, #ee5a6f 100%);
-        color: white;
-        border-radius: 10px;
-        padding: 20px;
-        margin: 15px 0;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-    }
-    .crisis-box h4 {
-        color: white;
-        margin-top: 0;
-        font-size: 18px;
-    }
-    .crisis-box a {
-        color: #fff3cd;
-        text-decoration: underline;
-    }
-    .agent-card {
-        background: #f8f9fa;
-        border: 2px solid #dee2e6;
-        border-radius: 10px;
-        padding: 15px;
-        margin: 10px 0;
-        cursor: pointer;
-        transition: all 0.3s;
-    }
-    .agent-card:hover {
-        border-color: #667eea;
-        box-shadow: 0 4px 8px rgba(102, 126, 234, 0.2);
-    }
-    .agent-card.active {
-        border-color: #667eea;
-        background: #e8eaf6;
-    }
-    .chat-message {
-        padding: 20px;
-        border-radius: 15px;
-        margin: 15px 0;
-        line-height: 1.6;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .user-message {
-        background: #ffffff;
-        border: 2px solid #667eea;
-        margin-left: 15%;
-        color: #2c3e50;
-    }
-    .ai-message {
-        background: #ffffff;
-        border: 2px solid #95a5a6;
-        margin-right: 15%;
-        color: #2c3e50;
-    }
-    .chat-message b {
-        color: #667eea;
-        font-size: 16px;
-    }
-    </style>
-""", unsafe_allow_html=True)
+css_started = time.perf_counter()
+st.markdown(APP_CSS, unsafe_allow_html=True)
+tracer.record("emit_css", time.perf_counter() - css_started)
 
 # Sidebar
 with st.sidebar:
@@ -457,10 +230,36 @@ with st.sidebar:
                 st.warning("⚠️ Please enter your API key")
                 st.info("👉 [Get API Key](https://console.groq.com)")
 
-        # 🔒 Force the LLama 3.3 70B model
-        selected_model_name = "llama-3.3-70b-versatile"
+        # Routed per message unless HEARTMEND_MODEL pins one (fake runs offline)
+        selected_model_name = DEFAULT_MODEL
         selected_model = selected_model_name
-        st.info(f"Model locked to **{selected_model_name}**")
+        if selected_model == AUTO_MODEL:
+            st.info("Model picked per message by speed, load and whether images are attached")
+        else:
+            st.info(f"Model locked to **{selected_model_name}**")
+
+    st.toggle(
+        "⚡ Stream replies",
+        value=True,
+        key="stream_replies",
+        help="Show replies as they are generated instead of waiting for the full answer"
+    )
+
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        cache_stats = response_cache.stats()
+        st.caption(
+            f"♻️ Reply cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries"
+        )
+
+    budget_plan = usage_ledger.plan(st.session_state.user_id, selected_model)
+    if budget_plan.budget:
+        st.caption(f"🪙 Tokens today: {budget_plan.used:,} / {budget_plan.budget:,}")
+        if budget_plan.level == "reduced":
+            st.info("Nearing today's token budget: replies use a shorter conversation context.")
+        elif budget_plan.level == "minimal":
+            st.info("Today's token budget is used up: replies come from a smaller model with minimal context.")
 
     st.markdown("---")
 
@@ -473,40 +272,73 @@ with st.sidebar:
     with col2:
         if st.button("➕", use_container_width=True):
             st.session_state.recovery_day += 1
+            get_store().set_recovery_day(st.session_state.user_id, st.session_state.recovery_day)
             st.rerun()
     
     # Mood Tracker
     if st.session_state.mood_tracker:
         st.subheader("Recent Moods")
         for entry in st.session_state.mood_tracker[-3:]:
-            st.caption(f"{get_mood_emoji(entry['mood'])} {entry['date'].split()[0]}")
+            st.caption(f"{get_mood_emoji(entry['mood'])} {entry['date'][:10]}")
     
     st.markdown("---")
     
     # Crisis Resources - Better Design
-    st.markdown("""
-        <div class="crisis-box">
-            <h4>🆘 In Crisis? Get Help Now</h4>
-            <p style="margin: 10px 0;"><b>🇺🇸 US Crisis Line:</b><br>Call/Text <b>988</b></p>
-            <p style="margin: 10px 0;"><b>💬 Crisis Text Line:</b><br>Text <b>HOME</b> to <b>741741</b></p>
-            <p style="margin: 10px 0;"><b>🌍 International:</b><br><a href="https://findahelpline.com" target="_blank">findahelpline.com</a></p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(CRISIS_BOX_HTML, unsafe_allow_html=True)
+    
+    if ADMIN_PANEL:
+        with st.expander("🛠️ Performance", expanded=False):
+            stage_rows = tracer.snapshot()
+            if stage_rows:
+                st.dataframe(stage_rows, hide_index=True, use_container_width=True)
+            else:
+                st.caption("No timings recorded yet.")
+            upstream = resilience_metrics.snapshot()
+            st.caption(
+                f"Queue wait p50/p95: {upstream['queue_wait_seconds_p50'] * 1000:.0f}/"
+                f"{upstream['queue_wait_seconds_p95'] * 1000:.0f} ms · retries {upstream['retries_total']} · "
+                f"rate limited {upstream['rejected_rate_limited_total']} · circuit open {upstream['rejected_circuit_open_total']}"
+            )
+            search_stats = get_search_cache().stats()
+            st.caption(
+                f"🔎 Search cache: {search_stats['hit_rate']:.0%} hit rate "
+                f"({search_stats['memory_hits'] + search_stats['disk_hits']} cached, {search_stats['shared']} shared, "
+                f"{search_stats['misses']} fetched), {search_stats['saved_seconds']:.1f}s saved"
+            )
+            if selected_model == AUTO_MODEL:
+                st.caption("🔀 Model routing")
+                st.dataframe(router.snapshot(), hide_index=True, use_container_width=True)
+            queue_stats = get_chat_queue().stats()
+            st.caption(
+                f"📨 Chat queue: {queue_stats['depth']} waiting (oldest {queue_stats['oldest_wait_seconds']:.1f}s), "
+                f"{queue_stats['running']}/{queue_stats['workers']} workers busy, {queue_stats['rejected']} turned away"
+            )
+            chat_messages = st.session_state.chat_messages
+            st.caption(
+                f"🧠 This session keeps {len(chat_messages)} messages in memory (~{chat_messages.bytes / 1024:.0f} KB); "
+                f"{chat_messages.evicted} older ones are read back from the store"
+            )
+            prefetcher = get_prefetcher()
+            if prefetcher is not None:
+                prefetch_stats = prefetcher.stats()
+                st.caption(
+                    f"🔮 Prefetch: {prefetch_stats['hit_rate']:.0%} hit rate ({prefetch_stats['hits']} used, "
+                    f"{prefetch_stats['wasted']} wasted, {prefetch_stats['running']} running), "
+                    f"{prefetch_stats['saved_seconds']:.1f}s saved, {prefetch_stats['wasted_tokens']:,} tokens wasted"
+                )
+            usage_rows = get_store().usage_totals(since_day=local_day(time.time()), group_by="agent")
+            if usage_rows:
+                st.caption("🪙 Token usage today, all sessions")
+                st.dataframe(usage_rows, hide_index=True, use_container_width=True)
+            if st.button("Reset timings"):
+                tracer.reset()
+                st.rerun()
 
 # Main header
-st.markdown("""
-    <div class="main-header">
-        <h1>💔 HeartMend AI</h1>
-        <p>Your AI companion for healing and growth</p>
-    </div>
-""", unsafe_allow_html=True)
+st.markdown(HEADER_HTML, unsafe_allow_html=True)
 
 # Daily quote
-st.markdown(f"""
-    <div class="quote-box">
-        {random.choice(RECOVERY_QUOTES)}
-    </div>
-""", unsafe_allow_html=True)
+st.markdown(random.choice(QUOTE_HTML), unsafe_allow_html=True)
 
 # Tabs
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["💬 Chat", "📈 Track Progress", "📚 History", "🎯 Daily Check-in", "🎵 Playlists"])
@@ -530,26 +362,79 @@ with tab1:
     
     st.markdown("---")
     
+    # Panel mode sends one message to several companions concurrently
+    panel_mode = st.toggle("👥 Panel mode", key="panel_mode", help="Ask several companions the same thing at once")
+    if panel_mode:
+        panel_agents = st.multiselect(
+            "Companions on your panel",
+            options=list(AGENT_DESCRIPTIONS),
+            default=list(AGENT_DESCRIPTIONS),
+            format_func=lambda key: f"{AGENT_DESCRIPTIONS[key]['emoji']} {AGENT_DESCRIPTIONS[key]['name']}",
+            key="panel_agents"
+        )
+    
+    # Crisis resources stay pinned above the chat once crisis language has been seen
+    crisis_banner = st.empty()
+    if st.session_state.crisis_flagged:
+        crisis_banner.markdown(CRISIS_BOX_HTML, unsafe_allow_html=True)
+    
     # Display current agent
     current_agent_info = AGENT_DESCRIPTIONS[st.session_state.current_agent]
-    st.info(f"💬 Chatting with **{current_agent_info['emoji']} {current_agent_info['name']}**")
+    if panel_mode and panel_agents:
+        st.info("💬 Chatting with your panel: " + ", ".join(
+            f"**{AGENT_DESCRIPTIONS[key]['emoji']} {AGENT_DESCRIPTIONS[key]['name']}**" for key in panel_agents
+        ))
+    else:
+        st.info(f"💬 Chatting with **{current_agent_info['emoji']} {current_agent_info['name']}**")
     
     # Chat container
     chat_container = st.container()
     
-    # Display chat messages
+    # A queued reply that finished between reruns joins the history directly
+    if st.session_state.chat_job is not None and st.session_state.chat_job.done:
+        finish_chat_job(st.session_state.chat_job)
+    
+    # Display the last page(s) of chat messages; older pages come from the store on demand
     with chat_container:
-        for message in st.session_state.chat_messages:
-            role = message["role"]
-            content = message["content"]
-            agent = message.get("agent", "")
-            
-            if role == "user":
-                st.markdown(f'<div class="chat-message user-message"><b>You:</b><br>{content}</div>', unsafe_allow_html=True)
-            else:
-                agent_emoji = AGENT_DESCRIPTIONS.get(agent, {}).get("emoji", "🤖")
-                agent_name = AGENT_DESCRIPTIONS.get(agent, {}).get("name", "AI")
-                st.markdown(f'<div class="chat-message ai-message"><b>{agent_emoji} {agent_name}:</b><br>{content}</div>', unsafe_allow_html=True)
+        visible_messages = st.session_state.chat_messages[-st.session_state.chat_visible:]
+        missing = st.session_state.chat_visible - len(visible_messages)
+        if missing > 0 and visible_messages:
+            visible_messages = get_store().recent_messages(
+                st.session_state.user_id, missing, before_ts=visible_messages[0]["ts"]
+            ) + visible_messages
+        
+        total_messages = get_store().count_messages(st.session_state.user_id)
+        if total_messages > len(visible_messages):
+            if st.button(f"⬆️ Load earlier messages ({total_messages - len(visible_messages)} more)", use_container_width=True):
+                st.session_state.chat_visible += DEFAULT_PAGE_SIZE
+                st.rerun()
+        
+        with span("render_history", messages=len(visible_messages)):
+            for message in visible_messages:
+                st.markdown(message_html(message, AGENT_DESCRIPTIONS), unsafe_allow_html=True)
+                if message["role"] != "user" and message.get("metrics"):
+                    st.caption(format_stats(message["metrics"]))
+        
+        if st.session_state.chat_job is not None:
+            show_pending_reply()
+    
+    chat_notice = st.session_state.pop("chat_notice", None)
+    if chat_notice is not None:
+        getattr(st, chat_notice[0])(chat_notice[1])
+    
+    # Suggested next messages after the latest reply (prepared ahead when prefetch is enabled)
+    suggestion = None
+    if not panel_mode and st.session_state.chat_job is None and len(visible_messages) >= 2 and visible_messages[-1]["role"] != "user" and visible_messages[-2]["role"] == "user":
+        last_agent = visible_messages[-1].get("agent")
+        suggestions = follow_up_suggestions(last_agent, visible_messages[-2]["content"]) if last_agent in AGENT_DESCRIPTIONS else []
+        if suggestions:
+            suggestion_cols = st.columns(len(suggestions))
+            for idx, (agent_key, text) in enumerate(suggestions):
+                agent_info = AGENT_DESCRIPTIONS[agent_key]
+                label = f"{agent_info['emoji']} Ask the {agent_info['name']} too" if idx == 0 else f"💭 {text}"
+                with suggestion_cols[idx]:
+                    if st.button(label, key=f"suggestion_{idx}", use_container_width=True):
+                        suggestion = (agent_key, text)
     
     # Input section
     st.markdown("---")
@@ -560,70 +445,131 @@ with tab1:
         key="chat_input"
     )
     
+    uploaded_files = st.file_uploader(
+        "📷 Share images (optional)",
+        type=["png", "jpg", "jpeg", "webp"],
+        accept_multiple_files=True,
+        key=f"chat_images_{st.session_state.upload_nonce}"
+    )
+    
     col1, col2 = st.columns(2)
     with col1:
         send_button = st.button("💬 Send Message", type="primary", use_container_width=True)
     with col2:
         clear_button = st.button("🗑️ Clear Chat", use_container_width=True)
     
-    uploaded_files = None
-    
     # Handle clear
     if clear_button:
-        st.session_state.chat_messages = []
+        # A reply already being answered finishes, but isn't saved
+        if st.session_state.chat_job is not None:
+            get_chat_queue().cancel(st.session_state.chat_job)
+            st.session_state.chat_job = None
+        st.session_state.chat_messages.clear()
+        st.session_state.chat_visible = DEFAULT_PAGE_SIZE
+        # A fresh memory, so turns added by that reply land in the old one
+        st.session_state.conversation_memory = new_memory()
+        clear_conversation(st.session_state.user_id)
         st.rerun()
     
+    # A suggestion is sent like a typed message, to the companion it names
+    if suggestion is not None:
+        st.session_state.current_agent, user_input = suggestion
+        current_agent_info = AGENT_DESCRIPTIONS[st.session_state.current_agent]
+        uploaded_files = None
+        send_button = True
+    
     # Handle send
     if send_button and user_input:
+        # Screened locally before any model call so help shows up immediately
+        routed_agent, crisis = screen_message(st.session_state.current_agent, user_input)
+        if crisis is not None:
+            st.session_state.crisis_flagged = True
+            crisis_banner.markdown(CRISIS_BOX_HTML, unsafe_allow_html=True)
+            st.session_state.current_agent = routed_agent
+            current_agent_info = AGENT_DESCRIPTIONS[routed_agent]
+            panel_mode = False
+        
         if not api_key:
             st.error("⚠️ Please configure your API key in the sidebar")
+        elif st.session_state.chat_job is not None:
+            st.info("⏳ Still answering your last message; send this one when it's done.")
         else:
-            # Add user message
-            st.session_state.chat_messages.append({
-                "role": "user",
-                "content": user_input,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M")
-            })
+            images = process_images_for_groq(uploaded_files)
+            # Auto routing sends images to a vision model itself
+            pinned = selected_model != AUTO_MODEL and not is_fake_model(selected_model)
+            run_model = VISION_MODEL if images and pinned else selected_model
             
-            # Initialize agents
-            agents = initialize_agents(api_key, selected_model)
+            # Reuse the process-wide agents for this key/model, building them on first use
+            agents = initialize_agents(api_key, run_model)
             
-            if agents:
+            if agents and panel_mode and panel_agents:
+                cancel_prefetch(st.session_state.user_id)
                 try:
-                    # Get current agent
-                    current_agent = agents[st.session_state.current_agent]
-                    
-                    # Get response (no images)
-                    with st.spinner(f"{current_agent_info['emoji']} Responding..."):
-                        response = current_agent.run(user_input)
-                        
-                        # Add AI response
-                        st.session_state.chat_messages.append({
-                            "role": "assistant",
-                            "content": response.content,
-                            "agent": st.session_state.current_agent,
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M")
-                        })
-                    
-                    st.rerun()
-                    
+                    # send_message applies the budget itself; the panel has to do it here
+                    panel_plan = usage_ledger.plan(st.session_state.user_id, run_model, images=bool(images))
+                    if panel_plan.model_id != run_model or run_model == AUTO_MODEL:
+                        # The whole panel shares one model; no failover mid-panel
+                        run_model = panel_plan.model_id
+                        if run_model == AUTO_MODEL:
+                            run_model = router.pick(classify(user_input, bool(images)), lambda m: get_guard(api_key, m))
+                        agents = initialize_agents(api_key, run_model)
+                    all_answered = run_panel_turn(
+                        agents, panel_agents, user_input, images, chat_container, run_model,
+                        guard=get_guard(api_key, run_model), context_tokens=panel_plan.context_tokens
+                    )
+                    st.session_state.upload_nonce += 1
+                    if all_answered:
+                        st.rerun()
+                except UpstreamUnavailable as e:
+                    st.warning(f"⏳ {str(e)}")
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
+            elif agents:
+                agent_key = st.session_state.current_agent
+                user_id = st.session_state.user_id
+                memory = st.session_state.conversation_memory
+                stream = st.session_state.stream_replies
+                
+                # Answered on the shared chat queue; this script run returns at once and the reply is polled
+                def answer(job):
+                    return send_message(
+                        agents, agent_key, run_model, user_id, user_input, memory=memory, images=images,
+                        on_delta=job.on_delta if stream else None, on_message=job.messages.append, api_key=api_key,
+                        cancelled=lambda: job.dropped
+                    )
+                
+                try:
+                    st.session_state.chat_job = get_chat_queue().submit(
+                        user_id, answer, priority=CRISIS if crisis is not None else CHAT
+                    )
+                    st.session_state.chat_job_meta = (agent_key, user_input)
+                    st.session_state.upload_nonce += 1
+                    st.rerun()
+                except UpstreamUnavailable as e:
+                    st.warning(f"⏳ {str(e)}")
     
-    # Export conversation
+    # Export conversation (built in the background, cached per conversation state)
     if st.session_state.chat_messages:
         st.markdown("---")
+        export_job = get_export(st.session_state.user_id)
+        
         if st.button("📥 Export Conversation as PDF"):
-            pdf_buffer = create_pdf_report(
-                st.session_state.chat_messages,
-                datetime.now().strftime("%Y-%m-%d %H:%M")
-            )
-            st.download_button(
-                label="💾 Download PDF",
-                data=pdf_buffer,
-                file_name=f"heartmend_chat_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
-                mime="application/pdf"
-            )
+            export_job = start_export(st.session_state.user_id, datetime.now().strftime("%Y-%m-%d %H:%M"))
+        
+        if export_job is not None:
+            if export_job.error:
+                st.error(f"Error exporting PDF: {export_job.error}")
+            elif export_job.ready:
+                st.download_button(
+                    label="💾 Download PDF",
+                    data=export_job.read_bytes(),
+                    file_name=f"heartmend_chat_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
+                    mime="application/pdf"
+                )
+            else:
+                st.progress(export_job.progress, text="📄 Preparing your PDF...")
+                export_job.done.wait(0.5)
+                st.rerun()
 
 with tab2:
     st.header("📈 Track Your Progress")
@@ -635,7 +581,7 @@ with tab2:
         
         mood = st.select_slider(
             "How are you feeling?",
-            options=["Angry", "Sad", "Okay", "Good", "Great"],
+            options=MOOD_SCALE,
             value="Okay"
         )
         
@@ -665,21 +611,53 @@ with tab2:
             else:
                 st.info(f"⏳ Day {day}: {description}")
     
+    # Trends over the whole mood history, computed from columnar arrays (skipped until a mood is logged)
+    summary = None
+    if st.session_state.mood_tracker:
+        trend_range = st.radio("Trend range", list(TREND_RANGES), index=1, horizontal=True, key="trend_range")
+        summary = mood_summary(st.session_state.user_id, last_days=TREND_RANGES[trend_range])
+    if summary is not None:
+        st.subheader("Mood Trends")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Moods logged", summary.entries)
+        col2.metric("Current streak", f"{summary.current_streak} days")
+        col3.metric("Longest streak", f"{summary.longest_streak} days")
+        col4.metric(
+            "Mood vs self-care",
+            "—" if summary.checkin_correlation is None else f"{summary.checkin_correlation:+.2f}",
+            help=f"Correlation between daily mood and check-in score over {summary.paired_days} days with both"
+        )
+        st.line_chart(summary.chart_data(), x="date")
+        caption = "Mood: 0 = Angry … 4 = Great · Self-care score out of 6"
+        if summary.best_weekday:
+            caption += f" · Best day: {summary.best_weekday} · Hardest day: {summary.hardest_weekday}"
+        st.caption(caption)
+    
     if st.session_state.mood_tracker:
         st.subheader("Mood History")
-        for entry in st.session_state.mood_tracker[-10:]:
-            st.write(f"{get_mood_emoji(entry['mood'])} **{entry['date']}** - {entry['note']}")
+        st.markdown("\n".join(
+            f"- {get_mood_emoji(entry['mood'])} **{entry['date']}** - {entry['note']}"
+            for entry in st.session_state.mood_tracker[-10:]
+        ))
 
 with tab3:
     st.header("📚 Conversation History")
     
     if st.session_state.chat_messages:
-        st.info(f"💬 {len(st.session_state.chat_messages)} messages in current conversation")
+        total_messages = get_store().count_messages(st.session_state.user_id)
+        st.info(f"💬 {total_messages} messages in current conversation")
         
         with st.expander("View Full Conversation"):
-            for msg in st.session_state.chat_messages:
-                role = "You" if msg["role"] == "user" else msg.get("agent", "AI")
-                st.markdown(f"**{role}:** {msg['content']}")
+            history_pages = page_count(total_messages)
+            history_page = st.number_input(
+                f"Page (1 = most recent, {history_pages} total)",
+                min_value=1,
+                max_value=history_pages,
+                value=1,
+                step=1
+            )
+            for msg in get_store().message_page(st.session_state.user_id, int(history_page), DEFAULT_PAGE_SIZE):
+                st.markdown(history_markdown(msg))
                 st.caption(msg.get('timestamp', ''))
                 st.markdown("---")
     else:
@@ -706,7 +684,23 @@ with tab4:
         hobby = st.checkbox("🎨 Did something I enjoy")
     
     if st.button("Complete Check-in", use_container_width=True):
-        checkin_score = sum([drank_water, exercised, ate_well, slept_well, social, hobby])
+        checkin_items = {
+            "water": drank_water,
+            "exercise": exercised,
+            "nutrition": ate_well,
+            "sleep": slept_well,
+            "social": social,
+            "hobby": hobby
+        }
+        checkin_score = sum(checkin_items.values())
+        get_store().add_checkin(
+            st.session_state.user_id,
+            time.time(),
+            checkin_items,
+            gratitude=gratitude,
+            accomplishment=accomplishment,
+            tomorrow=tomorrow
+        )
         st.balloons()
         st.success(f"✅ Check-in complete! Self-care score: {checkin_score}/6")
 
@@ -715,33 +709,16 @@ with tab5:
     
     st.info("🎧 Click any song link below to listen on Spotify or YouTube!")
     
-    for mood_name, playlist_data in PLAYLIST_MOODS.items():
+    for mood_name, playlist_markdown in PLAYLIST_MARKDOWN.items():
         with st.expander(f"🎵 {mood_name}", expanded=False):
-            st.markdown(f"*{playlist_data['description']}*")
-            st.markdown("---")
-            
-            for idx, song in enumerate(playlist_data["songs"], 1):
-                col1, col2, col3 = st.columns([3, 1, 1])
-                
-                with col1:
-                    st.write(f"**{idx}. {song['title']}**")
-                
-                with col2:
-                    st.markdown(f"[🎵 Spotify]({song['spotify']})")
-                
-                with col3:
-                    st.markdown(f"[▶️ YouTube]({song['youtube']})")
-                
-                st.markdown("")
+            st.markdown(playlist_markdown)
     
     st.markdown("---")
     st.info("💡 **Healing Tip:** Match your playlist to your current mood, then gradually shift to more uplifting music as you feel ready!")
 
 # Footer
 st.markdown("---")
-st.markdown("""
-    <div style='text-align: center'>
-        <p>Made with ❤️ by HeartMend AI</p>
-        <p>Remember: Healing isn't linear, but you're making progress! 🌱</p>
-    </div>
-""", unsafe_allow_html=True)
+st.markdown(FOOTER_HTML, unsafe_allow_html=True)
+
+# Runs cut short by st.rerun() are not counted
+tracer.record("script_run", time.perf_counter() - script_started)
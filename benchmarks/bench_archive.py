@@ -0,0 +1,111 @@
+"""Full-history archive export and import throughput and peak memory
+
+Fills a store with years of synthetic history for one user at several
+sizes, exports each to a gzipped NDJSON archive and imports it into an
+empty store. Peak traced Python memory should stay flat as history grows:
+
+    python benchmarks/bench_archive.py --sizes 10000,50000,200000
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import emit, make_parser  # puts the repo root on sys.path
+
+from heartmend import archive
+from heartmend.storage import HistoryStore, new_message_id
+
+WORDS = "you are not alone in this and it makes sense that today feels heavy try to be gentle with yourself".split()
+MOODS = ["Angry", "Sad", "Okay", "Good", "Great"]
+
+
+def fill(store: HistoryStore, user_id: str, messages: int, seed: int):
+    rng = random.Random(seed)
+    ts = time.time() - 3 * 365 * 86400
+    for i in range(messages):
+        ts += rng.uniform(30, 3600)
+        reply = i % 2 == 1
+        store.add_message(user_id, {
+            "id": new_message_id(),
+            "ts": ts,
+            "role": "assistant" if reply else "user",
+            "agent": rng.choice(["Therapist", "Closure", "Coach", "Honest"]) if reply else "",
+            "content": " ".join(rng.choices(WORDS, k=rng.randint(60, 180) if reply else rng.randint(6, 30))),
+            "metrics": {"ttft": rng.random(), "total": 1 + rng.random(), "tokens": 120} if reply else None,
+        })
+        # About one mood and one check-in a day at 20 messages a day
+        if i % 20 == 0:
+            store.add_mood(user_id, ts, rng.choice(MOODS), "")
+            store.add_checkin(user_id, ts, {"sleep": rng.random() < 0.6, "walk": rng.random() < 0.4}, "my friends")
+    store.set_recovery_day(user_id, messages // 20)
+    store.flush()
+
+
+def run_size(messages: int, args, db_dir: str) -> dict:
+    source = HistoryStore(os.path.join(db_dir, f"source-{messages}.sqlite3"), batch_size=1000)
+    fill(source, "bench", messages, args.seed)
+    path = os.path.join(db_dir, f"archive-{messages}.ndjson.gz")
+
+    def export():
+        with open(path, "wb") as out:
+            return archive.export_archive(out, ["bench"], source)
+
+    def load(name: str):
+        target = HistoryStore(os.path.join(db_dir, f"{name}-{messages}.sqlite3"))
+        with open(path, "rb") as src:
+            archive.import_archive(src, target)
+        return target
+
+    # Timed untraced, then run again under tracemalloc for the peaks
+    start = time.perf_counter()
+    counts = export()
+    export_s = time.perf_counter() - start
+    start = time.perf_counter()
+    target = load("target")
+    import_s = time.perf_counter() - start
+
+    tracemalloc.start()
+    export()
+    export_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    load("traced").close()
+    import_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    records = sum(counts.values())
+    raw_bytes = sum(len(json.dumps(r, separators=(",", ":"))) + 1 for r in archive.export_records(["bench"], source))
+    report = {
+        "records": records,
+        "archive_kb": round(os.path.getsize(path) / 1024, 1),
+        "compression_ratio": round(raw_bytes / os.path.getsize(path), 1),
+        "export_records_per_s": round(records / export_s),
+        "import_records_per_s": round(records / import_s),
+        "export_peak_kb": round(export_peak / 1024, 1),
+        "import_peak_kb": round(import_peak / 1024, 1),
+        "round_trip_ok": target.count_messages("bench") == source.count_messages("bench"),
+    }
+    source.close()
+    target.close()
+    return report
+
+
+def main(argv=None):
+    parser = make_parser(__doc__)
+    parser.add_argument("--sizes", default="10000,50000,200000", help="comma-separated message counts")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    report = {}
+    with tempfile.TemporaryDirectory(prefix="heartmend-archive-") as db_dir:
+        for size in (int(s) for s in args.sizes.split(",")):
+            report[f"messages_{size}"] = run_size(size, args, db_dir)
+    emit(report, args.json_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
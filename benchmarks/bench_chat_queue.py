@@ -0,0 +1,85 @@
+"""Chat queue scheduling under a backlog, on the fake backend
+
+A backlog of background jobs is queued first, then interactive chat
+sessions arrive one after another, every tenth with a crisis message. The
+same arrivals run once with every job at one priority (first come, first
+served) and once with the queue's priorities; the report gives queue wait
+percentiles per kind of job and how long submitting held the caller:
+
+    python benchmarks/bench_chat_queue.py --workers 4 --background 60 --chat 40
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from common import emit, make_parser  # puts the repo root on sys.path
+
+from heartmend.chat_queue import BACKGROUND, CHAT, CRISIS, PRIORITY_NAMES, ChatQueue
+from heartmend.core import load_agents, new_memory, send_message
+from heartmend.storage import HistoryStore
+
+MODEL = "fake:latency=0.15,tps=400,tokens=40,seed=9"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_mode(name: str, args, store: HistoryStore) -> dict:
+    queue = ChatQueue(workers=args.workers, max_depth=args.background + args.chat + 1)
+    agents = load_agents("bench", MODEL)
+    prioritized = name == "prioritized"
+
+    def submit(session_id: str, kind: int, message: str):
+        def answer(job):
+            return send_message(agents, "Coach", MODEL, session_id, message, memory=new_memory(), store=store, api_key="bench")
+        start = time.perf_counter()
+        job = queue.submit(session_id, answer, priority=kind if prioritized else CHAT)
+        return kind, job, time.perf_counter() - start
+
+    jobs = [submit(f"{name}-bg-{i}", BACKGROUND, "Summarize my week") for i in range(args.background)]
+    for i in range(args.chat):
+        time.sleep(args.interval)
+        kind = CRISIS if i % 10 == 9 else CHAT
+        jobs.append(submit(f"{name}-chat-{i}", kind, "I don't want to be here anymore" if kind == CRISIS else "I miss them"))
+    for _, job, _ in jobs:
+        job.future.result()
+
+    report = {"submit_p99_us": round(percentile([held for _, _, held in jobs], 99) * 1e6, 1)}
+    for kind, label in PRIORITY_NAMES.items():
+        waits = [job.started - job.submitted for k, job, _ in jobs if k == kind]
+        report[label] = {
+            "jobs": len(waits),
+            "wait_p50_ms": round(percentile(waits, 50) * 1000, 1),
+            "wait_p95_ms": round(percentile(waits, 95) * 1000, 1),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = make_parser(__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--background", type=int, default=60, help="background jobs queued up front")
+    parser.add_argument("--chat", type=int, default=40, help="interactive sessions arriving after them")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between chat arrivals")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="heartmend-queue-") as db_dir:
+        store = HistoryStore(os.path.join(db_dir, "queue.sqlite3"))
+        report = {
+            "workers": args.workers,
+            "fifo": run_mode("fifo", args, store),
+            "prioritized": run_mode("prioritized", args, store),
+        }
+        store.close()
+    emit(report, args.json_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Micro-benchmark for the local crisis-language screen
+
+Times ``CrisisScreen.screen`` over a mix of short and long messages, a few of
+which contain crisis language, and compares it with checking each phrase in a
+loop. Exits non-zero when the mean cost per message exceeds ``--budget-us``:
+
+    python benchmarks/bench_crisis.py --messages 50000 --budget-us 50
+"""
+import random
+import statistics
+import sys
+import time
+
+from common import emit, make_parser  # puts the repo root on sys.path
+
+from heartmend.crisis import CrisisScreen, load_phrases
+
+FILLER = (
+    "we were together for three years and I still check their profile every night "
+    "my friends say I should move on but everything in this flat reminds me of them "
+    "I went for a run today and it helped a little until I heard our song "
+).split()
+CRISIS_SNIPPETS = ["I want to end my life", "sometimes I think about self harm", "I dont want to live anymore"]
+
+
+def make_messages(count: int, crisis_rate: float, seed: int) -> list:
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        words = rng.choices(FILLER, k=rng.choice([8, 30, 120, 400]))
+        if rng.random() < crisis_rate:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(CRISIS_SNIPPETS))
+        messages.append(" ".join(words))
+    return messages
+
+
+def time_each(fn, messages: list) -> list:
+    timings = []
+    for text in messages:
+        start = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings: list, hits: int) -> dict:
+    ordered = sorted(timings)
+    total = sum(ordered)
+    return {
+        "mean_us": round(statistics.fmean(ordered) * 1e6, 2),
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 2),
+        "p99_us": round(ordered[int(len(ordered) * 0.99)] * 1e6, 2),
+        "messages_per_sec": round(len(ordered) / total) if total else None,
+        "hits": hits,
+    }
+
+
+def main(argv=None):
+    parser = make_parser(__doc__, json_report=False)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--crisis-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--budget-us", type=float, default=100.0, help="fail if the mean exceeds this")
+    args = parser.parse_args(argv)
+
+    phrases = load_phrases()
+    start = time.perf_counter()
+    screen = CrisisScreen(phrases)
+    compile_ms = (time.perf_counter() - start) * 1000
+    messages = make_messages(args.messages, args.crisis_rate, args.seed)
+    lowered = [phrase for _, phrase in phrases]
+
+    def naive(text):
+        text = text.lower()
+        return any(phrase in text for phrase in lowered)
+
+    screen_timings = time_each(screen.screen, messages)
+    naive_timings = time_each(naive, messages)
+    report = {
+        "phrases": len(phrases),
+        "messages": len(messages),
+        "compile_ms": round(compile_ms, 2),
+        "combined_regex": summarize(screen_timings, sum(screen.screen(m) is not None for m in messages)),
+        "phrase_loop": summarize(naive_timings, sum(naive(m) for m in messages)),
+    }
+    emit(report)
+    return 1 if report["combined_regex"]["mean_us"] > args.budget_us else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
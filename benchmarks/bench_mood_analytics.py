@@ -0,0 +1,78 @@
+"""Benchmark for mood trend statistics over long histories
+
+Builds synthetic mood and check-in columns covering several years and times
+``summarize`` (the work behind every render of the Track Progress tab), plus
+the incremental refresh that loads only new rows from SQLite:
+
+    python benchmarks/bench_mood_analytics.py --years 10 --per-day 5
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import emit, make_parser  # puts the repo root on sys.path
+
+from heartmend.mood_analytics import MOOD_SCALE, MoodAnalytics, summarize
+from heartmend.storage import HistoryStore
+
+
+def synthetic(years: int, per_day: int, seed: int):
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    count = int(years * 365 * per_day)
+    mood_ts = np.sort(now - rng.uniform(0, years * 365 * 86400, count))
+    mood_codes = rng.integers(0, len(MOOD_SCALE), count).astype(np.int8)
+    days = years * 365
+    checkin_ts = now - np.arange(days) * 86400.0
+    checkin_scores = rng.integers(0, 7, days).astype(np.int8)
+    return now, mood_ts, mood_codes, checkin_ts, checkin_scores
+
+
+def timed(fn, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"mean_ms": round(statistics.fmean(timings) * 1000, 3), "min_ms": round(min(timings) * 1000, 3)}
+
+
+def main(argv=None):
+    parser = make_parser(__doc__, json_report=False)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--per-day", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    now, mood_ts, mood_codes, checkin_ts, checkin_scores = synthetic(args.years, args.per_day, args.seed)
+    report = {"mood_entries": len(mood_ts), "checkins": len(checkin_ts)}
+    report["summarize_all"] = timed(lambda: summarize(mood_ts, mood_codes, checkin_ts, checkin_scores, now=now), args.repeats)
+    report["summarize_90_days"] = timed(
+        lambda: summarize(mood_ts, mood_codes, checkin_ts, checkin_scores, now=now, last_days=90), args.repeats
+    )
+
+    with tempfile.TemporaryDirectory(prefix="heartmend-mood-") as db_dir:
+        store = HistoryStore(os.path.join(db_dir, "bench.sqlite3"))
+        for ts, code in zip(mood_ts.tolist(), mood_codes.tolist()):
+            store.add_mood("bench", ts, MOOD_SCALE[code])
+        for ts, score in zip(checkin_ts.tolist(), checkin_scores.tolist()):
+            store.add_checkin("bench", ts, {str(i): i < score for i in range(6)})
+        store.flush()
+
+        analytics = MoodAnalytics()
+        report["cold_load_and_summary"] = timed(lambda: MoodAnalytics().summary("bench", store), 3)
+        analytics.summary("bench", store)
+        report["warm_summary"] = timed(lambda: analytics.summary("bench", store), args.repeats)
+        store.close()
+
+    emit(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Reply latency with and without speculative prefetch of likely next replies
+
+Simulated users chat with the fake backend. After each reply a user pauses
+(think time) and then either picks one of the suggested follow-ups or types
+something new, at ``--follow-rate``. The same sessions run once with
+prefetch off and once with it on; the report compares reply latency, the
+prefetch hit rate, seconds saved and tokens spent on unused speculations:
+
+    python benchmarks/bench_prefetch.py --sessions 16 --turns 6 --follow-rate 0.5
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from common import emit, make_parser  # puts the repo root on sys.path
+
+from heartmend import prefetch
+from heartmend.core import AGENT_DESCRIPTIONS, follow_up_suggestions, load_agents, new_memory, send_message
+from heartmend.storage import HistoryStore
+
+MODEL = "fake:latency=0.3,tps=250,tokens=80,seed=5"
+
+FRESH = [
+    "I saw them with someone new today",
+    "I can't sleep, I keep replaying our last argument",
+    "My friends think I should just move on already",
+    "Is it weird that I still have their hoodie?",
+    "I deleted their number but I still know it by heart",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_mode(name: str, args, store: HistoryStore) -> dict:
+    prefetch.PREFETCH_ENABLED = name == "prefetch"
+    prefetch._prefetcher = (
+        prefetch.Prefetcher(max_concurrent=args.concurrency, tokens_per_hour=args.tokens_per_hour)
+        if prefetch.PREFETCH_ENABLED else None
+    )
+    agents = load_agents("bench", MODEL)
+    agent_keys = list(AGENT_DESCRIPTIONS)
+    follow_latencies, fresh_latencies = [], []
+
+    def session(index: int):
+        rng = random.Random(args.seed + index)
+        user_id = f"{name}-{index}"
+        memory = new_memory()
+        agent_key, message = rng.choice(agent_keys), rng.choice(FRESH)
+        for turn in range(args.turns):
+            followed = False
+            if turn:
+                time.sleep(args.think)
+                if rng.random() < args.follow_rate:
+                    agent_key, message = rng.choice(follow_up_suggestions(agent_key, message))
+                    followed = True
+                else:
+                    agent_key, message = rng.choice(agent_keys), rng.choice(FRESH)
+            start = time.perf_counter()
+            send_message(agents, agent_key, MODEL, user_id, message, memory=memory, store=store, api_key="bench")
+            if turn:
+                (follow_latencies if followed else fresh_latencies).append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        list(pool.map(session, range(args.sessions)))
+
+    latencies = follow_latencies + fresh_latencies
+    report = {
+        "turns": len(latencies),
+        "follow_ups": len(follow_latencies),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "follow_up_p50_ms": round(percentile(follow_latencies, 50) * 1000, 1),
+        "fresh_p50_ms": round(percentile(fresh_latencies, 50) * 1000, 1),
+    }
+    if prefetch._prefetcher is not None:
+        report["prefetch"] = prefetch._prefetcher.stats()
+    return report
+
+
+def main(argv=None):
+    parser = make_parser(__doc__)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--follow-rate", type=float, default=0.5, help="share of turns that pick a suggested follow-up")
+    parser.add_argument("--think", type=float, default=1.0, help="seconds between a reply and the next message")
+    parser.add_argument("--concurrency", type=int, default=32, help="speculations running at once")
+    parser.add_argument("--tokens-per-hour", type=float, default=2000000, help="prefetch token budget")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="heartmend-prefetch-") as db_dir:
+        store = HistoryStore(os.path.join(db_dir, "prefetch.sqlite3"))
+        baseline = run_mode("baseline", args, store)
+        prefetched = run_mode("prefetch", args, store)
+        store.close()
+
+    report = {
+        "sessions": args.sessions,
+        "turns_per_session": args.turns,
+        "follow_rate": args.follow_rate,
+        "think_s": args.think,
+        "baseline": baseline,
+        "prefetch": prefetched,
+        "mean_reduction": round(1 - prefetched["mean_ms"] / baseline["mean_ms"], 3) if baseline["mean_ms"] else None,
+    }
+    emit(report, args.json_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Pinned model vs per-message routing, against a pool of fake models
+
+Every model in the pool is a fake backend with its own speed and its own
+client-side rate limit, like Groq's per-model limits. The same message mix
+(small talk, ordinary messages, long messages) is sent once with every
+message on the default model and once through ``ModelRouter``; the report
+compares throughput and latency percentiles:
+
+    python benchmarks/bench_routing.py --messages 600 --concurrency 32 --rpm 1200
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from common import emit, make_parser  # puts the repo root on sys.path
+
+from heartmend.core import AGENT_DESCRIPTIONS, AUTO_MODEL, load_agents, new_memory, send_message
+from heartmend.routing import ModelProfile, ModelRouter
+from heartmend.storage import HistoryStore
+
+# Stand-ins for the Groq pool: two quick small models, two slower large ones
+POOL = [
+    ModelProfile("fake:latency=0.12,tps=800,tokens=60,seed=1", fast=True, vision=True),
+    ModelProfile("fake:latency=0.15,tps=700,tokens=60,seed=2", fast=True),
+    ModelProfile("fake:latency=0.3,tps=300,tokens=60,seed=3", vision=True),
+    ModelProfile("fake:latency=0.35,tps=250,tokens=60,seed=4"),
+]
+DEFAULT = POOL[3].model_id
+
+SMALL_TALK = ["hey", "thanks, that helps", "good morning", "I'm okay today", "lol yes"]
+ORDINARY = [
+    "I saw them with someone new today and I can't stop thinking about what I did wrong in the relationship",
+    "Can you help me write a letter I won't send, something that says goodbye without blaming anyone for it?",
+    "Give me a plan for this week that keeps me busy in the evenings when I usually want to text them",
+]
+LONG = ["We were together for six years and " + "every day I replay the last months in my head. " * 40]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def message_mix(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    pools = [SMALL_TALK] * 5 + [ORDINARY] * 4 + [LONG]
+    return [rng.choice(rng.choice(pools)) for _ in range(count)]
+
+
+def run_mode(name: str, messages: List[str], concurrency: int, store: HistoryStore, model_router=None) -> dict:
+    api_key = f"bench-{name}"
+    model_id = AUTO_MODEL if model_router is not None else DEFAULT
+    agents = load_agents(api_key, DEFAULT)
+    agent_keys = list(AGENT_DESCRIPTIONS)
+    latencies, errors = [], []
+
+    def one(index: int):
+        start = time.perf_counter()
+        try:
+            send_message(
+                agents, agent_keys[index % len(agent_keys)], model_id, f"{name}-{index}", messages[index],
+                memory=new_memory(), store=store, api_key=api_key, model_router=model_router,
+            )
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(type(e).__name__)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(len(messages))))
+    wall = time.perf_counter() - start
+
+    report = {
+        "completed": len(latencies),
+        "errors": len(errors),
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+    if model_router is not None:
+        report["routes"] = model_router.route_counts()
+        report["models"] = model_router.snapshot()
+    return report
+
+
+def main(argv=None):
+    parser = make_parser(__doc__)
+    parser.add_argument("--messages", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rpm", type=float, default=1200, help="rate limit per fake model")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    # Read when each guard is created, so this gives every fake model its own limit
+    os.environ["HEARTMEND_RATE_LIMIT_RPM"] = str(args.rpm)
+    messages = message_mix(args.messages, args.seed)
+    with tempfile.TemporaryDirectory(prefix="heartmend-routing-") as db_dir:
+        store = HistoryStore(os.path.join(db_dir, "routing.sqlite3"))
+        pinned = run_mode("pinned", messages, args.concurrency, store)
+        routed = run_mode("routed", messages, args.concurrency, store, ModelRouter(POOL, default_model=DEFAULT))
+        store.close()
+
+    report = {
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "rpm_per_model": args.rpm,
+        "pinned": pinned,
+        "routed": routed,
+        "throughput_gain": round(routed["throughput_per_s"] / pinned["throughput_per_s"], 2) if pinned["throughput_per_s"] else None,
+        "p95_reduction": round(1 - routed["p95_ms"] / pinned["p95_ms"], 3) if pinned["p95_ms"] else None,
+    }
+    emit(report, args.json_path)
+    return 1 if routed["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Build and query cost of the hashed n-gram vector index
+
+Vectorizes a pool of synthetic chat messages (reported as texts/second),
+then for each index size adds that many vectors in batches and times
+nearest-neighbour queries. Vectors beyond the pool are pool vectors with a
+little noise, so large sizes don't spend minutes generating text:
+
+    python benchmarks/bench_semantic.py --sizes 10000,100000,1000000 --queries 200
+"""
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from common import emit, make_parser  # puts the repo root on sys.path
+
+from heartmend.semantic import HashingVectorizer, VectorIndex
+
+OPENERS = ["I keep", "I can't stop", "Today I started", "My friends say I should stop", "Why do I keep", "Is it normal to be"]
+ACTIONS = ["thinking about", "texting", "checking the profile of", "dreaming about", "crying over", "comparing myself to"]
+OBJECTS = ["my ex", "the new partner", "our old photos", "the breakup", "the last argument", "our anniversary"]
+ENDINGS = ["every night", "at work", "when I'm alone", "since last week", "even though it's over", "and I hate it"]
+
+
+def synthetic_messages(count: int, seed: int):
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(OPENERS)} {rng.choice(ACTIONS)} {rng.choice(OBJECTS)} {rng.choice(ENDINGS)}"
+        for _ in range(count)
+    ]
+
+
+def noisy_batch(pool: np.ndarray, count: int, rng: np.random.Generator, noise: float = 0.05) -> np.ndarray:
+    batch = pool[rng.integers(0, len(pool), count)] + rng.normal(0, noise, (count, pool.shape[1])).astype(np.float32)
+    batch /= np.linalg.norm(batch, axis=1, keepdims=True)
+    return batch
+
+
+def main(argv=None):
+    parser = make_parser(__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--pool", type=int, default=20000, help="distinct synthetic messages to vectorize")
+    parser.add_argument("--batch", type=int, default=50000, help="vectors per add() call")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    vectorizer = HashingVectorizer(args.dim)
+    texts = synthetic_messages(args.pool, args.seed)
+    start = time.perf_counter()
+    pool = vectorizer.transform(texts)
+    vectorize_seconds = time.perf_counter() - start
+
+    queries = synthetic_messages(args.queries, args.seed + 1)
+    start = time.perf_counter()
+    query_vectors = [vectorizer.vector(text) for text in queries]
+    single_vectorize = (time.perf_counter() - start) / args.queries
+
+    report = {
+        "dim": args.dim,
+        "vectorize_texts_per_s": round(args.pool / vectorize_seconds),
+        "vectorize_one_us": round(single_vectorize * 1e6, 1),
+        "sizes": [],
+    }
+    rng = np.random.default_rng(args.seed)
+    for size in (int(s) for s in args.sizes.split(",")):
+        index = VectorIndex(dim=args.dim)
+        add_seconds = 0.0
+        for start_row in range(0, size, args.batch):
+            count = min(args.batch, size - start_row)
+            batch = noisy_batch(pool, count, rng)
+            payloads = list(range(start_row, start_row + count))
+            started = time.perf_counter()
+            index.add(batch, payloads)
+            add_seconds += time.perf_counter() - started
+
+        timings = []
+        for query in query_vectors:
+            started = time.perf_counter()
+            index.search(query, args.k)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        report["sizes"].append({
+            "entries": size,
+            "add_ms": round(add_seconds * 1000, 1),
+            "build_with_vectorize_s": round(add_seconds + size / report["vectorize_texts_per_s"], 1),
+            "query_p50_ms": round(statistics.median(timings) * 1000, 3),
+            "query_p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))] * 1000, 3),
+            "index_mb": round(index.vectors.nbytes / 2 ** 20, 1),
+        })
+        del index
+
+    emit(report, args.json_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Server memory held by chat sessions, by session state representation
+
+Builds the state the Streamlit app keeps per session (chat messages, mood
+entries, conversation memory) for many simulated sessions, each in a fresh
+interpreter, and reports the resident set size it adds:
+
+- ``unbounded``: every message and mood dict kept for the whole session
+- ``window``: dicts, trimmed to the newest ``CHAT_WINDOW`` / ``MOOD_WINDOW``
+- ``compact``: slotted records in capped ``SessionLog``s, as the app keeps them
+
+    python benchmarks/bench_session_memory.py --sessions 1000 --turns 60
+"""
+import json
+import subprocess
+import sys
+
+from common import ROOT, emit, make_parser
+
+MODES = ("unbounded", "window", "compact")
+
+SNIPPET = """
+import gc, json, random, resource, sys, time
+sys.path.insert(0, ROOT)
+from heartmend.chat import new_message, turn_metrics
+from heartmend.core import CHAT_WINDOW, MOOD_WINDOW, new_memory
+from heartmend.records import ChatRecord, MoodRecord, chat_log, mood_log
+from heartmend.storage import format_ts
+from heartmend.streaming import StreamStats
+
+WORDS = "you are not alone in this and it makes sense that today feels heavy try to be gentle with yourself".split()
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def session(rng):
+    if MODE == "compact":
+        chat, moods = chat_log(max_records=CHAT_WINDOW), mood_log(max_records=MOOD_WINDOW)
+    else:
+        chat, moods = [], []
+    memory = new_memory()
+    for turn in range(TURNS):
+        user = new_message("user", " ".join(rng.choices(WORDS, k=rng.randint(6, 30))))
+        text = " ".join(rng.choices(WORDS, k=rng.randint(60, 180)))
+        stats = StreamStats(ttft=rng.random(), total=1 + rng.random(), tokens=len(text) // 4, input_tokens=400, output_tokens=len(text) // 4)
+        reply = new_message("assistant", text, agent=rng.choice(AGENTS), metrics=turn_metrics(stats, text, "llama-3.3-70b-versatile"))
+        for message in (user, reply):
+            memory.add_turn(message["role"], message["content"], message.get("agent", ""))
+            chat.append(ChatRecord.from_message(message) if MODE == "compact" else message)
+        if turn % 5 == 0:
+            now = time.time()
+            entry = {"date": format_ts(now), "mood": rng.choice(MOODS), "note": "", "ts": now}
+            moods.append(MoodRecord.from_entry(entry) if MODE == "compact" else entry)
+        if MODE == "window":
+            del chat[:-CHAT_WINDOW]
+            del moods[:-MOOD_WINDOW]
+    return chat, moods, memory
+
+
+AGENTS = ["Therapist", "Closure", "Coach", "Honest"]
+MOODS = ["Angry", "Sad", "Okay", "Good", "Great"]
+gc.collect()
+before = rss_kb()
+rng = random.Random(SEED)
+start = time.perf_counter()
+sessions = [session(rng) for _ in range(SESSIONS)]
+elapsed = time.perf_counter() - start
+gc.collect()
+after = rss_kb()
+print(json.dumps({
+    "rss_mb": round((after - before) / 1024, 1),
+    "per_session_kb": round((after - before) / SESSIONS, 1),
+    "messages_in_memory": sum(len(chat) for chat, _, _ in sessions),
+    "build_s": round(elapsed, 2),
+}))
+"""
+
+
+def run_mode(mode: str, args) -> dict:
+    code = f"ROOT = {ROOT!r}\nMODE = {mode!r}\nSESSIONS = {args.sessions}\nTURNS = {args.turns}\nSEED = {args.seed}\n" + SNIPPET
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = make_parser(__doc__)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=60, help="exchanges per session")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    report = {"sessions": args.sessions, "turns": args.turns}
+    for mode in MODES:
+        report[mode] = run_mode(mode, args)
+    if report["unbounded"]["rss_mb"]:
+        report["compact_vs_unbounded"] = round(report["compact"]["rss_mb"] / report["unbounded"]["rss_mb"], 3)
+    if report["window"]["rss_mb"]:
+        report["compact_vs_window"] = round(report["compact"]["rss_mb"] / report["window"]["rss_mb"], 3)
+    emit(report, args.json_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
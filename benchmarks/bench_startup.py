@@ -0,0 +1,90 @@
+"""Cold-start benchmark for the Streamlit app
+
+Each sample runs in a fresh interpreter so nothing is already imported:
+
+- ``import``: time to import the modules ``app.py`` pulls in at load
+- ``first_render``: one full script run of ``app.py`` via Streamlit's AppTest
+
+It also reports which heavy optional dependencies were loaded by a first
+render, which should be none of them:
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT, emit, make_parser
+
+HEAVY_MODULES = ("agno", "groq", "reportlab", "PIL", "numpy", "ddgs")
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import heartmend.assets, heartmend.chat, heartmend.chat_queue, heartmend.chat_view, heartmend.core, heartmend.fake_backend
+import heartmend.images, heartmend.panel, heartmend.prefetch, heartmend.records, heartmend.resilience
+import heartmend.response_cache, heartmend.storage, heartmend.streaming, heartmend.tokens, heartmend.tracing, heartmend.usage
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in HEAVY if m in sys.modules]}))
+"""
+
+RENDER_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+streamlit_loaded = time.perf_counter()
+at = AppTest.from_file(APP, default_timeout=60)
+at.run()
+done = time.perf_counter()
+print(json.dumps({
+    "seconds": done - start,
+    "script_seconds": done - streamlit_loaded,
+    "errors": [str(e.value) for e in at.exception],
+    "loaded": [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+
+def run_sample(snippet: str, env: dict) -> dict:
+    code = f"HEAVY = {HEAVY_MODULES!r}\nAPP = {os.path.join(ROOT, 'app.py')!r}\n" + snippet
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list, key: str = "seconds") -> dict:
+    values = [sample[key] * 1000 for sample in samples]
+    return {"median_ms": round(statistics.median(values), 1), "min_ms": round(min(values), 1), "max_ms": round(max(values), 1)}
+
+
+def main(argv=None):
+    parser = make_parser(__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-render", action="store_true", help="only time imports (no Streamlit needed)")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, PYTHONPATH=ROOT, HEARTMEND_MODEL="fake", GROQ_API_KEY="benchmark")
+    imports = [run_sample(IMPORT_SNIPPET, env) for _ in range(args.runs)]
+    report = {"import": {**summarize(imports), "heavy_loaded": imports[-1]["loaded"]}}
+
+    if not args.skip_render:
+        with tempfile.TemporaryDirectory(prefix="heartmend-startup-") as db_dir:
+            env["HEARTMEND_DB_PATH"] = os.path.join(db_dir, "startup.sqlite3")
+            renders = [run_sample(RENDER_SNIPPET, env) for _ in range(args.runs)]
+        report["first_render"] = {
+            **summarize(renders),
+            "script": summarize(renders, "script_seconds"),
+            "heavy_loaded": renders[-1]["loaded"],
+            "errors": renders[-1]["errors"],
+        }
+
+    emit(report, args.json_path)
+    return 1 if report.get("first_render", {}).get("errors") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
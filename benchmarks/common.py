@@ -0,0 +1,30 @@
+"""Command-line plumbing shared by the benchmark scripts
+
+Importing this puts the repository root on ``sys.path``, so scripts run as
+``python benchmarks/<name>.py`` can import ``heartmend`` without installing it.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def make_parser(doc: str, json_report: bool = True) -> argparse.ArgumentParser:
+    """Parser described by the first line of ``doc``, with ``--json`` unless ``json_report`` is false"""
+    parser = argparse.ArgumentParser(description=doc.splitlines()[0])
+    if json_report:
+        parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    return parser
+
+
+def emit(report: dict, json_path: Optional[str] = None):
+    """Print the report, and also write it to ``json_path`` if given"""
+    print(json.dumps(report, indent=2))
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
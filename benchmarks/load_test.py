@@ -0,0 +1,167 @@
+"""Load test for the chat, mood and export paths against the fake backend
+
+Runs N simulated sessions concurrently, each sending chat turns through
+``heartmend.core.send_message``, logging moods and optionally exporting a PDF,
+then reports latency percentiles, throughput and process RSS. Needs no
+network or API key, so it runs on a plain CI box:
+
+    python benchmarks/load_test.py --sessions 200 --turns 5 --concurrency 32
+"""
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from common import emit, make_parser  # puts the repo root on sys.path
+
+from heartmend.core import AGENT_DESCRIPTIONS, add_mood_entry, new_memory, send_message
+from heartmend.fake_backend import FakeModelConfig, build_fake_agents
+from heartmend.resilience import metrics as resilience_metrics
+from heartmend.storage import HistoryStore
+
+PROMPTS = [
+    "I just got dumped and I can't stop crying",
+    "How do I stop texting my ex?",
+    "I saw them with someone new today",
+    "Can you help me write a letter I won't send?",
+    "Give me a plan for this week",
+    "Was it my fault?",
+]
+MOODS = ["Angry", "Sad", "Okay", "Good", "Great"]
+AGENT_KEYS = list(AGENT_DESCRIPTIONS)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def rss_mb() -> Dict[str, float]:
+    current = 0.0
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"rss_mb": round(current, 1), "peak_rss_mb": round(peak, 1)}
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.agents = build_fake_agents(AGENT_DESCRIPTIONS, args.model)
+        self.config = FakeModelConfig.from_model_id(args.model)
+        self.store = HistoryStore(os.path.join(args.db_dir, "load_test.sqlite3"))
+        self.latencies: Dict[str, List[float]] = {"chat": [], "mood": [], "export": []}
+        self.errors: Dict[str, int] = {"chat": 0, "mood": 0, "export": 0}
+        self._lock = threading.Lock()
+        self.write_pdf_report = None
+        if not args.no_pdf:
+            try:
+                from heartmend.pdf_export import write_pdf_report
+                self.write_pdf_report = write_pdf_report
+            except ImportError:
+                print("reportlab not installed; skipping PDF export", file=sys.stderr)
+
+    def _record(self, op: str, start: float, ok: bool = True):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            if ok:
+                self.latencies[op].append(elapsed)
+            else:
+                self.errors[op] += 1
+
+    def session(self, index: int):
+        rng = random.Random(index)
+        user_id = f"load-{index}"
+        memory = new_memory()
+        for _ in range(self.args.turns):
+            agent_key = rng.choice(AGENT_KEYS)
+            user_input = rng.choice(PROMPTS)
+            start = time.perf_counter()
+            try:
+                send_message(
+                    self.agents, agent_key, self.args.model, user_id, user_input,
+                    memory=memory, store=self.store,
+                    on_delta=(lambda _text: None) if self.args.stream else None,
+                )
+                self._record("chat", start)
+            except Exception:
+                self._record("chat", start, ok=False)
+
+            start = time.perf_counter()
+            try:
+                add_mood_entry(user_id, rng.choice(MOODS), "load test", store=self.store)
+                self._record("mood", start)
+            except Exception:
+                self._record("mood", start, ok=False)
+
+        if self.write_pdf_report is not None:
+            start = time.perf_counter()
+            try:
+                with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as out:
+                    self.write_pdf_report(self.store.iter_messages(user_id), "load test", out)
+                self._record("export", start)
+            except Exception:
+                self._record("export", start, ok=False)
+
+    def run(self) -> dict:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            list(pool.map(self.session, range(self.args.sessions)))
+        self.store.flush()
+        wall = time.perf_counter() - start
+
+        expected_model_time = self.config.latency + self.config.tokens / self.config.tps
+        report = {"sessions": self.args.sessions, "turns": self.args.turns, "wall_s": round(wall, 3)}
+        for op, values in self.latencies.items():
+            if not values and not self.errors[op]:
+                continue
+            report[op] = {
+                "count": len(values),
+                "errors": self.errors[op],
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "throughput_per_s": round(len(values) / wall, 2),
+            }
+        if "chat" in report:
+            # Time spent outside the simulated model call is the app's own overhead
+            report["chat"]["overhead_p50_ms"] = round(max(0.0, report["chat"]["p50_ms"] - expected_model_time * 1000), 2)
+        report["resilience"] = resilience_metrics.snapshot()
+        report.update(rss_mb())
+        return report
+
+
+def main(argv=None):
+    parser = make_parser(__doc__)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--model", default="fake:latency=0.2,tps=400,tokens=120,seed=1")
+    parser.add_argument("--stream", action="store_true", help="use the streaming send path")
+    parser.add_argument("--no-pdf", action="store_true", help="skip the PDF export step")
+    parser.add_argument("--db-dir", default=None, help="directory for the SQLite file (default: temp dir)")
+    args = parser.parse_args(argv)
+    args.db_dir = args.db_dir or tempfile.mkdtemp(prefix="heartmend-load-")
+
+    report = LoadTest(args).run()
+    emit(report, args.json_path)
+    failed = sum(section.get("errors", 0) for section in report.values() if isinstance(section, dict))
+    return 1 if failed and "error=" not in args.model else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
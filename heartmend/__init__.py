@@ -0,0 +1 @@
+"""Importable building blocks behind the HeartMend AI Streamlit app"""
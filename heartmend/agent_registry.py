@@ -0,0 +1,113 @@
+"""Process-wide cache of initialized companion agents"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("HEARTMEND_AGENT_CACHE_SIZE", "8"))
+
+
+def hash_api_key(api_key: str) -> str:
+    """Return a stable digest so raw API keys are never kept as cache keys"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class AgentRegistry:
+    """Bounded LRU of agent dicts keyed by (api key hash, model id)
+
+    Entries live for the whole process, so the Groq clients (and their HTTP
+    connection pools) behind each agent stay warm across Streamlit reruns
+    and across sessions that share a key and model.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._build_locks: dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, api_key: str, model_id: str) -> Tuple[str, str]:
+        return hash_api_key(api_key), model_id
+
+    def get(self, api_key: str, model_id: str) -> Optional[dict]:
+        key = self._key(api_key, model_id)
+        with self._lock:
+            agents = self._entries.get(key)
+            if agents is not None:
+                self._entries.move_to_end(key)
+            return agents
+
+    def get_or_create(self, api_key: str, model_id: str, factory: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """Return cached agents, building them with ``factory`` on a miss
+
+        Concurrent misses for the same key wait on a single build instead of
+        each constructing their own clients. A factory returning ``None``
+        (initialization failed) is not cached.
+        """
+        key = self._key(api_key, model_id)
+        with self._lock:
+            agents = self._entries.get(key)
+            if agents is not None:
+                self._entries.move_to_end(key)
+                return agents
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                agents = self._entries.get(key)
+                if agents is not None:
+                    self._entries.move_to_end(key)
+                    return agents
+
+            agents = factory()
+
+            with self._lock:
+                self._build_locks.pop(key, None)
+                if agents is None:
+                    return None
+                self._entries[key] = agents
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return agents
+
+    def invalidate(self, api_key: Optional[str] = None, model_id: Optional[str] = None) -> int:
+        """Drop entries matching the given key and/or model; return how many were removed"""
+        key_hash = hash_api_key(api_key) if api_key is not None else None
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if (key_hash is None or key[0] == key_hash)
+                and (model_id is None or key[1] == model_id)
+            ]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        api_key, model_id = key
+        with self._lock:
+            return self._key(api_key, model_id) in self._entries
+
+
+# Module-level instance: imported modules survive Streamlit reruns, app.py does not
+registry = AgentRegistry()
+
+
+def get_agents(api_key: str, model_id: str, factory: Callable[[], Optional[dict]]) -> Optional[dict]:
+    return registry.get_or_create(api_key, model_id, factory)
+
+
+def invalidate_agents(api_key: Optional[str] = None, model_id: Optional[str] = None) -> int:
+    return registry.invalidate(api_key, model_id)
@@ -0,0 +1,279 @@
+"""Headless HTTP/JSON API over the companion core
+
+Run several workers behind a load balancer with e.g.
+``uvicorn heartmend.api:app --workers 4``. Workers share history and PDF
+exports through the SQLite store and the directory next to it, so any
+worker can serve any user. User endpoints need a per-user bearer token
+(see ``heartmend.auth``) and are refused until ``HEARTMEND_API_SECRET`` is
+set.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+from heartmend import archive, core, resilience
+from heartmend.auth import AuthError, check_authorization
+from heartmend.chat_queue import CHAT, CRISIS, get_chat_queue
+from heartmend.chat_view import DEFAULT_PAGE_SIZE
+from heartmend.crisis import CRISIS_RESOURCES
+from heartmend.fake_backend import is_fake_model
+from heartmend.prefetch import get_prefetcher
+from heartmend.resilience import UpstreamUnavailable
+from heartmend.search_cache import get_search_cache
+from heartmend.storage import get_store
+from heartmend.tracing import span, tracer
+
+app = FastAPI(title="HeartMend AI", version="1.0.0")
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    with span("http_request", method=request.method) as attributes:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        attributes["route"] = getattr(route, "path", request.url.path)
+        attributes["status"] = response.status_code
+    return response
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(..., min_length=1)
+    agent: str = "Therapist"
+    stream: bool = False
+
+
+class MoodRequest(BaseModel):
+    mood: str
+    note: str = ""
+
+
+def _authorize(user_id: str, authorization: Optional[str] = Header(None)):
+    """Every ``/v1/users/{user_id}`` endpoint needs that user's bearer token"""
+    try:
+        check_authorization(user_id, authorization)
+    except AuthError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+def _resolve_api_key(header_key: Optional[str], model_id: str) -> str:
+    api_key = header_key or os.getenv("GROQ_API_KEY", "")
+    if not api_key and not is_fake_model(model_id):
+        raise HTTPException(status_code=401, detail="Missing Groq API key (X-Groq-Api-Key header)")
+    return api_key
+
+
+async def _load_agents(api_key: str, model_id: str) -> dict:
+    try:
+        return await run_in_threadpool(core.load_agents, api_key, model_id)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error initializing agents: {str(e)}")
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _crisis_payload(match) -> dict:
+    return {"category": match.category, "agent": core.CRISIS_AGENT, "resources": CRISIS_RESOURCES}
+
+
+async def _stream_reply(agents: dict, agent_key: str, model_id: str, user_id: str, text: str, api_key: str, crisis=None):
+    """Bridge the blocking streamed run on a worker thread into server-sent events"""
+    if crisis is not None:
+        yield _sse("crisis", _crisis_payload(crisis))
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    sent = {"length": 0}
+
+    def on_delta(full_text: str):
+        delta = full_text[sent["length"]:]
+        sent["length"] = len(full_text)
+        if delta:
+            loop.call_soon_threadsafe(events.put_nowait, ("delta", {"text": delta}))
+
+    def worker():
+        try:
+            message = core.send_message(agents, agent_key, model_id, user_id, text, on_delta=on_delta, api_key=api_key)
+            loop.call_soon_threadsafe(events.put_nowait, ("done", message))
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, ("error", {"detail": str(e)}))
+
+    task = loop.run_in_executor(None, worker)
+    while True:
+        event, data = await events.get()
+        yield _sse(event, data)
+        if event != "delta":
+            break
+    await task
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/metrics/resilience")
+async def resilience_metrics():
+    return resilience.metrics.snapshot()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latency histograms, resilience, queue, cache, routing and prefetch counters in Prometheus text format"""
+    lines = [tracer.prometheus_text()]
+    for name, value in resilience.metrics.snapshot().items():
+        lines.append(f"heartmend_{name} {value}\n")
+    for name, value in get_chat_queue().stats().items():
+        lines.append(f"heartmend_chat_queue_{name} {value}\n")
+    for name, value in get_search_cache().stats().items():
+        lines.append(f"heartmend_search_cache_{name} {value}\n")
+    if os.getenv("HEARTMEND_SEMANTIC_CACHE_THRESHOLD"):
+        from heartmend.semantic import get_semantic_cache
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is not None:
+            for name, value in semantic_cache.stats().items():
+                lines.append(f"heartmend_semantic_cache_{name} {value}\n")
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        for name, value in prefetcher.stats().items():
+            lines.append(f"heartmend_prefetch_{name} {value}\n")
+    for route, count in core.router.route_counts().items():
+        lines.append(f'heartmend_route_messages_total{{route="{route}"}} {count}\n')
+    for row in core.router.snapshot():
+        for name in ("calls", "failures", "skipped"):
+            lines.append(f'heartmend_model_{name}_total{{model="{row["model"]}"}} {row[name]}\n')
+    return PlainTextResponse("".join(lines), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/v1/agents")
+async def list_agents():
+    return core.AGENT_DESCRIPTIONS
+
+
+@app.post("/v1/users/{user_id}/chat", dependencies=[Depends(_authorize)])
+async def chat(user_id: str, request: ChatRequest, x_groq_api_key: Optional[str] = Header(None)):
+    if request.agent not in core.AGENT_DESCRIPTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown agent: {request.agent}")
+    agent_key, crisis = core.screen_message(request.agent, request.message)
+    model_id = core.DEFAULT_MODEL
+    api_key = _resolve_api_key(x_groq_api_key, model_id)
+    agents = await _load_agents(api_key, model_id)
+
+    if request.stream:
+        return StreamingResponse(
+            _stream_reply(agents, agent_key, model_id, user_id, request.message, api_key, crisis=crisis),
+            media_type="text/event-stream",
+        )
+    try:
+        # Answered on the shared chat queue, fairly across users and crisis messages first
+        job = get_chat_queue().submit(
+            user_id,
+            lambda job: core.send_message(agents, agent_key, model_id, user_id, request.message, api_key=api_key),
+            priority=CRISIS if crisis is not None else CHAT,
+        )
+        message = await asyncio.wrap_future(job.future)
+        if crisis is not None:
+            message = {**message, "crisis": _crisis_payload(crisis)}
+        return message
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+@app.get("/v1/users/{user_id}/messages", dependencies=[Depends(_authorize)])
+async def list_messages(user_id: str, page: int = Query(1, ge=1), page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=200)):
+    store = get_store()
+    messages = await run_in_threadpool(store.message_page, user_id, page, page_size)
+    total = await run_in_threadpool(store.count_messages, user_id)
+    return {"total": total, "page": page, "page_size": page_size, "messages": messages}
+
+
+@app.delete("/v1/users/{user_id}/messages", status_code=204, dependencies=[Depends(_authorize)])
+async def clear_messages(user_id: str):
+    await run_in_threadpool(core.clear_conversation, user_id)
+    return Response(status_code=204)
+
+
+@app.post("/v1/users/{user_id}/moods", status_code=201, dependencies=[Depends(_authorize)])
+async def log_mood(user_id: str, request: MoodRequest):
+    try:
+        return await run_in_threadpool(core.add_mood_entry, user_id, request.mood, request.note)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/v1/users/{user_id}/moods", dependencies=[Depends(_authorize)])
+async def list_moods(user_id: str, limit: int = Query(core.MOOD_WINDOW, ge=1, le=1000)):
+    return await run_in_threadpool(get_store().recent_moods, user_id, limit)
+
+
+@app.get("/v1/users/{user_id}/moods/summary", dependencies=[Depends(_authorize)])
+async def mood_summary(user_id: str, days: Optional[int] = Query(None, ge=1)):
+    summary = await run_in_threadpool(core.mood_summary, user_id, days)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No moods logged yet")
+    return summary.as_dict()
+
+
+@app.get("/v1/users/{user_id}/usage", dependencies=[Depends(_authorize)])
+async def usage(user_id: str, days: int = Query(7, ge=1, le=366), group_by: str = Query("agent", pattern="^(agent|model|day)$")):
+    return await run_in_threadpool(core.usage_report, user_id, days, group_by)
+
+
+def _export_status(job) -> dict:
+    state = "failed" if job.error else "ready" if job.ready else "running"
+    return {"status": state, "progress": round(job.progress, 3), "error": job.error}
+
+
+@app.post("/v1/users/{user_id}/export", status_code=202, dependencies=[Depends(_authorize)])
+async def start_export(user_id: str):
+    job = await run_in_threadpool(core.start_export, user_id, datetime.now().strftime("%Y-%m-%d %H:%M"))
+    return _export_status(job)
+
+
+@app.get("/v1/users/{user_id}/export", dependencies=[Depends(_authorize)])
+async def get_export(user_id: str):
+    job = await run_in_threadpool(core.get_export, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No export started for the current conversation")
+    if not job.ready:
+        return JSONResponse(_export_status(job), status_code=500 if job.error else 202)
+    pdf = await run_in_threadpool(job.read_bytes)
+    return Response(
+        pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="heartmend_chat_{datetime.now().strftime("%Y%m%d_%H%M")}.pdf"'},
+    )
+
+
+@app.get("/v1/users/{user_id}/archive", dependencies=[Depends(_authorize)])
+async def export_archive(user_id: str):
+    # A sync iterator, so Starlette pulls each chunk on a worker thread
+    return StreamingResponse(
+        archive.iter_archive([user_id], get_store()),
+        media_type=archive.MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="heartmend_{datetime.now().strftime("%Y%m%d_%H%M")}.ndjson.gz"'},
+    )
+
+
+@app.post("/v1/users/{user_id}/archive", dependencies=[Depends(_authorize)])
+async def import_archive(user_id: str, request: Request):
+    """Import an archive of one user's history as ``user_id``"""
+    # Spool the upload so a large archive is parsed from disk, not memory
+    with tempfile.SpooledTemporaryFile(max_size=archive.CHUNK_BYTES * 16) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            return await run_in_threadpool(archive.import_archive, upload, get_store(), user_id)
+        except archive.ArchiveError as e:
+            raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,209 @@
+"""Streaming export and import of users' full history as gzipped NDJSON
+
+An archive is one JSON object per line: a header, then for each user their
+recovery progress, messages, moods and check-ins, every record tagged with
+its user so one file can hold a single user or a whole deployment. Both
+directions stream through the store in batches and never hold more than a
+batch of records, so archive size is bounded only by disk.
+
+Importing is idempotent and never changes existing rows: messages whose id
+is already stored, and moods and check-ins already present at the same
+timestamp, are skipped. Messages imported under another user get ids
+derived from that user and the original id, so the source user's rows are
+untouched and importing the same archive again still adds nothing.
+
+    python -m heartmend.archive export heartmend.ndjson.gz --all
+    python -m heartmend.archive import heartmend.ndjson.gz
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import sys
+import time
+import zlib
+from collections import Counter
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from heartmend.storage import HistoryStore, get_store
+
+FORMAT = "heartmend-archive"
+VERSION = 1
+MEDIA_TYPE = "application/gzip"
+
+# Uncompressed bytes of records gathered per compress call
+CHUNK_BYTES = 64 * 1024
+# Records queued on the store between flushes while importing
+IMPORT_BATCH = 500
+
+
+class ArchiveError(ValueError):
+    """Raised for files that aren't a readable archive"""
+
+
+def export_records(user_ids: Iterable[str], store: Optional[HistoryStore] = None) -> Iterator[dict]:
+    store = store or get_store()
+    yield {"type": "header", "format": FORMAT, "version": VERSION, "created": time.time()}
+    for user_id in user_ids:
+        yield {"type": "profile", "user": user_id, "recovery_day": store.get_recovery_day(user_id)}
+        for message in store.iter_messages(user_id):
+            message.pop("timestamp", None)
+            yield {"type": "message", "user": user_id, **message}
+        for mood in store.iter_moods(user_id):
+            yield {"type": "mood", "user": user_id, **mood}
+        for checkin in store.iter_checkins(user_id):
+            yield {"type": "checkin", "user": user_id, **checkin}
+
+
+def iter_archive(
+    user_ids: Iterable[str], store: Optional[HistoryStore] = None, counts: Optional[Counter] = None, level: int = 6,
+) -> Iterator[bytes]:
+    """Yield the gzipped archive in chunks, counting records into ``counts``"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    lines = []
+    size = 0
+    for record in export_records(user_ids, store):
+        if counts is not None:
+            counts[record["type"]] += 1
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        lines.append(line)
+        size += len(line) + 1
+        # One compress call per chunk of lines rather than per line
+        if size >= CHUNK_BYTES:
+            lines.append(b"")
+            data = compressor.compress(b"\n".join(lines))
+            lines, size = [], 0
+            if data:
+                yield data
+    lines.append(b"")
+    yield compressor.compress(b"\n".join(lines)) + compressor.flush()
+
+
+def export_archive(out: BinaryIO, user_ids: Iterable[str], store: Optional[HistoryStore] = None) -> dict:
+    counts = Counter()
+    for chunk in iter_archive(user_ids, store, counts):
+        out.write(chunk)
+    counts.pop("header", None)
+    return dict(counts)
+
+
+def _imported_id(user_id: str, message_id: str) -> str:
+    return hashlib.sha256(f"{user_id}\x1f{message_id}".encode("utf-8")).hexdigest()[:32]
+
+
+def _open_lines(src: BinaryIO) -> BinaryIO:
+    if hasattr(src, "peek"):
+        magic = src.peek(2)[:2]
+    else:
+        magic = src.read(2)
+        src.seek(-len(magic), io.SEEK_CUR)
+    # Plain NDJSON is accepted too
+    return gzip.GzipFile(fileobj=src, mode="rb") if magic == b"\x1f\x8b" else src
+
+
+def import_archive(src: BinaryIO, store: Optional[HistoryStore] = None, user_id: Optional[str] = None) -> dict:
+    """Load an archive into the store, as ``user_id`` if given (the archive must then hold one user)"""
+    store = store or get_store()
+    counts = Counter()
+    users = set()
+    pending = 0
+    header = False
+    lines = src
+    try:
+        lines = _open_lines(src)
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                kind = record["type"]
+                if not header:
+                    if kind != "header" or record.get("format") != FORMAT:
+                        raise ArchiveError("Not a HeartMend archive")
+                    if record.get("version", 0) > VERSION:
+                        raise ArchiveError(f"Archive version {record['version']} is newer than this server supports")
+                    header = True
+                    continue
+                source = record["user"]
+                users.add(source)
+                if user_id is not None and len(users) > 1:
+                    raise ArchiveError("Archive holds more than one user")
+                owner = user_id or source
+                if kind == "profile":
+                    store.set_recovery_day(owner, int(record["recovery_day"]))
+                elif kind == "message":
+                    if owner != source:
+                        record["id"] = _imported_id(owner, record["id"])
+                    store.add_message(owner, record, skip_duplicates=True)
+                elif kind == "mood":
+                    store.add_mood(owner, record["ts"], record["mood"], record.get("note", ""), skip_duplicates=True)
+                elif kind == "checkin":
+                    store.add_checkin(
+                        owner, record["ts"], record["items"], record.get("gratitude", ""),
+                        record.get("accomplishment", ""), record.get("tomorrow", ""), skip_duplicates=True,
+                    )
+                else:
+                    raise ArchiveError(f"Unknown record type {kind!r}")
+            except ArchiveError:
+                raise
+            except (KeyError, TypeError, ValueError) as e:
+                raise ArchiveError(f"Line {line_number}: malformed record ({e})") from e
+            counts[kind] += 1
+            pending += 1
+            if pending >= IMPORT_BATCH:
+                store.flush()
+                pending = 0
+    except (OSError, EOFError) as e:
+        raise ArchiveError(f"Could not read archive: {e}") from e
+    finally:
+        if lines is not src:
+            lines.close()
+        # Whatever was read before an error is kept; reimporting skips it
+        store.flush()
+    if not header:
+        raise ArchiveError("Archive is empty")
+    return {"users": len(users), **counts}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="archive file, or - for stdout/stdin")
+    parser.add_argument("--user", action="append", default=[], help="user to export (repeatable), or to import as")
+    parser.add_argument("--all", action="store_true", help="export every user in the store")
+    args = parser.parse_args(argv)
+
+    store = get_store()
+    start = time.perf_counter()
+    if args.command == "export":
+        if not args.all and not args.user:
+            parser.error("export needs --user or --all")
+        user_ids = store.user_ids() if args.all else args.user
+        if args.path == "-":
+            counts = export_archive(sys.stdout.buffer, user_ids, store)
+        else:
+            with open(args.path, "wb") as out:
+                counts = export_archive(out, user_ids, store)
+        counts["users"] = len(user_ids)
+    else:
+        if len(args.user) > 1:
+            parser.error("import takes at most one --user")
+        as_user = args.user[0] if args.user else None
+        try:
+            if args.path == "-":
+                counts = import_archive(sys.stdin.buffer, store, as_user)
+            else:
+                with open(args.path, "rb") as src:
+                    counts = import_archive(src, store, as_user)
+        except ArchiveError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    counts["seconds"] = round(time.perf_counter() - start, 2)
+    print(json.dumps(counts), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
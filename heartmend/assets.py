@@ -0,0 +1,267 @@
+"""Static page assets, built once per process instead of on every Streamlit rerun"""
+import re
+
+# Inspirational quotes
+RECOVERY_QUOTES = (
+    "Every ending is a new beginning. 🌅",
+    "Healing is not linear, and that's okay. 💝",
+    "The best revenge is becoming your best self. 💪",
+    "This chapter closed so a better one could open. 📖",
+    "You deserve someone who chooses you every day. 🌟",
+    "Pain is temporary, but the lessons are forever. 🦋",
+    "Your value doesn't decrease based on someone's inability to see your worth. 👑"
+)
+
+# Embedded music for playlists
+PLAYLIST_MOODS = {
+    "Sad & Reflective": {
+        "description": "For when you need to feel your emotions and process the pain",
+        "songs": [
+            {
+                "title": "Someone Like You - Adele",
+                "spotify": "https://open.spotify.com/track/1zwMYTA5nlNjZxYrvBB2pV",
+                "youtube": "https://www.youtube.com/watch?v=hLQl3WQQoQ0"
+            },
+            {
+                "title": "The Night We Met - Lord Huron",
+                "spotify": "https://open.spotify.com/track/0NdAHF7HvOGZCeaKuJbK9d",
+                "youtube": "https://www.youtube.com/watch?v=KtlgYxa6BMU"
+            },
+            {
+                "title": "All Too Well - Taylor Swift",
+                "spotify": "https://open.spotify.com/track/5enxwA8aAbwZbf5qCHORXi",
+                "youtube": "https://www.youtube.com/watch?v=tollGa3S0o8"
+            },
+            {
+                "title": "Drivers License - Olivia Rodrigo",
+                "spotify": "https://open.spotify.com/track/7lPN2DXiMsVn7XUKtOW1CS",
+                "youtube": "https://www.youtube.com/watch?v=ZmDBbnmKpqQ"
+            },
+            {
+                "title": "When The Party's Over - Billie Eilish",
+                "spotify": "https://open.spotify.com/track/43zdsphuZLzwA9k4DJhU0I",
+                "youtube": "https://www.youtube.com/watch?v=pbMwTqkKSps"
+            }
+        ]
+    },
+    "Angry & Empowered": {
+        "description": "Channel your anger into empowerment and strength",
+        "songs": [
+            {
+                "title": "Since U Been Gone - Kelly Clarkson",
+                "spotify": "https://open.spotify.com/track/4TQqhwM4XZfEYSRQOGV6oh",
+                "youtube": "https://www.youtube.com/watch?v=R7UrFYvl5TE"
+            },
+            {
+                "title": "Stronger - Kanye West",
+                "spotify": "https://open.spotify.com/track/4fzsfWzRhPawzqhX8Qt9F3",
+                "youtube": "https://www.youtube.com/watch?v=PsO6ZnUZI0g"
+            },
+            {
+                "title": "We Are Never Getting Back Together - Taylor Swift",
+                "spotify": "https://open.spotify.com/track/5YqltLsjdqFtvqE7Nrysvs",
+                "youtube": "https://www.youtube.com/watch?v=WA4iX5D9Z64"
+            },
+            {
+                "title": "Good As Hell - Lizzo",
+                "spotify": "https://open.spotify.com/track/3HVWdVOQ0ZA45FuZGSfvns",
+                "youtube": "https://www.youtube.com/watch?v=SmbmeOgWsqE"
+            },
+            {
+                "title": "Truth Hurts - Lizzo",
+                "spotify": "https://open.spotify.com/track/5qmq61PeM4Y5dSQiYn9l1p",
+                "youtube": "https://www.youtube.com/watch?v=P00HMxdsVZI"
+            }
+        ]
+    },
+    "Healing & Moving On": {
+        "description": "Songs for finding peace and moving forward with confidence",
+        "songs": [
+            {
+                "title": "Flowers - Miley Cyrus",
+                "spotify": "https://open.spotify.com/track/0yLdNVWF3Srea0uzk55zFn",
+                "youtube": "https://www.youtube.com/watch?v=G7KNmW9a75Y"
+            },
+            {
+                "title": "New Rules - Dua Lipa",
+                "spotify": "https://open.spotify.com/track/2ekn2ttSfGqwhhate0LSR0",
+                "youtube": "https://www.youtube.com/watch?v=k2qgadSvNyU"
+            },
+            {
+                "title": "Survivor - Destiny's Child",
+                "spotify": "https://open.spotify.com/track/7M9gKngVEKKoSjQS6OU5Ck",
+                "youtube": "https://www.youtube.com/watch?v=Wmc8bQoL-J0"
+            },
+            {
+                "title": "Unwritten - Natasha Bedingfield",
+                "spotify": "https://open.spotify.com/track/6oSXNfHQgziUwfT7E25tBM",
+                "youtube": "https://www.youtube.com/watch?v=b7k0a5hYnSI"
+            },
+            {
+                "title": "Fight Song - Rachel Platten",
+                "spotify": "https://open.spotify.com/track/5ykquqsGJaAO4uxLfRYPIk",
+                "youtube": "https://www.youtube.com/watch?v=xo1VInw-SKc"
+            }
+        ]
+    },
+    "Self-Love Anthems": {
+        "description": "Celebrate yourself and remember your worth",
+        "songs": [
+            {
+                "title": "Love Myself - Hailee Steinfeld",
+                "spotify": "https://open.spotify.com/track/6DK3kHsJMD3PpFg83dpm5B",
+                "youtube": "https://www.youtube.com/watch?v=bMpFmHSgC4Q"
+            },
+            {
+                "title": "Scars To Your Beautiful - Alessia Cara",
+                "spotify": "https://open.spotify.com/track/0prNGof3XqfTvNDxHonvdK",
+                "youtube": "https://www.youtube.com/watch?v=MWASeaYuHZo"
+            },
+            {
+                "title": "Born This Way - Lady Gaga",
+                "spotify": "https://open.spotify.com/track/0lPQA9gKoZFvdDHLt5a8LF",
+                "youtube": "https://www.youtube.com/watch?v=wV1FrqwZyKw"
+            },
+            {
+                "title": "Confident - Demi Lovato",
+                "spotify": "https://open.spotify.com/track/1Irgqw8mSjHaEbIXi4nAhN",
+                "youtube": "https://www.youtube.com/watch?v=cwKgxxYN-_U"
+            },
+            {
+                "title": "Beautiful - Christina Aguilera",
+                "spotify": "https://open.spotify.com/track/6bxhCLjZ5N1TLJ0aJesPPQ",
+                "youtube": "https://www.youtube.com/watch?v=eAfyFTzZDMM"
+            }
+        ]
+    }
+}
+
+_APP_CSS = """
+    <style>
+    .main-header {
+        text-align: center;
+        padding: 20px;
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        border-radius: 10px;
+        color: white;
+        margin-bottom: 30px;
+    }
+    .quote-box {
+        padding: 25px;
+        background: #ffffff;
+        border-left: 5px solid #667eea;
+        border-radius: 5px;
+        margin: 20px 0;
+        font-style: italic;
+        color: #2c3e50;
+        font-size: 18px;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+    }
+    .crisis-box {
+        background: linear-gradient(135deg, #ff6b6b 0%, #ee5a6f 100%);
+        color: white;
+        border-radius: 10px;
+        padding: 20px;
+        margin: 15px 0;
+        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+    }
+    .crisis-box h4 {
+        color: white;
+        margin-top: 0;
+        font-size: 18px;
+    }
+    .crisis-box a {
+        color: #fff3cd;
+        text-decoration: underline;
+    }
+    .agent-card {
+        background: #f8f9fa;
+        border: 2px solid #dee2e6;
+        border-radius: 10px;
+        padding: 15px;
+        margin: 10px 0;
+        cursor: pointer;
+        transition: all 0.3s;
+    }
+    .agent-card:hover {
+        border-color: #667eea;
+        box-shadow: 0 4px 8px rgba(102, 126, 234, 0.2);
+    }
+    .agent-card.active {
+        border-color: #667eea;
+        background: #e8eaf6;
+    }
+    .chat-message {
+        padding: 20px;
+        border-radius: 15px;
+        margin: 15px 0;
+        line-height: 1.6;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+    }
+    .user-message {
+        background: #ffffff;
+        border: 2px solid #667eea;
+        margin-left: 15%;
+        color: #2c3e50;
+    }
+    .ai-message {
+        background: #ffffff;
+        border: 2px solid #95a5a6;
+        margin-right: 15%;
+        color: #2c3e50;
+    }
+    .chat-message b {
+        color: #667eea;
+        font-size: 16px;
+    }
+    </style>
+"""
+
+
+
+def _compact_css(css: str) -> str:
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};])\s*", r"\1", css).strip()
+
+
+APP_CSS = _compact_css(_APP_CSS)
+
+HEADER_HTML = """
+    <div class="main-header">
+        <h1>💔 HeartMend AI</h1>
+        <p>Your AI companion for healing and growth</p>
+    </div>
+"""
+
+FOOTER_HTML = """
+    <div style='text-align: center'>
+        <p>Made with ❤️ by HeartMend AI</p>
+        <p>Remember: Healing isn't linear, but you're making progress! 🌱</p>
+    </div>
+"""
+
+CRISIS_BOX_HTML = """
+    <div class="crisis-box">
+        <h4>🆘 In Crisis? Get Help Now</h4>
+        <p style="margin: 10px 0;"><b>🇺🇸 US Crisis Line:</b><br>Call/Text <b>988</b></p>
+        <p style="margin: 10px 0;"><b>💬 Crisis Text Line:</b><br>Text <b>HOME</b> to <b>741741</b></p>
+        <p style="margin: 10px 0;"><b>🌍 International:</b><br><a href="https://findahelpline.com" target="_blank">findahelpline.com</a></p>
+    </div>
+"""
+
+QUOTE_HTML = tuple(f"""
+    <div class="quote-box">
+        {quote}
+    </div>
+""" for quote in RECOVERY_QUOTES)
+
+
+def _playlist_markdown(playlist: dict) -> str:
+    lines = [f"*{playlist['description']}*", "---"]
+    for idx, song in enumerate(playlist["songs"], 1):
+        lines.append(f"**{idx}. {song['title']}** · [🎵 Spotify]({song['spotify']}) · [▶️ YouTube]({song['youtube']})")
+    return "\n\n".join(lines)
+
+
+# One markdown block per playlist instead of a row of columns per song
+PLAYLIST_MARKDOWN = {mood: _playlist_markdown(playlist) for mood, playlist in PLAYLIST_MOODS.items()}
@@ -0,0 +1,66 @@
+"""Per-user bearer tokens for the HTTP API
+
+A user's token is an HMAC of their id under ``HEARTMEND_API_SECRET``, so a
+token opens only that user's ``/v1/users/{user_id}`` endpoints and no token
+table is needed. Whatever signs users in (a mobile backend, an SSO proxy)
+mints tokens with the same secret:
+
+    HEARTMEND_API_SECRET=... python -m heartmend.auth alice
+"""
+import hashlib
+import hmac
+import os
+import sys
+from typing import Optional
+
+SECRET_ENV = "HEARTMEND_API_SECRET"
+
+
+class AuthError(Exception):
+    """Raised when a request's token doesn't open the user's endpoints"""
+
+    def __init__(self, message: str, status_code: int = 401):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def api_secret() -> Optional[str]:
+    return os.getenv(SECRET_ENV) or None
+
+
+def user_token(user_id: str, secret: Optional[str] = None) -> str:
+    secret = secret or api_secret()
+    if not secret:
+        raise AuthError(f"{SECRET_ENV} is not set", status_code=503)
+    return hmac.new(secret.encode("utf-8"), user_id.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def check_authorization(user_id: str, authorization: Optional[str], secret: Optional[str] = None):
+    """Raise ``AuthError`` unless ``authorization`` is ``Bearer <user_id's token>``
+
+    Without a secret configured every user endpoint is refused rather than
+    left open.
+    """
+    expected = user_token(user_id, secret)
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise AuthError("Missing bearer token")
+    if not hmac.compare_digest(token.strip(), expected):
+        raise AuthError("Invalid token for this user", status_code=403)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python -m heartmend.auth USER_ID", file=sys.stderr)
+        return 2
+    try:
+        print(user_token(argv[0]))
+    except AuthError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Batch generation of companion content from a JSONL file of prompts
+
+Each input line is ``{"id": "...", "agent": "Coach", "prompt": "..."}``
+(``id`` defaults to the line number, ``agent`` to ``--agent``). Results are
+appended to the output JSONL as they finish, so the output doubles as the
+checkpoint: rerunning the same command skips every id already written
+without an ``error`` and retries the rest.
+
+    python -m heartmend.batch prompts.jsonl out.jsonl --concurrency 8 --rpm 30
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Set, TextIO, Tuple
+
+from heartmend import core
+from heartmend.chat import run_turn
+from heartmend.fake_backend import is_fake_model
+from heartmend.resilience import CallGuard, CircuitBreaker, TokenBucket, UpstreamUnavailable, default_rpm
+
+
+def read_prompts(path: str, default_agent: str) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"prompt": item}
+            item.setdefault("id", str(line_number))
+            item.setdefault("agent", default_agent)
+            yield item
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already written successfully; drops a torn last line left by an interruption"""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if not record.get("error"):
+            done.add(str(record["id"]))
+    return done
+
+
+class Progress:
+    def __init__(self, report_every: float = 10.0):
+        self.report_every = report_every
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            if record.get("error"):
+                self.failed += 1
+            else:
+                self.ok += 1
+                self.tokens += record.get("metrics", {}).get("tokens", 0)
+            now = time.monotonic()
+            if now - self.last_report >= self.report_every:
+                self.last_report = now
+                print(self.line(), file=sys.stderr)
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "completed": self.ok,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "seconds": round(elapsed, 2),
+            "items_per_sec": round(self.ok / elapsed, 3) if elapsed else 0.0,
+            "tokens_per_sec": round(self.tokens / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def line(self) -> str:
+        s = self.summary()
+        return f"{s['completed']} done, {s['failed']} failed, {s['items_per_sec']} items/s, {s['tokens_per_sec']} tokens/s"
+
+
+class BatchRunner:
+    """Runs prompts with bounded concurrency behind one shared rate limiter"""
+
+    def __init__(self, agents: dict, model_id: str, guard: CallGuard, concurrency: int = 4, max_attempts: int = 5):
+        self.agents = agents
+        self.model_id = model_id
+        self.guard = guard
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+    def run_one(self, item: dict) -> dict:
+        record = {"id": item["id"], "agent": item["agent"], "prompt": item["prompt"]}
+        if item["agent"] not in self.agents:
+            return {**record, "error": f"Unknown agent: {item['agent']}"}
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                content, metrics = run_turn(
+                    self.agents[item["agent"]], item["agent"], self.model_id, item["prompt"], core.new_memory(),
+                    guard=self.guard,
+                )
+                return {**record, "content": content, "metrics": metrics}
+            except UpstreamUnavailable as e:
+                # Circuit open: wait out the cooldown rather than burning through the batch
+                if attempt == self.max_attempts:
+                    return {**record, "error": str(e)}
+                time.sleep(self.guard.breaker.reset_timeout)
+            except Exception as e:
+                return {**record, "error": f"{type(e).__name__}: {e}"}
+
+    def run(self, items: Iterator[dict], out: TextIO, progress: Progress, skip: Set[str]):
+        write_lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+
+        def work(item: dict):
+            try:
+                record = self.run_one(item)
+                with write_lock:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                progress.add(record)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="heartmend-batch") as pool:
+            for item in items:
+                if str(item["id"]) in skip:
+                    progress.skipped += 1
+                    continue
+                # Keep only a small window of prompts in memory, however large the input
+                slots.acquire()
+                pool.submit(work, item)
+
+
+def build_guard(model_id: str, rpm: Optional[float]) -> Tuple[CallGuard, float]:
+    rpm = default_rpm(model_id) if rpm is None else rpm
+    bucket = TokenBucket(rate=rpm / 60.0, capacity=1.0) if rpm > 0 else None
+    # Batch work waits its turn instead of being turned away like an interactive user
+    return CallGuard(bucket, CircuitBreaker(), max_queue_wait=float("inf")), rpm
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("output", help="JSONL file results are appended to (also the checkpoint)")
+    parser.add_argument("--agent", default="Coach", choices=list(core.AGENT_DESCRIPTIONS), help="default companion")
+    parser.add_argument("--model", default=core.DEFAULT_MODEL)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=None, help="requests per minute (default: the app's limit)")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    # Offline work has no latency target; run it all on one model
+    if args.model == core.AUTO_MODEL:
+        args.model = core.router.default_model
+
+    api_key = os.getenv("GROQ_API_KEY", "")
+    if not api_key and not is_fake_model(args.model):
+        parser.error("GROQ_API_KEY is not set")
+
+    agents = core.load_agents(api_key, args.model)
+    guard, rpm = build_guard(args.model, args.rpm)
+    skip = completed_ids(args.output)
+    progress = Progress(args.report_every)
+    print(f"Resuming: {len(skip)} items already done" if skip else "Starting", f"(rpm={rpm or 'unlimited'})", file=sys.stderr)
+
+    with open(args.output, "a", encoding="utf-8") as out:
+        BatchRunner(agents, args.model, guard, concurrency=args.concurrency).run(
+            read_prompts(args.input, args.agent), out, progress, skip
+        )
+    print(json.dumps(progress.summary()), file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""One chat turn, independent of the Streamlit UI"""
+import time
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+from heartmend.crisis import detect_crisis
+from heartmend.memory import ConversationMemory
+from heartmend.resilience import CallGuard
+from heartmend.response_cache import ResponseCache, instructions_hash, make_cache_key
+from heartmend.storage import format_ts, new_message_id
+from heartmend.streaming import StreamStats, run_agent_reply, stream_agent_reply
+from heartmend.tokens import estimate_tokens
+from heartmend.tracing import span, tracer
+
+if TYPE_CHECKING:
+    from heartmend.semantic import SemanticCache
+
+
+def new_message(role: str, content: str, **fields) -> dict:
+    """Build a chat message record in the shape stored in ``chat_messages``"""
+    now = time.time()
+    return {
+        "id": new_message_id(),
+        "role": role,
+        "content": content,
+        "ts": now,
+        "timestamp": format_ts(now),
+        **fields,
+    }
+
+
+def run_turn(
+    agent,
+    agent_key: str,
+    model_id: str,
+    user_input: str,
+    memory: ConversationMemory,
+    images: Optional[List] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    response_cache: Optional[ResponseCache] = None,
+    guard: Optional[CallGuard] = None,
+    context_tokens: Optional[int] = None,
+    recalled: Optional[List[str]] = None,
+    semantic_cache: Optional["SemanticCache"] = None,
+    prefetched: Optional[Tuple[str, StreamStats]] = None,
+    user_id: Optional[str] = None,
+) -> Tuple[str, dict]:
+    """Get a companion's reply to ``user_input`` and record the turn in ``memory``
+
+    Streams through ``on_delta`` when given, otherwise blocks on the full
+    reply. With a ``guard`` the model call is rate limited, retried and
+    circuit-broken; a streamed reply is only retried if nothing has been
+    shown yet. ``context_tokens`` caps the conversation context sent along
+    and ``recalled`` adds retrieved earlier exchanges to it. A
+    ``semantic_cache`` answers messages nearly identical to ``user_id``'s
+    earlier ones (never crisis messages, and never without a user).
+    ``prefetched`` is a reply already generated for exactly this prompt and
+    is used instead of calling the model.
+    Returns the reply text and the metrics stored with the message.
+    """
+    with span("build_prompt", agent_key):
+        prompt = memory.build_prompt(agent_key, user_input, context_tokens, recalled)
+
+    # Serve repeated prompts from the response cache when enabled
+    cache_key = None
+    cached_reply = None
+    similarity = None
+    if response_cache is not None and not images and prefetched is None:
+        with span("cache_lookup", agent_key):
+            cache_key = make_cache_key(agent_key, model_id, getattr(agent, "instructions", None), prompt)
+            cached_reply = response_cache.get(cache_key)
+
+    semantic_scope = None
+    if semantic_cache is not None and user_id and not images and detect_crisis(user_input) is None:
+        semantic_scope = f"{agent_key}:{instructions_hash(getattr(agent, 'instructions', None))}"
+        if cached_reply is None and prefetched is None:
+            with span("semantic_lookup", agent_key):
+                found = semantic_cache.get(user_id, semantic_scope, user_input)
+            if found is not None:
+                similarity, cached_reply = found
+
+    delivered = []
+
+    def track_delta(text: str):
+        if text:
+            delivered.append(True)
+        on_delta(text)
+
+    def generate():
+        if on_delta is not None:
+            return stream_agent_reply(agent, prompt, track_delta, images=images or None)
+        return run_agent_reply(agent, prompt, images=images or None)
+
+    if prefetched is not None:
+        reply, stats = prefetched
+        if on_delta is not None:
+            on_delta(reply)
+    elif cached_reply is not None:
+        reply = cached_reply
+        stats = StreamStats(ttft=0.0, total=0.0, tokens=estimate_tokens(reply))
+    else:
+        with span("model_call", agent_key, model=model_id, stream=on_delta is not None):
+            if guard is not None:
+                reply, stats = guard.call(generate, can_retry=lambda: not delivered)
+            else:
+                reply, stats = generate()
+        # A stream that produced no text has no first token to time
+        if on_delta is not None and stats.ttft is not None:
+            tracer.record("first_token", stats.ttft, agent_key)
+
+    # A failed run raised above, so only replies the model actually gave get here
+    if cached_reply is None and reply.strip():
+        if cache_key is not None:
+            response_cache.set(cache_key, reply)
+        if semantic_scope is not None:
+            semantic_cache.add(user_id, semantic_scope, user_input, reply)
+
+    memory.add_turn("user", user_input)
+    memory.add_turn("assistant", reply, agent_key)
+    metrics = turn_metrics(stats, prompt, model_id, cached=cached_reply is not None)
+    if similarity is not None:
+        metrics["similarity"] = round(similarity, 3)
+    if prefetched is not None:
+        metrics["prefetched"] = True
+    return reply, metrics
+
+
+def turn_metrics(stats: StreamStats, prompt: str, model_id: str, cached: bool = False) -> dict:
+    """Metrics stored with a reply; token counts fall back to estimates when the model reports none"""
+    metrics = stats.as_dict()
+    metrics["prompt_tokens"] = stats.input_tokens or estimate_tokens(prompt)
+    metrics["completion_tokens"] = stats.output_tokens or stats.tokens
+    metrics["usage_reported"] = stats.input_tokens is not None
+    metrics["model"] = model_id
+    metrics["cached"] = cached
+    return metrics
@@ -0,0 +1,180 @@
+"""Bounded, prioritized queue of chat requests served by a shared worker pool
+
+Callers submit a ``ChatJob`` and return at once; the Streamlit app polls the
+job for its partial reply and the API awaits its future, so no script or
+event-loop thread waits on the model.
+
+Scheduling is strict by priority (crisis messages first), then round-robin
+across sessions within a priority, so one session sending a burst can't
+starve the others. A session's jobs run one at a time and in order, since
+they share its conversation memory. Submissions beyond ``max_depth`` queued
+jobs, or ``max_per_session`` for one session, are refused with ``QueueFull``.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+from heartmend.resilience import UpstreamUnavailable
+from heartmend.tracing import tracer
+
+WORKERS = int(os.getenv("HEARTMEND_CHAT_WORKERS", "16"))
+MAX_DEPTH = int(os.getenv("HEARTMEND_CHAT_QUEUE_SIZE", "256"))
+MAX_PER_SESSION = int(os.getenv("HEARTMEND_CHAT_QUEUE_PER_SESSION", "2"))
+
+CRISIS, CHAT, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {CRISIS: "crisis", CHAT: "chat", BACKGROUND: "background"}
+
+
+class QueueFull(UpstreamUnavailable):
+    """Raised when the queue, or one session's share of it, is full"""
+
+
+@dataclass(eq=False)
+class ChatJob:
+    session_id: str
+    priority: int
+    fn: Callable[["ChatJob"], object]
+    future: Future = field(default_factory=Future)
+    submitted: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None
+    # Reply so far when streaming, and the records created so far
+    partial: str = ""
+    messages: List[dict] = field(default_factory=list)
+    # Set when the job is cancelled after it started; its result is unwanted
+    dropped: bool = False
+
+    def on_delta(self, text: str):
+        self.partial = text
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+
+class ChatQueue:
+    def __init__(self, workers: int = WORKERS, max_depth: int = MAX_DEPTH, max_per_session: int = MAX_PER_SESSION):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_per_session = max_per_session
+        self._queues: Dict[int, "OrderedDict[str, Deque[ChatJob]]"] = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._active: Set[str] = set()
+        self._threads: List[threading.Thread] = []
+        self._cond = threading.Condition()
+        self._depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    def submit(self, session_id: str, fn: Callable[[ChatJob], object], priority: int = CHAT) -> ChatJob:
+        """Queue ``fn(job)`` for ``session_id``; its return value or exception resolves ``job.future``"""
+        job = ChatJob(session_id, priority, fn)
+        with self._cond:
+            if self._depth >= self.max_depth:
+                self.rejected += 1
+                raise QueueFull("We're getting a lot of messages right now. Please try again in a moment.")
+            pending = sum(len(sessions.get(session_id, ())) for sessions in self._queues.values())
+            if pending + (session_id in self._active) >= self.max_per_session:
+                self.rejected += 1
+                raise QueueFull("Your previous message is still being answered.")
+            self._queues[priority].setdefault(session_id, deque()).append(job)
+            self._depth += 1
+            self.submitted += 1
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"heartmend-chat-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return job
+
+    def _next_locked(self) -> Optional[ChatJob]:
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            for session_id, jobs in sessions.items():
+                if session_id in self._active:
+                    continue
+                job = jobs.popleft()
+                # Served sessions go to the back of the line
+                if jobs:
+                    sessions.move_to_end(session_id)
+                else:
+                    del sessions[session_id]
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_locked()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_locked()
+                self._depth -= 1
+                self._active.add(job.session_id)
+            job.started = time.monotonic()
+            tracer.record("chat_queue_wait", job.started - job.submitted, PRIORITY_NAMES[job.priority])
+            failed = False
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.fn(job))
+                except BaseException as e:
+                    failed = True
+                    job.future.set_exception(e)
+            with self._cond:
+                self._active.discard(job.session_id)
+                self.completed += 1
+                self.failed += failed
+                # The session's next job, if any, can run now
+                self._cond.notify_all()
+
+    def cancel(self, job: ChatJob) -> bool:
+        """Drop a job that hasn't started; running jobs finish, marked ``dropped``"""
+        with self._cond:
+            jobs = self._queues[job.priority].get(job.session_id)
+            if jobs is None or job not in jobs:
+                if not job.done:
+                    job.dropped = True
+                return False
+            jobs.remove(job)
+            if not jobs:
+                del self._queues[job.priority][job.session_id]
+            self._depth -= 1
+            self.cancelled += 1
+        job.future.cancel()
+        return True
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._cond:
+            heads = [jobs[0].submitted for sessions in self._queues.values() for jobs in sessions.values()]
+            stats = {
+                "depth": self._depth,
+                "running": len(self._active),
+                "workers": self.workers,
+                "oldest_wait_seconds": round(now - min(heads), 3) if heads else 0.0,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                stats[f"depth_{name}"] = sum(len(jobs) for jobs in self._queues[priority].values())
+            return stats
+
+
+_chat_queue: Optional[ChatQueue] = None
+_chat_queue_lock = threading.Lock()
+
+
+def get_chat_queue() -> ChatQueue:
+    global _chat_queue
+    with _chat_queue_lock:
+        if _chat_queue is None:
+            _chat_queue = ChatQueue()
+        return _chat_queue
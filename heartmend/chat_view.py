@@ -0,0 +1,76 @@
+"""Paged chat rendering with per-message HTML caching"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+DEFAULT_PAGE_SIZE = 20
+MAX_CACHED_MESSAGES = 10000
+
+
+class HtmlCache:
+    """Bounded LRU of rendered HTML keyed by message id
+
+    Committed messages never change, so each one is formatted once per
+    process instead of on every rerun.
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHED_MESSAGES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Optional[str], build: Callable[[], str]) -> str:
+        if key is None:
+            return build()
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                return html
+        html = build()
+        with self._lock:
+            self._entries[key] = html
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_chat_html = HtmlCache()
+_history_markdown = HtmlCache()
+
+
+def user_message_html(content: str) -> str:
+    return f'<div class="chat-message user-message"><b>You:</b><br>{content}</div>'
+
+
+def ai_message_html(agent: str, content: str, agent_descriptions: Dict[str, dict]) -> str:
+    agent_emoji = agent_descriptions.get(agent, {}).get("emoji", "🤖")
+    agent_name = agent_descriptions.get(agent, {}).get("name", "AI")
+    return f'<div class="chat-message ai-message"><b>{agent_emoji} {agent_name}:</b><br>{content}</div>'
+
+
+def message_html(message: dict, agent_descriptions: Dict[str, dict]) -> str:
+    """Chat bubble HTML for ``message``, cached by its id"""
+    def build():
+        if message["role"] == "user":
+            return user_message_html(message["content"])
+        return ai_message_html(message.get("agent", ""), message["content"], agent_descriptions)
+
+    return _chat_html.get_or_build(message.get("id"), build)
+
+
+def history_markdown(message: dict) -> str:
+    """Markdown for one History tab entry, cached by message id"""
+    def build():
+        role = "You" if message["role"] == "user" else message.get("agent", "AI")
+        return f"**{role}:** {message['content']}"
+
+    return _history_markdown.get_or_build(message.get("id"), build)
+
+
+def page_count(total: int, page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    return max(1, -(-total // page_size))
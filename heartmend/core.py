@@ -0,0 +1,501 @@
+"""Companion, chat, mood and export logic shared by the UI, API and tools"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from heartmend.agent_registry import get_agents
+from heartmend.chat import new_message, run_turn
+from heartmend.crisis import CRISIS_AGENT, CrisisMatch, detect_crisis
+from heartmend.fake_backend import build_fake_agents, is_fake_model
+from heartmend.memory import ConversationMemory
+from heartmend.resilience import get_guard
+from heartmend.response_cache import get_response_cache
+from heartmend.routing import ModelProfile, ModelRouter, classify
+from heartmend.storage import HistoryStore, format_ts, get_store
+from heartmend.tracing import span
+from heartmend.usage import UsageLedger, local_day
+
+# Available Groq models (Vision models can handle both text and images)
+GROQ_MODELS = {
+    "Llama 3.3 70B": "llama-3.3-70b-versatile",
+    "Llama 3.1 8B": "llama-3.1-8b-instant",
+    "Llama 4 Maverick": "meta-llama/llama-4-maverick-17b-128e-instruct",
+    "Llama 4 Scout": "meta-llama/llama-4-scout-17b-16e-instruct",
+}
+
+# Speed tier and image support, used to route each message to a model
+MODEL_PROFILES = [
+    ModelProfile(GROQ_MODELS["Llama 3.3 70B"]),
+    ModelProfile(GROQ_MODELS["Llama 3.1 8B"], fast=True),
+    ModelProfile(GROQ_MODELS["Llama 4 Maverick"], vision=True),
+    ModelProfile(GROQ_MODELS["Llama 4 Scout"], fast=True, vision=True),
+]
+
+# Model id meaning "pick a model per message"
+AUTO_MODEL = "auto"
+
+router = ModelRouter(MODEL_PROFILES, default_model=GROQ_MODELS["Llama 3.3 70B"])
+
+# Every message goes to this model unless HEARTMEND_MODEL names another,
+# "auto" to route per message, or fake for the offline backend
+DEFAULT_MODEL = os.getenv("HEARTMEND_MODEL", GROQ_MODELS["Llama 3.3 70B"])
+
+# Messages with images go to a vision model; the default text model can't read them
+VISION_MODEL = GROQ_MODELS["Llama 4 Scout"]
+
+# Sessions over their daily token budget fall back to this smaller model
+BUDGET_MODEL = os.getenv("HEARTMEND_BUDGET_MODEL", GROQ_MODELS["Llama 3.1 8B"])
+
+AGENT_DESCRIPTIONS = {
+    "Therapist": {
+        "emoji": "🤗",
+        "name": "Empathetic Therapist",
+        "description": "Validates feelings and provides emotional support"
+    },
+    "Closure": {
+        "emoji": "✍️",
+        "name": "Closure Specialist",
+        "description": "Helps with emotional release and moving forward"
+    },
+    "Coach": {
+        "emoji": "📅",
+        "name": "Recovery Coach",
+        "description": "Creates actionable recovery plans and routines"
+    },
+    "Honest": {
+        "emoji": "💪",
+        "name": "Straight Talker",
+        "description": "Provides direct, honest perspective"
+    }
+}
+
+AGENT_INSTRUCTIONS = {
+    "Therapist": [
+        "You are an empathetic therapist for breakup recovery.",
+        "Listen with empathy and validate feelings without judgment.",
+        "Use gentle humor when appropriate to lighten the mood.",
+        "Share relatable experiences and offer comforting words.",
+        "Analyze both text and images (if provided) for emotional context.",
+        "Keep responses conversational, warm, and supportive."
+    ],
+    "Closure": [
+        "You help people find emotional closure after breakups.",
+        "Create templates for unsent messages to express feelings.",
+        "Guide users through emotional release exercises.",
+        "Suggest closure rituals and moving forward strategies.",
+        "Be heartfelt, authentic, and understanding.",
+        "Keep responses conversational and actionable."
+    ],
+    "Coach": [
+        "You are a recovery coach focused on practical action.",
+        "Design daily recovery challenges and self-care routines.",
+        "Suggest social media detox strategies when needed.",
+        "Create empowering daily activities and habits.",
+        "Focus on actionable steps and positive momentum.",
+        "Keep responses practical, encouraging, and conversational."
+    ],
+    "Honest": [
+        "You provide honest, direct feedback about breakups.",
+        "Give objective analysis without sugar-coating.",
+        "Explain what went wrong clearly and factually.",
+        "Highlight growth opportunities and future potential.",
+        "Be blunt but constructive, never mean.",
+        "Keep responses conversational and empowering."
+    ],
+}
+
+AGENT_LABELS = {key: info["name"] for key, info in AGENT_DESCRIPTIONS.items()}
+
+# Offered after each companion's reply, and prefetched when HEARTMEND_PREFETCH is set
+FOLLOW_UPS = {
+    "Therapist": "Why do I still feel this way?",
+    "Closure": "Can you help me write a letter I won't send?",
+    "Coach": "What's one thing I can do tonight?",
+    "Honest": "What should I do differently next time?",
+}
+
+# Order of the mood slider; a mood's position is its score in the analytics
+MOOD_SCALE = ["Angry", "Sad", "Okay", "Good", "Great"]
+
+MOOD_EMOJIS = {
+    "Great": "😄",
+    "Good": "🙂",
+    "Okay": "😐",
+    "Sad": "😢",
+    "Angry": "😠"
+}
+
+EPOCH_DATE = date(1970, 1, 1)
+
+# Only the most recent records are kept in memory; the rest stay in the store
+CHAT_WINDOW = 50
+MOOD_WINDOW = 10
+
+
+def build_agents(api_key: str, model_choice: str) -> dict:
+    """Create the four companions on one shared Groq model client"""
+    if is_fake_model(model_choice):
+        return build_fake_agents(AGENT_DESCRIPTIONS, model_choice)
+
+    from agno.agent import Agent
+    from agno.models.groq import Groq
+    from agno.tools.duckduckgo import DuckDuckGoTools
+
+    from heartmend.search_cache import get_search_cache
+
+    model = Groq(id=model_choice, api_key=api_key)
+    agents = {}
+    for key, info in AGENT_DESCRIPTIONS.items():
+        search = key == "Honest"
+        agents[key] = Agent(
+            model=model,
+            name=info["name"],
+            tools=[DuckDuckGoTools()] if search else None,
+            # Outermost first: the trace span includes time served from the search cache
+            tool_hooks=[_tool_call_tracer(key)] + ([get_search_cache().tool_hook] if search else []),
+            instructions=AGENT_INSTRUCTIONS[key],
+            markdown=True
+        )
+    return agents
+
+
+def _tool_call_tracer(agent_key: str):
+    def trace_tool_call(function_name: str, function_call: Callable, arguments: dict):
+        with span("tool_call", agent_key, tool=function_name):
+            return function_call(**arguments)
+    return trace_tool_call
+
+
+def load_agents(api_key: str, model_choice: str) -> dict:
+    """Return the process-wide agents for this key and model, building them once
+
+    For ``AUTO_MODEL`` these are the router's default model's agents.
+    """
+    if model_choice == AUTO_MODEL:
+        model_choice = router.default_model
+    with span("initialize_agents"):
+        return get_agents(api_key, model_choice, lambda: build_agents(api_key, model_choice))
+
+
+def to_agno_images(images: List[bytes], image_format: str = "jpeg") -> list:
+    """Wrap prepared image bytes for ``Agent.run``"""
+    from agno.media import Image as AgnoImage
+    return [AgnoImage(content=data, format=image_format) for data in images]
+
+
+def get_mood_emoji(mood: str) -> str:
+    return MOOD_EMOJIS.get(mood, "😐")
+
+
+def new_memory(messages: Optional[List[dict]] = None) -> ConversationMemory:
+    return ConversationMemory.from_messages(messages or [], labels=AGENT_LABELS)
+
+
+class MemoryRegistry:
+    """Per-user conversation memory for callers without a Streamlit session
+
+    Bounded LRU; an evicted user's memory is rebuilt from their most recent
+    stored messages on next use. Each memory remembers the id of the newest
+    stored message it covers and is rebuilt when the store's differs, so a
+    worker picks up turns (or a cleared conversation) written by another.
+    """
+
+    def __init__(self, max_users: int = 1024):
+        self.max_users = max_users
+        self._memories: "OrderedDict[str, Tuple[ConversationMemory, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, store: Optional[HistoryStore] = None) -> ConversationMemory:
+        store = store or get_store()
+        last_id = store.last_message_id(user_id)
+        with self._lock:
+            entry = self._memories.get(user_id)
+            if entry is not None and entry[1] == last_id:
+                self._memories.move_to_end(user_id)
+                return entry[0]
+        memory = new_memory(store.recent_messages(user_id, CHAT_WINDOW))
+        with self._lock:
+            self._memories[user_id] = (memory, last_id)
+            self._memories.move_to_end(user_id)
+            while len(self._memories) > self.max_users:
+                self._memories.popitem(last=False)
+        return memory
+
+    def mark(self, user_id: str, memory: ConversationMemory, message_id: str):
+        """Record that ``memory`` now covers the stored message ``message_id``"""
+        with self._lock:
+            entry = self._memories.get(user_id)
+            if entry is not None and entry[0] is memory:
+                self._memories[user_id] = (memory, message_id)
+
+    def drop(self, user_id: str):
+        with self._lock:
+            self._memories.pop(user_id, None)
+
+
+memories = MemoryRegistry()
+
+usage_ledger = UsageLedger(budget_model=BUDGET_MODEL)
+
+
+def screen_message(agent_key: str, user_input: str) -> Tuple[str, Optional[CrisisMatch]]:
+    """Check for crisis language before any model call; crisis messages go to the Therapist"""
+    match = detect_crisis(user_input)
+    if match is not None:
+        return CRISIS_AGENT, match
+    return agent_key, None
+
+
+def recall_turns(user_id: str, user_input: str, memory: ConversationMemory, store: Optional[HistoryStore] = None) -> List[str]:
+    """The user's earlier exchanges most related to ``user_input`` that are no longer in ``memory``'s window"""
+    from heartmend.semantic import recall_index
+    with span("recall"):
+        in_window = {turn.content for turn in memory.turns if turn.role == "user"}
+        return recall_index.recall(user_id, user_input, store or get_store(), exclude=in_window, labels=AGENT_LABELS)
+
+
+def next_agent(agent_key: str) -> str:
+    keys = list(AGENT_DESCRIPTIONS)
+    return keys[(keys.index(agent_key) + 1) % len(keys)]
+
+
+def follow_up_suggestions(agent_key: str, user_input: str) -> List[Tuple[str, str]]:
+    """Likely next ``(agent_key, message)`` after ``agent_key`` answered ``user_input``
+
+    The same message to the next companion, or the companion's follow-up
+    question. None after crisis messages.
+    """
+    if detect_crisis(user_input) is not None:
+        return []
+    return [(next_agent(agent_key), user_input), (agent_key, FOLLOW_UPS[agent_key])]
+
+
+def prefetch_likely_replies(
+    user_id: str,
+    agent_key: str,
+    user_input: str,
+    memory: ConversationMemory,
+    model_id: str,
+    api_key: str = "",
+    store: Optional[HistoryStore] = None,
+) -> int:
+    """Start speculative replies to the suggested follow-ups; returns how many started
+
+    Prompts are built exactly as ``send_message`` will build them, so a
+    speculation is only used for the very request it guessed.
+    """
+    from heartmend.prefetch import get_prefetcher
+    prefetcher = get_prefetcher()
+    if prefetcher is None:
+        return 0
+    agents = load_agents(api_key, model_id)
+    candidates = []
+    for key, message in follow_up_suggestions(agent_key, user_input):
+        recalled = recall_turns(user_id, message, memory, store)
+        candidates.append((key, agents[key], memory.build_prompt(key, message, None, recalled)))
+    return prefetcher.replace(user_id, candidates, model_id, guard=get_guard(api_key, model_id))
+
+
+def cancel_prefetch(user_id: str):
+    from heartmend.prefetch import get_prefetcher
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        prefetcher.cancel(user_id)
+
+
+def routed_turn(
+    model_router: ModelRouter,
+    api_key: str,
+    agent_key: str,
+    user_input: str,
+    memory: ConversationMemory,
+    images: Optional[list] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    context_tokens: Optional[int] = None,
+    recalled: Optional[List[str]] = None,
+    semantic_cache=None,
+    user_id: Optional[str] = None,
+) -> Tuple[str, dict]:
+    """``run_turn`` on the model the router picks, failing over while nothing has been shown"""
+    route = classify(user_input, bool(images))
+    delivered = []
+
+    def track_delta(text: str):
+        if text:
+            delivered.append(True)
+        on_delta(text)
+
+    def attempt(model_id: str, guard):
+        return run_turn(
+            load_agents(api_key, model_id)[agent_key], agent_key, model_id, user_input, memory,
+            images=images, on_delta=track_delta if on_delta is not None else None,
+            response_cache=get_response_cache(), guard=guard, context_tokens=context_tokens,
+            recalled=recalled, semantic_cache=semantic_cache, user_id=user_id
+        )
+
+    _, (reply, metrics) = model_router.call(
+        route, lambda model_id: get_guard(api_key, model_id), attempt, can_failover=lambda: not delivered
+    )
+    metrics["route"] = route
+    return reply, metrics
+
+
+def send_message(
+    agents: dict,
+    agent_key: str,
+    model_id: str,
+    user_id: str,
+    user_input: str,
+    memory: Optional[ConversationMemory] = None,
+    images: Optional[list] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    on_message: Optional[Callable[[dict], None]] = None,
+    store: Optional[HistoryStore] = None,
+    api_key: str = "",
+    model_router: Optional[ModelRouter] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> Optional[dict]:
+    """Persist the user's message, get the companion's reply, persist and return it
+
+    ``on_message`` is called with each record as it is created, so a UI can
+    show the user's message before the reply arrives. Once ``cancelled()``
+    is true (the conversation was cleared meanwhile) nothing more is saved
+    and None is returned. Model calls share the
+    rate limit and circuit breaker for ``api_key``. With ``AUTO_MODEL`` the
+    model is picked per message by ``model_router`` (the app's by default).
+    Sessions near or over their token budget get a shorter context and then
+    a smaller model. With prefetch enabled, a reply speculated for exactly
+    this request is used, and the likely next requests are speculated on.
+    """
+    from heartmend.prefetch import get_prefetcher
+    from heartmend.semantic import get_semantic_cache
+
+    store = store or get_store()
+    with span("load_memory"):
+        memory = memory if memory is not None else memories.get(user_id, store)
+
+    plan = usage_ledger.plan(user_id, model_id, images=bool(images), store=store)
+    if plan.model_id != model_id:
+        model_id = plan.model_id
+        agents = load_agents(api_key, model_id)
+    # Retrieved context is the first thing dropped for a session over budget
+    recalled = recall_turns(user_id, user_input, memory, store) if plan.context_tokens is None else None
+    semantic_cache = get_semantic_cache()
+
+    prefetcher = get_prefetcher()
+    prefetched = None
+    if prefetcher is not None:
+        if images or plan.degraded:
+            prefetcher.cancel(user_id)
+        else:
+            with span("prefetch_take", agent_key):
+                prefetched = prefetcher.take(user_id, agent_key, memory.build_prompt(agent_key, user_input, None, recalled))
+
+    if cancelled is not None and cancelled():
+        return None
+    user_message = new_message("user", user_input)
+    store.add_message(user_id, user_message)
+    if on_message is not None:
+        on_message(user_message)
+
+    with span("turn", agent_key):
+        if prefetched is not None:
+            reply, metrics = run_turn(
+                load_agents(api_key, prefetched.model_id)[agent_key], agent_key, prefetched.model_id, user_input, memory,
+                on_delta=on_delta, recalled=recalled, semantic_cache=semantic_cache,
+                prefetched=(prefetched.reply, prefetched.stats), user_id=user_id
+            )
+            metrics["saved_seconds"] = round(prefetched.saved, 3)
+        elif model_id == AUTO_MODEL:
+            reply, metrics = routed_turn(
+                model_router or router, api_key, agent_key, user_input, memory,
+                images=images, on_delta=on_delta, context_tokens=plan.context_tokens,
+                recalled=recalled, semantic_cache=semantic_cache, user_id=user_id
+            )
+        else:
+            reply, metrics = run_turn(
+                agents[agent_key], agent_key, model_id, user_input, memory,
+                images=images, on_delta=on_delta, response_cache=get_response_cache(),
+                guard=get_guard(api_key, model_id), context_tokens=plan.context_tokens,
+                recalled=recalled, semantic_cache=semantic_cache, user_id=user_id
+            )
+    if plan.degraded:
+        metrics["budget"] = plan.level
+    usage_ledger.record(user_id, agent_key, metrics, store)
+    if cancelled is not None and cancelled():
+        return None
+
+    reply_message = new_message("assistant", reply, agent=agent_key, metrics=metrics)
+    store.add_message(user_id, reply_message)
+    memories.mark(user_id, memory, reply_message["id"])
+    if on_message is not None:
+        on_message(reply_message)
+    if prefetcher is not None and not images and not plan.degraded:
+        prefetch_likely_replies(user_id, agent_key, user_input, memory, metrics["model"], api_key, store)
+    return reply_message
+
+
+def add_mood_entry(user_id: str, mood: str, note: str = "", store: Optional[HistoryStore] = None) -> dict:
+    """Record a mood and return it in the shape kept in ``mood_tracker``"""
+    if mood not in MOOD_EMOJIS:
+        raise ValueError(f"Unknown mood: {mood}")
+    now = time.time()
+    (store or get_store()).add_mood(user_id, now, mood, note)
+    return {"date": format_ts(now), "mood": mood, "note": note, "ts": now}
+
+
+def mood_summary(user_id: str, last_days: Optional[int] = None, store: Optional[HistoryStore] = None):
+    """Trend statistics over the user's whole mood history, or None before the first entry"""
+    from heartmend.mood_analytics import analytics
+    return analytics.summary(user_id, store or get_store(), last_days=last_days)
+
+
+def usage_report(user_id: str, days: int = 7, group_by: str = "agent", store: Optional[HistoryStore] = None) -> dict:
+    """Token usage over the last ``days`` local days, grouped by agent, model or day"""
+    store = store or get_store()
+    rows = store.usage_totals(user_id, since_day=local_day(time.time()) - days + 1, group_by=group_by)
+    if group_by == "day":
+        rows = [{**row, "day": (EPOCH_DATE + timedelta(days=row["day"])).isoformat()} for row in rows]
+    return {
+        "used_today": usage_ledger.used_today(user_id, store),
+        "budget": usage_ledger.budget,
+        "group_by": group_by,
+        "rows": rows,
+    }
+
+
+def clear_conversation(user_id: str, store: Optional[HistoryStore] = None):
+    from heartmend.semantic import get_semantic_cache, recall_index
+    (store or get_store()).clear_messages(user_id)
+    memories.drop(user_id)
+    recall_index.drop(user_id)
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        semantic_cache.drop(user_id)
+
+
+def export_key(user_id: str, store: Optional[HistoryStore] = None) -> str:
+    """Digest that changes whenever the user's conversation does"""
+    from heartmend.pdf_export import conversation_digest
+    store = store or get_store()
+    return conversation_digest(user_id, store.count_messages(user_id), store.last_message_id(user_id))
+
+
+def start_export(user_id: str, timestamp: str, store: Optional[HistoryStore] = None):
+    """Start (or reuse) a background PDF export of the user's full conversation"""
+    from heartmend.pdf_export import get_exporter
+    store = store or get_store()
+    return get_exporter().submit(
+        export_key(user_id, store),
+        lambda: store.iter_messages(user_id),
+        timestamp,
+        total=store.count_messages(user_id)
+    )
+
+
+def get_export(user_id: str, store: Optional[HistoryStore] = None):
+    from heartmend.pdf_export import get_exporter
+    return get_exporter().get(export_key(user_id, store))
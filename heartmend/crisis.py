@@ -0,0 +1,128 @@
+"""Local crisis-language screening that runs before any model call"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PHRASES_PATH = os.getenv(
+    "HEARTMEND_CRISIS_PHRASES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "crisis_phrases.txt"),
+)
+
+CRISIS_RESOURCES = [
+    {"name": "US Crisis Line", "contact": "Call or text 988"},
+    {"name": "Crisis Text Line", "contact": "Text HOME to 741741"},
+    {"name": "International", "contact": "https://findahelpline.com"},
+]
+
+CRISIS_AGENT = "Therapist"
+
+
+@dataclass(frozen=True)
+class CrisisMatch:
+    phrase: str
+    category: str
+
+
+def _inflections(word: str) -> List[str]:
+    """``word`` and its -s, -ed and -ing forms, spelled the common ways"""
+    if word.endswith("ie"):
+        return [word, word + "s", word + "d", word[:-2] + "ying"]
+    if word.endswith("e"):
+        return [word, word + "s", word + "d", word[:-1] + "ing"]
+    forms = [word, word + "s", word + "ed", word + "ing"]
+    # Short consonant-vowel-consonant verbs double the last letter: cut, cutting
+    if 3 <= len(word) <= 4 and word[-1] not in "aeiouwxy" and word[-2] in "aeiou" and word[-3] not in "aeiou":
+        forms += [word + word[-1] + "ed", word + word[-1] + "ing"]
+    return forms
+
+
+def expand_phrase(phrase: str) -> List[str]:
+    """Every spelling of ``phrase``; a word ending in ``*`` also matches its inflections"""
+    variants = [""]
+    for word in phrase.split(" "):
+        forms = _inflections(word[:-1]) if word.endswith("*") else [word]
+        variants = [f"{prefix} {form}" if prefix else form for prefix in variants for form in forms]
+    return variants
+
+
+def load_phrases(path: str = PHRASES_PATH) -> List[Tuple[str, str]]:
+    """Read ``category: phrase`` lines, skipping blanks and comments
+
+    Phrases with inflected words (``kill* myself``) come back as one entry
+    per spelling.
+    """
+    phrases = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            category, _, phrase = line.partition(":")
+            for variant in expand_phrase(phrase.strip().lower()):
+                phrases.append((category.strip(), variant))
+    return phrases
+
+
+_FRAGMENTS = {" ": r"\s+", "'": "['’]?", "’": "['’]?", "-": r"[-\s]?"}
+
+
+def _canonical(text: str) -> str:
+    return "".join(char for char in text.lower() if char.isalnum())
+
+
+def _trie_pattern(node: dict) -> str:
+    """Regex for a character trie; shared prefixes are written once"""
+    terminal = "" in node
+    branches = [_FRAGMENTS.get(char, re.escape(char)) + _trie_pattern(child)
+                for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if terminal:
+        # Greedy optional tail, so the longest phrase wins
+        return "(?:" + body + ")?"
+    return body
+
+
+class CrisisScreen:
+    """All phrases compiled into one trie-shaped regex, scanned in a single pass
+
+    Phrases sharing a prefix share a branch, so at each position the regex
+    follows at most one path instead of trying every phrase in turn. A match
+    maps back to its phrase through its letters and digits alone, which also
+    covers the spacing, apostrophe and hyphen variants.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, str]]):
+        self._phrases: Dict[str, Tuple[str, str]] = {}
+        trie: dict = {}
+        for category, phrase in phrases:
+            self._phrases.setdefault(_canonical(phrase), (category, phrase))
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        # Lowercasing up front is much cheaper than a case-insensitive scan
+        self._pattern = re.compile(r"\b" + _trie_pattern(trie) + r"\b")
+
+    def screen(self, text: str) -> Optional[CrisisMatch]:
+        match = self._pattern.search(text.lower())
+        if match is None:
+            return None
+        category, phrase = self._phrases[_canonical(match.group())]
+        return CrisisMatch(phrase=phrase, category=category)
+
+
+_screen: Optional[CrisisScreen] = None
+
+
+def get_screen() -> CrisisScreen:
+    global _screen
+    if _screen is None:
+        _screen = CrisisScreen(load_phrases())
+    return _screen
+
+
+def detect_crisis(text: str) -> Optional[CrisisMatch]:
+    return get_screen().screen(text)
@@ -0,0 +1,149 @@
+"""Offline stand-in for the Groq-backed agents
+
+Select it with a model id of ``fake`` or, to tune it,
+``fake:latency=0.4,tps=150,tokens=120,error=0.02,seed=7``: latency is the
+time to first token in seconds, tps the streaming token rate, tokens the
+reply length and error the probability that a run fails like a 429.
+Failures are reported the way agno reports them, as a failed run output or
+a ``RunError`` event carrying Groq's error body, not as exceptions.
+"""
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+FAKE_PREFIX = "fake"
+
+_WORDS = (
+    "it makes sense that you feel this way after everything that happened "
+    "take a slow breath and remember that healing takes time and small steps "
+    "count today you could write down one thing you are proud of and reach out "
+    "to someone who makes you feel safe you deserve care and patience"
+).split()
+
+
+# Body of an injected failure, as Groq sends it for a rate limit
+RATE_LIMIT_BODY = json.dumps({
+    "error": {
+        "message": "Rate limit reached (injected by fake backend)",
+        "type": "tokens",
+        "code": "rate_limit_exceeded",
+    }
+})
+
+
+@dataclass
+class FakeModelConfig:
+    latency: float = 0.3
+    tps: float = 200.0
+    tokens: int = 120
+    error: float = 0.0
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_model_id(cls, model_id: str) -> "FakeModelConfig":
+        config = cls()
+        _, _, options = model_id.partition(":")
+        for option in filter(None, options.split(",")):
+            name, _, value = option.partition("=")
+            name = name.strip()
+            if name not in cls.__dataclass_fields__:
+                raise ValueError(f"Unknown fake backend option: {name}")
+            setattr(config, name, int(value) if name in ("tokens", "seed") else float(value))
+        return config
+
+
+def is_fake_model(model_id: str) -> bool:
+    return model_id == FAKE_PREFIX or model_id.startswith(FAKE_PREFIX + ":")
+
+
+@dataclass
+class FakeMetrics:
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+@dataclass
+class FakeRunResponse:
+    content: str
+    event: str = "RunResponseContent"
+    metrics: Optional[FakeMetrics] = None
+    status: str = "COMPLETED"
+    error_type: Optional[str] = None
+
+
+@dataclass
+class FakeRunOutput:
+    """Final output yielded after a stream with ``yield_run_output``; like agno's, it has no ``event``"""
+    content: str
+    metrics: FakeMetrics
+
+
+class FakeAgent:
+    """Mimics the parts of ``agno.agent.Agent.run`` the app relies on"""
+
+    def __init__(self, name: str, config: FakeModelConfig, instructions: Optional[list] = None, rng: Optional[random.Random] = None):
+        self.name = name
+        self.config = config
+        self.instructions = instructions or []
+        self._rng = rng or random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+
+    def _fail(self) -> bool:
+        with self._rng_lock:
+            return self._rng.random() < self.config.error
+
+    def _reply_words(self, message: str) -> list:
+        offset = len(message) % len(_WORDS)
+        return [_WORDS[(offset + i) % len(_WORDS)] for i in range(self.config.tokens)]
+
+    def _metrics(self, message: str, words: list) -> FakeMetrics:
+        # Roughly what a tokenizer would count: instructions plus the prompt in, one token per word out
+        prompt = " ".join(self.instructions) + " " + message
+        return FakeMetrics(input_tokens=len(prompt) // 4 + 1, output_tokens=len(words))
+
+    def run(self, message: str, stream: bool = False, yield_run_output: bool = False, **kwargs):
+        if stream:
+            return self._stream(message, yield_run_output)
+        if self._fail():
+            time.sleep(self.config.latency)
+            return FakeRunResponse(content=RATE_LIMIT_BODY, event="RunResponse", status="ERROR")
+        time.sleep(self.config.latency + self.config.tokens / self.config.tps)
+        words = self._reply_words(message)
+        return FakeRunResponse(content=" ".join(words), event="RunResponse", metrics=self._metrics(message, words))
+
+    def _stream(self, message: str, yield_run_output: bool = False) -> Iterator[FakeRunResponse]:
+        time.sleep(self.config.latency)
+        if self._fail():
+            # agno ends a failed stream with the error event, without a final run output
+            yield FakeRunResponse(content=RATE_LIMIT_BODY, event="RunError", error_type="model_provider_error")
+            return
+        words = self._reply_words(message)
+        # Sleep per small batch of tokens; per-token sleeps are dominated by timer overhead
+        batch = 4
+        for start in range(0, len(words), batch):
+            time.sleep(batch / self.config.tps)
+            chunk = words[start:start + batch]
+            yield FakeRunResponse(content=("" if start == 0 else " ") + " ".join(chunk))
+        if yield_run_output:
+            yield FakeRunOutput(content=" ".join(words), metrics=self._metrics(message, words))
+
+
+def build_fake_agents(agents: Dict[str, dict], model_id: str = FAKE_PREFIX) -> Dict[str, FakeAgent]:
+    """Build one fake agent per entry of an ``AGENT_DESCRIPTIONS``-style dict"""
+    config = FakeModelConfig.from_model_id(model_id)
+    return {
+        key: FakeAgent(
+            info.get("name", key),
+            config,
+            instructions=[info.get("description", "")],
+            rng=random.Random(None if config.seed is None else config.seed + index),
+        )
+        for index, (key, info) in enumerate(agents.items())
+    }
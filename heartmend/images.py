@@ -0,0 +1,103 @@
+"""In-memory image preparation for the vision models"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import List, Optional, Sequence
+
+# Groq's vision models gain nothing from inputs much larger than this
+MAX_IMAGE_SIDE = int(os.getenv("HEARTMEND_MAX_IMAGE_SIDE", "1024"))
+IMAGE_FORMAT = os.getenv("HEARTMEND_IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = 85
+IMAGE_WORKERS = 4
+MAX_CACHED_BYTES = 64 * 1024 * 1024
+
+
+def prepare_image(data: bytes, max_side: int = MAX_IMAGE_SIDE, image_format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> bytes:
+    """Decode, EXIF-orient, downscale and re-encode one image"""
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as img:
+        # Let the JPEG decoder skip detail we would throw away anyway
+        img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        out = BytesIO()
+        img.save(out, format=image_format, quality=quality, optimize=True)
+        return out.getvalue()
+
+
+class PreparedImageCache:
+    """Byte-bounded LRU of prepared images keyed by content hash and settings"""
+
+    def __init__(self, max_bytes: int = MAX_CACHED_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+_cache = PreparedImageCache()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="heartmend-img")
+        return _executor
+
+
+def prepare_image_cached(data: bytes, max_side: int = MAX_IMAGE_SIDE, image_format: str = IMAGE_FORMAT) -> bytes:
+    key = f"{hashlib.sha256(data).hexdigest()}:{max_side}:{image_format}"
+    prepared = _cache.get(key)
+    if prepared is None:
+        prepared = prepare_image(data, max_side, image_format)
+        _cache.set(key, prepared)
+    return prepared
+
+
+def prepare_images(images: Sequence[bytes], max_side: int = MAX_IMAGE_SIDE, image_format: str = IMAGE_FORMAT) -> List[Optional[bytes]]:
+    """Prepare images in parallel; entries that fail to decode come back as ``None``"""
+    from PIL import Image
+
+    def prepare(data):
+        try:
+            return prepare_image_cached(data, max_side, image_format)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+
+    if len(images) == 1:
+        return [prepare(images[0])]
+    return list(_get_executor().map(prepare, images))
@@ -0,0 +1,162 @@
+"""Token-bounded conversation memory shared by the companions"""
+import re
+import sys
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional
+
+from heartmend.tokens import estimate_tokens
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class Turn:
+    __slots__ = ("role", "content", "agent", "tokens")
+    role: str
+    content: str
+    agent: str
+    tokens: int
+
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    """Trim ``text`` to roughly ``max_tokens`` tokens on a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    kept = []
+    for word in words:
+        kept.append(word)
+        if estimate_tokens(" ".join(kept)) >= max_tokens:
+            break
+    return " ".join(kept[:-1] or kept) + " …"
+
+
+def extractive_summarizer(previous: str, turns: List[Turn], max_tokens: int, labels: Dict[str, str]) -> str:
+    """Fold evicted turns into the running summary without an LLM call
+
+    Keeps the first sentence of each turn and drops the oldest lines once
+    the summary exceeds ``max_tokens``.
+    """
+    lines = previous.splitlines() if previous else []
+    for turn in turns:
+        speaker = "User" if turn.role == "user" else labels.get(turn.agent, turn.agent or "Companion")
+        first_sentence = _SENTENCE_END.split(turn.content.strip(), maxsplit=1)[0]
+        lines.append(f"- {speaker}: {clip_tokens(first_sentence, 40)}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """Sliding window of recent turns plus a rolling summary of older ones
+
+    The window is capped at ``window_tokens``. When it overflows, the oldest
+    turns are evicted down to ``low_water`` of the budget and folded into the
+    summary in one step, so the summarizer runs only on overflow and never
+    re-reads turns it has already absorbed.
+    """
+
+    def __init__(
+        self,
+        window_tokens: int = 1500,
+        summary_tokens: int = 300,
+        other_agent_tokens: int = 80,
+        low_water: float = 0.75,
+        labels: Optional[Dict[str, str]] = None,
+        summarizer: Optional[Callable[[str, List[Turn], int, Dict[str, str]], str]] = None,
+    ):
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        self.other_agent_tokens = other_agent_tokens
+        self.low_water = low_water
+        self.labels = labels or {}
+        self.summarizer = summarizer or extractive_summarizer
+        self.summary = ""
+        self.turns: Deque[Turn] = deque()
+        self.window_used = 0
+        self.summarized_turns = 0
+
+    def add_turn(self, role: str, content: str, agent: str = ""):
+        turn = Turn(role=sys.intern(role), content=content, agent=sys.intern(agent), tokens=estimate_tokens(content))
+        self.turns.append(turn)
+        self.window_used += turn.tokens
+        if self.window_used > self.window_tokens:
+            self._compact()
+
+    def _compact(self):
+        target = int(self.window_tokens * self.low_water)
+        evicted = []
+        # Always keep the newest turn, even if it alone exceeds the budget
+        while len(self.turns) > 1 and self.window_used > target:
+            turn = self.turns.popleft()
+            self.window_used -= turn.tokens
+            evicted.append(turn)
+        if evicted:
+            self.summary = self.summarizer(self.summary, evicted, self.summary_tokens, self.labels)
+            self.summarized_turns += len(evicted)
+
+    def view(self, agent: str) -> List[str]:
+        """Render the window as seen by ``agent``
+
+        The agent's own replies and the user's messages are kept verbatim;
+        replies from the other companions are clipped so switching agents
+        does not replay their full answers.
+        """
+        lines = []
+        for turn in self.turns:
+            if turn.role == "user":
+                lines.append(f"User: {turn.content}")
+            elif turn.agent == agent:
+                lines.append(f"You ({self.labels.get(agent, agent)}): {turn.content}")
+            else:
+                label = self.labels.get(turn.agent, turn.agent or "Companion")
+                lines.append(f"{label}: {clip_tokens(turn.content, self.other_agent_tokens)}")
+        return lines
+
+    def build_prompt(
+        self, agent: str, message: str, max_context_tokens: Optional[int] = None, recalled: Optional[List[str]] = None
+    ) -> str:
+        """Wrap ``message`` with the summary and the agent's view of recent turns
+
+        ``max_context_tokens`` caps the context around the message: the newest
+        turns are kept first and the summary is clipped to whatever is left.
+        ``recalled`` adds earlier exchanges retrieved from outside the window.
+        """
+        if not self.turns and not self.summary and not recalled:
+            return message
+        summary = self.summary
+        recent = self.view(agent)
+        if max_context_tokens is not None:
+            kept, used = [], 0
+            for line in reversed(recent):
+                used += estimate_tokens(line)
+                if used > max_context_tokens:
+                    break
+                kept.append(line)
+            recent = kept[::-1]
+            remaining = max_context_tokens - sum(estimate_tokens(line) for line in recent)
+            summary = clip_tokens(summary, remaining) if summary and remaining > 0 else ""
+        sections = []
+        if summary:
+            sections.append(f"Summary of earlier conversation:\n{summary}")
+        if recalled:
+            sections.append("Related earlier moments:\n" + "\n\n".join(recalled))
+        if recent:
+            sections.append("Recent conversation:\n" + "\n\n".join(recent))
+        sections.append(f"Current message from the user:\n{message}")
+        return "\n\n".join(sections)
+
+    def clear(self):
+        self.summary = ""
+        self.turns.clear()
+        self.window_used = 0
+        self.summarized_turns = 0
+
+    @classmethod
+    def from_messages(cls, messages: List[dict], **kwargs) -> "ConversationMemory":
+        """Rebuild memory from ``chat_messages``-shaped dicts"""
+        memory = cls(**kwargs)
+        for msg in messages:
+            memory.add_turn(msg["role"], msg["content"], msg.get("agent", ""))
+        return memory
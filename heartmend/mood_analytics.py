@@ -0,0 +1,249 @@
+"""Columnar mood history and vectorized trend statistics"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from heartmend.core import MOOD_SCALE
+
+MOOD_CODES = {mood: code for code, mood in enumerate(MOOD_SCALE)}
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+DAY = 86400
+ROLLING_DAYS = 7
+
+
+class Series:
+    """Append-only timestamps and int8 values in geometrically grown NumPy buffers
+
+    Rows are kept in insertion order, not time order; ``last_id`` is the
+    store row id of the newest one loaded.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._ts = np.empty(capacity, dtype=np.float64)
+        self._values = np.empty(capacity, dtype=np.int8)
+        self._size = 0
+        self.last_id = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def ts(self) -> np.ndarray:
+        return self._ts[:self._size]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[:self._size]
+
+    def extend(self, ts: np.ndarray, values: np.ndarray, last_id: int):
+        needed = self._size + len(ts)
+        if needed > len(self._ts):
+            capacity = max(needed, 2 * len(self._ts))
+            self._ts = np.resize(self._ts, capacity)
+            self._values = np.resize(self._values, capacity)
+        self._ts[self._size:needed] = ts
+        self._values[self._size:needed] = values
+        self._size = needed
+        self.last_id = last_id
+
+
+@dataclass
+class UserHistory:
+    moods: Series = field(default_factory=Series)
+    checkins: Series = field(default_factory=Series)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def refresh(self, user_id: str, store):
+        """Pull only rows added since the last refresh"""
+        with self.lock:
+            rows = store.mood_points(user_id, self.moods.last_id)
+            if rows:
+                self.moods.extend(
+                    np.fromiter((row[1] for row in rows), np.float64, len(rows)),
+                    np.fromiter((MOOD_CODES.get(row[2], MOOD_CODES["Okay"]) for row in rows), np.int8, len(rows)),
+                    rows[-1][0],
+                )
+            rows = store.checkin_points(user_id, self.checkins.last_id)
+            if rows:
+                self.checkins.extend(
+                    np.fromiter((row[1] for row in rows), np.float64, len(rows)),
+                    np.fromiter((row[2] for row in rows), np.int8, len(rows)),
+                    rows[-1][0],
+                )
+
+
+@dataclass
+class MoodSummary:
+    days: np.ndarray                 # datetime64[D], one per calendar day in range
+    daily_mood: np.ndarray           # mean mood code per day, NaN when none logged
+    rolling_mood: np.ndarray         # trailing ROLLING_DAYS mean over logged entries
+    daily_checkin: np.ndarray        # best check-in score per day, NaN when none
+    entries: int
+    current_streak: int              # consecutive days with a mood logged, ending today
+    longest_streak: int
+    weekday_mood: np.ndarray         # mean mood code per weekday (Mon..Sun), NaN when none
+    checkin_correlation: Optional[float]
+    paired_days: int
+
+    @property
+    def best_weekday(self) -> Optional[str]:
+        if np.all(np.isnan(self.weekday_mood)):
+            return None
+        return WEEKDAYS[int(np.nanargmax(self.weekday_mood))]
+
+    @property
+    def hardest_weekday(self) -> Optional[str]:
+        if np.all(np.isnan(self.weekday_mood)):
+            return None
+        return WEEKDAYS[int(np.nanargmin(self.weekday_mood))]
+
+    def chart_data(self) -> Dict[str, np.ndarray]:
+        return {
+            "date": self.days,
+            "Mood": self.daily_mood,
+            f"{ROLLING_DAYS}-day average": self.rolling_mood,
+            "Self-care score": self.daily_checkin,
+        }
+
+    def as_dict(self) -> dict:
+        def floats(values):
+            return [None if np.isnan(v) else round(float(v), 3) for v in values]
+
+        return {
+            "entries": self.entries,
+            "days": [str(day) for day in self.days],
+            "daily_mood": floats(self.daily_mood),
+            "rolling_mood": floats(self.rolling_mood),
+            "daily_checkin": floats(self.daily_checkin),
+            "current_streak": self.current_streak,
+            "longest_streak": self.longest_streak,
+            "weekday_mood": dict(zip(WEEKDAYS, floats(self.weekday_mood))),
+            "checkin_correlation": self.checkin_correlation,
+            "paired_days": self.paired_days,
+        }
+
+
+def _local_days(ts: np.ndarray, utc_offset: float) -> np.ndarray:
+    return np.floor_divide(ts + utc_offset, DAY).astype(np.int64)
+
+
+def _runs(flags: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start indices and lengths of the True runs in a boolean array"""
+    padded = np.concatenate(([False], flags, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return edges[::2], edges[1::2] - edges[::2]
+
+
+def summarize(
+    mood_ts: np.ndarray,
+    mood_codes: np.ndarray,
+    checkin_ts: np.ndarray,
+    checkin_scores: np.ndarray,
+    now: Optional[float] = None,
+    utc_offset: Optional[float] = None,
+    last_days: Optional[int] = None,
+) -> Optional[MoodSummary]:
+    """Daily, rolling, streak, weekday and check-in statistics; None without any moods"""
+    if len(mood_ts) == 0:
+        return None
+    now = time.time() if now is None else now
+    utc_offset = time.localtime(now).tm_gmtoff if utc_offset is None else utc_offset
+
+    mood_days = _local_days(mood_ts, utc_offset)
+    today = int(_local_days(np.array([now]), utc_offset)[0])
+    first = int(mood_days.min())
+    span = max(today, int(mood_days.max())) - first + 1
+
+    offsets = mood_days - first
+    counts = np.bincount(offsets, minlength=span)
+    sums = np.bincount(offsets, weights=mood_codes, minlength=span)
+    logged = counts > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        daily_mood = np.where(logged, sums / counts, np.nan)
+
+        csum = np.concatenate(([0.0], np.cumsum(sums)))
+        ccount = np.concatenate(([0], np.cumsum(counts)))
+        lo = np.maximum(np.arange(span) - ROLLING_DAYS + 1, 0)
+        window = ccount[1:] - ccount[lo]
+        rolling = np.where(window > 0, (csum[1:] - csum[lo]) / window, np.nan)
+
+    starts, lengths = _runs(logged)
+    longest = int(lengths.max()) if len(lengths) else 0
+    ends_today = len(starts) and starts[-1] + lengths[-1] == span
+    current = int(lengths[-1]) if ends_today else 0
+
+    # 1970-01-01 was a Thursday; shift so Monday is 0
+    weekdays = (mood_days + 3) % 7
+    weekday_counts = np.bincount(weekdays, minlength=7)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weekday_mood = np.bincount(weekdays, weights=mood_codes, minlength=7) / weekday_counts
+
+    daily_checkin = np.full(span, np.nan)
+    if len(checkin_ts):
+        checkin_offsets = _local_days(checkin_ts, utc_offset) - first
+        in_range = (checkin_offsets >= 0) & (checkin_offsets < span)
+        best = np.full(span, -1.0)
+        np.maximum.at(best, checkin_offsets[in_range], checkin_scores[in_range].astype(np.float64))
+        daily_checkin = np.where(best >= 0, best, np.nan)
+
+    paired = logged & ~np.isnan(daily_checkin)
+    correlation = None
+    if paired.sum() >= 3:
+        x, y = daily_mood[paired], daily_checkin[paired]
+        if x.std() > 0 and y.std() > 0:
+            correlation = round(float(np.corrcoef(x, y)[0, 1]), 3)
+
+    days = np.arange(first, first + span).astype("datetime64[D]")
+    if last_days is not None and span > last_days:
+        keep = slice(span - last_days, span)
+        days, daily_mood, rolling, daily_checkin = days[keep], daily_mood[keep], rolling[keep], daily_checkin[keep]
+
+    return MoodSummary(
+        days=days,
+        daily_mood=daily_mood,
+        rolling_mood=rolling,
+        daily_checkin=daily_checkin,
+        entries=int(len(mood_ts)),
+        current_streak=current,
+        longest_streak=longest,
+        weekday_mood=weekday_mood,
+        checkin_correlation=correlation,
+        paired_days=int(paired.sum()),
+    )
+
+
+class MoodAnalytics:
+    """Per-user columnar histories, kept warm in a bounded LRU and topped up incrementally"""
+
+    def __init__(self, max_users: int = 256):
+        self.max_users = max_users
+        self._users: "OrderedDict[str, UserHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def history(self, user_id: str, store) -> UserHistory:
+        with self._lock:
+            history = self._users.get(user_id)
+            if history is None:
+                history = self._users[user_id] = UserHistory()
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user_id)
+        history.refresh(user_id, store)
+        return history
+
+    def summary(self, user_id: str, store, last_days: Optional[int] = None, now: Optional[float] = None) -> Optional[MoodSummary]:
+        history = self.history(user_id, store)
+        with history.lock:
+            return summarize(
+                history.moods.ts, history.moods.values,
+                history.checkins.ts, history.checkins.values,
+                now=now, last_days=last_days,
+            )
+
+
+analytics = MoodAnalytics()
@@ -0,0 +1,123 @@
+"""Concurrent fan-out of one message to several companions"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional
+
+from heartmend.resilience import CallGuard
+from heartmend.streaming import ReplyCancelled, StreamStats, stream_agent_reply
+from heartmend.tracing import span, tracer
+
+PANEL_WORKERS = int(os.getenv("HEARTMEND_PANEL_WORKERS", "16"))
+DEFAULT_TIMEOUT = float(os.getenv("HEARTMEND_PANEL_TIMEOUT", "45"))
+
+
+@dataclass
+class PanelReply:
+    agent_key: str
+    content: str = ""
+    stats: Optional[StreamStats] = None
+    error: Optional[str] = None
+    timed_out: bool = False
+    cancelled: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.timed_out and not self.cancelled
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PANEL_WORKERS, thread_name_prefix="heartmend-panel")
+        return _executor
+
+
+class Panel:
+    """Ask several agents at once and yield replies in completion order
+
+    Every agent streams on a shared worker pool with its own deadline, so
+    a panel takes about as long as its slowest member rather than the sum.
+    Workers check for cancellation between chunks and close their stream,
+    which stops generation upstream instead of just discarding the result.
+    """
+
+    def __init__(self, agents: dict, agent_keys: Iterable[str], timeouts: Optional[Dict[str, float]] = None, default_timeout: float = DEFAULT_TIMEOUT, guard: Optional[CallGuard] = None):
+        self.agents = agents
+        self.guard = guard
+        self.agent_keys = [key for key in agent_keys if key in agents]
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _run_one(self, agent_key: str, prompt: str, deadline: float, run_kwargs: dict) -> PanelReply:
+        def should_stop():
+            return self._cancelled.is_set() or time.monotonic() > deadline
+
+        def generate():
+            return stream_agent_reply(
+                self.agents[agent_key], prompt, lambda _text: None, should_stop=should_stop, **run_kwargs
+            )
+
+        try:
+            with span("model_call", agent_key, panel=True):
+                if self.guard is not None:
+                    content, stats = self.guard.call(generate, can_retry=lambda: not should_stop())
+                else:
+                    content, stats = generate()
+            if stats.ttft is not None:
+                tracer.record("first_token", stats.ttft, agent_key)
+            return PanelReply(agent_key, content=content, stats=stats)
+        except ReplyCancelled:
+            if self._cancelled.is_set():
+                return PanelReply(agent_key, cancelled=True)
+            return PanelReply(agent_key, timed_out=True, error="timed out")
+        except Exception as e:
+            return PanelReply(agent_key, error=str(e))
+
+    def run(self, prompts: Dict[str, str], **run_kwargs) -> Iterator[PanelReply]:
+        """Yield one ``PanelReply`` per agent as soon as each finishes
+
+        ``prompts`` maps agent key to the prompt it should receive. Closing
+        the generator early cancels whatever is still running.
+        """
+        start = time.monotonic()
+        executor = _get_executor()
+        futures = {}
+        for agent_key in self.agent_keys:
+            deadline = start + self.timeouts.get(agent_key, self.default_timeout)
+            future = executor.submit(self._run_one, agent_key, prompts[agent_key], deadline, run_kwargs)
+            futures[future] = agent_key
+        if not futures:
+            return
+
+        longest = max(self.timeouts.get(key, self.default_timeout) for key in self.agent_keys)
+        yielded = set()
+        try:
+            # A small grace period lets workers report their own timeouts first
+            for future in as_completed(futures, timeout=longest + 1.0):
+                yielded.add(future)
+                yield future.result()
+        except TimeoutError:
+            self.cancel()
+            for future, agent_key in futures.items():
+                if future in yielded:
+                    continue
+                # Finished between the timeout and now: still a real reply
+                if future.done() and not future.cancelled():
+                    yield future.result()
+                else:
+                    future.cancel()
+                    yield PanelReply(agent_key, timed_out=True, error="timed out")
+        finally:
+            self.cancel()
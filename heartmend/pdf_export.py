@@ -0,0 +1,270 @@
+"""PDF export of conversations, built off the request thread"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Optional
+
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+from heartmend.storage import DEFAULT_DB_PATH
+
+# Markdown emphasis/heading markers stripped from message text in one pass
+_MARKDOWN_MARKERS = re.compile(r"##|\*")
+
+# Shared by every worker using the same store
+EXPORT_DIR = os.getenv("HEARTMEND_EXPORT_DIR", os.path.join(os.path.dirname(DEFAULT_DB_PATH), "exports"))
+EXPORT_STALE_SECONDS = float(os.getenv("HEARTMEND_EXPORT_STALE_SECONDS", "600"))
+MAX_CACHED_EXPORTS = int(os.getenv("HEARTMEND_PDF_CACHE_SIZE", "16"))
+EXPORT_WORKERS = int(os.getenv("HEARTMEND_PDF_WORKERS", "2"))
+
+
+def write_pdf_report(
+    chat_history: Iterable[dict],
+    timestamp: str,
+    out,
+    total: Optional[int] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+):
+    """Render the conversation as a PDF into the file-like ``out``
+
+    ``chat_history`` may be any iterable, so callers can stream messages
+    straight from storage. Progress is reported as a fraction: the first
+    half covers laying out messages, the second half page rendering.
+    """
+    doc = SimpleDocTemplate(out, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor='purple',
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    heading_style = styles['Heading3']
+    body_style = styles['BodyText']
+    
+    story = []
+    story.append(Paragraph("💔 HeartMend AI Conversation", title_style))
+    story.append(Paragraph(f"Generated on: {timestamp}", styles['Normal']))
+    story.append(Spacer(1, 0.3*inch))
+    
+    for count, msg in enumerate(chat_history, 1):
+        role = "You" if msg["role"] == "user" else msg.get("agent", "AI")
+        story.append(Paragraph(f"<b>{role}:</b>", heading_style))
+        story.append(Paragraph(_MARKDOWN_MARKERS.sub("", msg["content"]), body_style))
+        story.append(Spacer(1, 0.2*inch))
+        if on_progress and total and count % 50 == 0:
+            on_progress(0.5 * count / total)
+    
+    story.append(Spacer(1, 0.3*inch))
+    story.append(Paragraph("Made with ❤️ by HeartMend AI", styles['Normal']))
+    
+    if on_progress:
+        size = {"total": len(story)}
+
+        def report(kind, value):
+            if kind == "SIZE_EST":
+                size["total"] = value or size["total"]
+            elif kind == "PROGRESS" and size["total"]:
+                on_progress(0.5 + 0.5 * min(value / size["total"], 1.0))
+
+        doc.setProgressCallBack(report)
+    
+    doc.build(story)
+    if on_progress:
+        on_progress(1.0)
+
+
+def create_pdf_report(chat_history: list, timestamp: str) -> BytesIO:
+    """Generate a PDF report of the conversation"""
+    buffer = BytesIO()
+    write_pdf_report(chat_history, timestamp, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def conversation_digest(*parts) -> str:
+    """Hash identifying a conversation's exact contents for export caching
+
+    Callers pass anything that changes whenever the conversation does, e.g.
+    the user id, message count and last message id, or the messages
+    themselves.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (list, tuple)):
+            for msg in part:
+                digest.update(f"{msg.get('id', '')}\x1f{msg['role']}\x1f{msg.get('agent', '')}\x1f{msg['content']}\x1e".encode("utf-8"))
+        else:
+            digest.update(f"{part}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass
+class ExportJob:
+    key: str
+    path: str
+    progress: float = 0.0
+    error: Optional[str] = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def ready(self) -> bool:
+        return self.done.is_set() and self.error is None
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class PdfExporter:
+    """Runs exports on a small thread pool and keeps finished PDFs by digest
+
+    PDFs and a small JSON state file per job live in ``directory``, which
+    defaults to sit next to the SQLite store, so any worker sharing the
+    store can report on or serve an export another worker started.
+    Re-requesting an export for an unchanged conversation returns the
+    existing job; a job whose state hasn't been updated for
+    ``stale_after`` seconds (its worker died) is started again.
+    """
+
+    def __init__(
+        self,
+        directory: str = EXPORT_DIR,
+        max_workers: int = EXPORT_WORKERS,
+        max_cached: int = MAX_CACHED_EXPORTS,
+        stale_after: float = EXPORT_STALE_SECONDS,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_cached = max_cached
+        self.stale_after = stale_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="heartmend-pdf")
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def _write_state(self, job: ExportJob, status: str):
+        tmp = self._path(job.key, f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"status": status, "progress": job.progress, "error": job.error}, f)
+        os.replace(tmp, self._path(job.key, ".json"))
+
+    def _load(self, key: str) -> Optional[ExportJob]:
+        path = self._path(key, ".json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            updated = os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None
+        job = ExportJob(key=key, path=self._path(key, ".pdf"), progress=state.get("progress", 0.0), error=state.get("error"))
+        if state.get("status") == "running":
+            if time.time() - updated > self.stale_after:
+                return None
+        elif state.get("status") == "ready" and not os.path.exists(job.path):
+            return None
+        else:
+            job.done.set()
+        return job
+
+    def get(self, key: str) -> Optional[ExportJob]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[ExportJob]:
+        # Jobs running in this process first, then any worker's shared state
+        job = self._jobs.get(key)
+        return job if job is not None else self._load(key)
+
+    def submit(self, key: str, load_messages: Callable[[], Iterable[dict]], timestamp: str, total: Optional[int] = None) -> ExportJob:
+        """Start exporting unless a job for ``key`` already exists
+
+        ``load_messages`` is called on the worker thread so reading history
+        from storage happens off the request thread too.
+        """
+        with self._lock:
+            job = self._get(key)
+            if job is not None and job.error is None:
+                return job
+            job = ExportJob(key=key, path=self._path(key, ".pdf"))
+            self._jobs[key] = job
+            self._write_state(job, "running")
+        self._executor.submit(self._run, job, load_messages, timestamp, total)
+        return job
+
+    def _run(self, job: ExportJob, load_messages, timestamp: str, total: Optional[int]):
+        part = self._path(job.key, f".{os.getpid()}.pdf.part")
+        try:
+            def on_progress(value):
+                # Shared state is rewritten every 5%, not on every callback
+                if value - job.progress >= 0.05 or value >= 1.0:
+                    job.progress = value
+                    self._write_state(job, "running")
+            with open(part, "wb") as out:
+                write_pdf_report(load_messages(), timestamp, out, total=total, on_progress=on_progress)
+            os.replace(part, job.path)
+            self._write_state(job, "ready")
+        except Exception as e:
+            job.error = str(e)
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+            self._write_state(job, "failed")
+        finally:
+            with self._lock:
+                self._jobs.pop(job.key, None)
+            self._evict()
+            job.done.set()
+
+    def _evict(self):
+        # Finished exports are evicted oldest first; stale or broken ones always go
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        except OSError:
+            return
+        finished = []
+        for name in names:
+            key = name[:-len(".json")]
+            job = self._load(key)
+            try:
+                if job is None:
+                    finished.append((0.0, key))
+                elif job.done.is_set():
+                    finished.append((os.path.getmtime(self._path(key, ".json")), key))
+            except OSError:
+                continue
+        finished.sort()
+        for _, key in finished[:max(len(finished) - self.max_cached, 0)]:
+            for suffix in (".json", ".pdf"):
+                try:
+                    os.remove(self._path(key, suffix))
+                except OSError:
+                    pass
+
+
+_exporter: Optional[PdfExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> PdfExporter:
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = PdfExporter()
+        return _exporter
@@ -0,0 +1,204 @@
+"""Opt-in speculative generation of the reply a user is likely to want next
+
+After a reply, the same message is started on the next companion and the
+first suggested follow-up on the same companion, in the background. If the
+user then asks for exactly that (same companion, same prompt), the finished
+or still running speculation is used instead of a cold model call.
+
+Speculation is strictly bounded: a fixed number of concurrent runs, an
+hourly token budget charged up front, and only while the rate limiter has
+headroom for real messages. A user's pending speculations are cancelled as
+soon as they send anything else.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from heartmend.resilience import CallGuard, TokenBucket
+from heartmend.streaming import ReplyCancelled, StreamStats, stream_agent_reply
+from heartmend.tokens import estimate_tokens
+from heartmend.tracing import span
+
+PREFETCH_ENABLED = os.getenv("HEARTMEND_PREFETCH", "").lower() in ("1", "true", "yes")
+MAX_CONCURRENT = int(os.getenv("HEARTMEND_PREFETCH_CONCURRENCY", "2"))
+TOKENS_PER_HOUR = float(os.getenv("HEARTMEND_PREFETCH_TOKENS_PER_HOUR", "200000"))
+
+# Charged against the budget per speculation on top of its prompt
+REPLY_TOKENS = 500
+# Rate limiter tokens that must stay free for real messages
+HEADROOM = 3.0
+# Finished speculations are kept this long for the user to ask for them
+TTL = 180.0
+# How long a real request waits on a matching speculation still running
+TAKE_TIMEOUT = 60.0
+
+
+@dataclass
+class Speculation:
+    agent_key: str
+    prompt: str
+    model_id: str
+    tokens: int
+    started: float = field(default_factory=time.monotonic)
+    cancel: threading.Event = field(default_factory=threading.Event)
+    done: threading.Event = field(default_factory=threading.Event)
+    reply: Optional[str] = None
+    stats: Optional[StreamStats] = None
+    error: Optional[str] = None
+    finished_at: float = 0.0
+    # Seconds the user didn't wait, set when the speculation is taken
+    saved: float = 0.0
+
+
+class Prefetcher:
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT, tokens_per_hour: float = TOKENS_PER_HOUR, ttl: float = TTL):
+        self.max_concurrent = max_concurrent
+        self.ttl = ttl
+        # Up to ten minutes' worth can be spent in a burst
+        self.budget = TokenBucket(rate=tokens_per_hour / 3600.0, capacity=tokens_per_hour / 6.0)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._users: Dict[str, Dict[Tuple[str, str], Speculation]] = {}
+        self._running = 0
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.waited_hits = 0
+        self.wasted = 0
+        self.failed = 0
+        self.skipped = {"busy": 0, "budget": 0, "rate_limit": 0}
+        self.wasted_tokens = 0
+        self.saved_seconds = 0.0
+
+    def _discard_locked(self, speculations: List[Speculation]):
+        for speculation in speculations:
+            speculation.cancel.set()
+            self.wasted += 1
+            self.wasted_tokens += speculation.tokens
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        for user_id in list(self._users):
+            pending = self._users[user_id]
+            stale = [key for key, s in pending.items() if s.done.is_set() and now - s.finished_at > self.ttl]
+            self._discard_locked([pending.pop(key) for key in stale])
+            if not pending:
+                del self._users[user_id]
+
+    def replace(self, user_id: str, candidates: List[Tuple[str, object, str]], model_id: str, guard: Optional[CallGuard] = None) -> int:
+        """Drop the user's old speculations and start ``(agent_key, agent, prompt)`` ones; return how many started"""
+        started = []
+        with self._lock:
+            self._expire_locked()
+            self._discard_locked(list(self._users.pop(user_id, {}).values()))
+            for agent_key, agent, prompt in candidates:
+                if self._running >= self.max_concurrent:
+                    self.skipped["busy"] += 1
+                    continue
+                if guard is not None and (guard.breaker.is_open or (guard.bucket is not None and guard.bucket.available() < HEADROOM)):
+                    self.skipped["rate_limit"] += 1
+                    continue
+                tokens = estimate_tokens(prompt) + REPLY_TOKENS
+                if tokens > self.budget.capacity or self.budget.reserve(0.0, tokens) is None:
+                    self.skipped["budget"] += 1
+                    continue
+                speculation = Speculation(agent_key, prompt, model_id, tokens)
+                self._users.setdefault(user_id, {})[(agent_key, prompt)] = speculation
+                self._running += 1
+                self.started += 1
+                started.append((speculation, agent))
+            if started and self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="heartmend-prefetch")
+        for speculation, agent in started:
+            self._executor.submit(self._run, speculation, agent, guard)
+        return len(started)
+
+    def _run(self, speculation: Speculation, agent, guard: Optional[CallGuard]):
+        def generate():
+            return stream_agent_reply(agent, speculation.prompt, lambda _text: None, should_stop=speculation.cancel.is_set)
+
+        try:
+            with span("prefetch", speculation.agent_key):
+                if guard is not None:
+                    # Never queue or retry on behalf of a guess
+                    speculation.reply, speculation.stats = guard.for_failover(0.0).call(generate, can_retry=lambda: False)
+                else:
+                    speculation.reply, speculation.stats = generate()
+        except ReplyCancelled:
+            speculation.error = "cancelled"
+        except Exception as e:
+            speculation.error = str(e)
+            with self._lock:
+                self.failed += 1
+        finally:
+            speculation.finished_at = time.monotonic()
+            speculation.done.set()
+            with self._lock:
+                self._running -= 1
+
+    def take(self, user_id: str, agent_key: str, prompt: str, timeout: float = TAKE_TIMEOUT) -> Optional[Speculation]:
+        """Claim the finished speculation for exactly this request, waiting for it if still running
+
+        Any other speculations for the user are cancelled: they have moved on.
+        """
+        with self._lock:
+            pending = self._users.pop(user_id, {})
+            speculation = pending.pop((agent_key, prompt), None)
+            self._discard_locked(list(pending.values()))
+        if speculation is None:
+            return None
+        asked = time.monotonic()
+        was_running = not speculation.done.is_set()
+        if not speculation.done.wait(timeout) or speculation.reply is None:
+            speculation.cancel.set()
+            with self._lock:
+                self.wasted += 1
+                self.wasted_tokens += speculation.tokens
+            return None
+        # Saved: the time the run would have taken from now, minus what we still waited
+        waited = time.monotonic() - asked
+        speculation.saved = max(0.0, speculation.stats.total - waited)
+        with self._lock:
+            self.hits += 1
+            self.waited_hits += was_running
+            self.saved_seconds += speculation.saved
+        return speculation
+
+    def cancel(self, user_id: str):
+        with self._lock:
+            self._discard_locked(list(self._users.pop(user_id, {}).values()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            resolved = self.hits + self.wasted
+            return {
+                "started": self.started,
+                "running": self._running,
+                "hits": self.hits,
+                "hits_while_running": self.waited_hits,
+                "wasted": self.wasted,
+                "failed": self.failed,
+                "hit_rate": self.hits / resolved if resolved else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "wasted_tokens": self.wasted_tokens,
+                "skipped_busy": self.skipped["busy"],
+                "skipped_budget": self.skipped["budget"],
+                "skipped_rate_limit": self.skipped["rate_limit"],
+            }
+
+
+_prefetcher: Optional[Prefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Optional[Prefetcher]:
+    """The process-wide prefetcher, or None unless ``HEARTMEND_PREFETCH`` is set"""
+    global _prefetcher
+    if not PREFETCH_ENABLED:
+        return None
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
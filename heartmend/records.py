@@ -0,0 +1,156 @@
+"""Compact chat and mood records for the per-session state kept in server memory
+
+Streamlit holds every open session's state in the server process, so these
+replace the store's dicts there: slotted records with interned role, agent
+and mood names, display strings derived from the timestamp on access, and
+only the reply metrics the chat renders. Records support the same read
+access as the dicts (``record["content"]``, ``record.get("agent")``) so the
+two can be rendered side by side.
+
+Every record is persisted when it is created, so ``SessionLog`` caps a
+session by simply forgetting its oldest records; the chat reads them back
+from the store when the user pages up.
+"""
+import os
+import sys
+from collections import deque
+from typing import Deque, Iterable, Iterator, Optional, Tuple
+
+from heartmend.storage import format_ts
+from heartmend.streaming import STATS_FIELDS
+
+# Approximate bytes of content a session keeps in memory
+SESSION_MEMORY_BYTES = int(os.getenv("HEARTMEND_SESSION_MEMORY_KB", "256")) * 1024
+
+# Rough size of a record and its slots, on top of its text
+RECORD_OVERHEAD = 200
+
+
+class _Record:
+    __slots__ = ()
+    _keys: frozenset = frozenset()
+    # Keys the store's dicts leave out when empty; other empty strings are values
+    _omitted_if_blank: frozenset = frozenset()
+
+    def __getitem__(self, key: str):
+        value = getattr(self, key) if key in self._keys else None
+        if value is None or (value == "" and key in self._omitted_if_blank):
+            # Absent, like a key missing from the store's dicts
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+
+class ChatRecord(_Record):
+    __slots__ = ("id", "role", "content", "ts", "agent", "stats")
+    _keys = frozenset(("id", "role", "content", "ts", "timestamp", "agent", "metrics"))
+    _omitted_if_blank = frozenset(("agent",))
+
+    def __init__(self, id: str, role: str, content: str, ts: float, agent: str = "", stats: Optional[Tuple] = None):
+        self.id = id
+        self.role = sys.intern(role)
+        self.content = content
+        self.ts = ts
+        self.agent = sys.intern(agent)
+        self.stats = stats
+
+    @classmethod
+    def from_message(cls, message) -> "ChatRecord":
+        if isinstance(message, ChatRecord):
+            return message
+        metrics = message.get("metrics")
+        stats = tuple(metrics.get(field) for field in STATS_FIELDS) if metrics else None
+        return cls(message["id"], message["role"], message["content"], message["ts"], message.get("agent", ""), stats)
+
+    @property
+    def timestamp(self) -> str:
+        return format_ts(self.ts)
+
+    @property
+    def metrics(self) -> Optional[dict]:
+        """The rendered subset of the reply's metrics; the store keeps all of them"""
+        if self.stats is None:
+            return None
+        return {field: value for field, value in zip(STATS_FIELDS, self.stats) if value is not None}
+
+    @property
+    def size(self) -> int:
+        return RECORD_OVERHEAD + sys.getsizeof(self.content)
+
+
+class MoodRecord(_Record):
+    __slots__ = ("ts", "mood", "note")
+    _keys = frozenset(("ts", "date", "mood", "note"))
+
+    def __init__(self, ts: float, mood: str, note: str = ""):
+        self.ts = ts
+        self.mood = sys.intern(mood)
+        self.note = note or ""
+
+    @classmethod
+    def from_entry(cls, entry) -> "MoodRecord":
+        if isinstance(entry, MoodRecord):
+            return entry
+        return cls(entry["ts"], entry["mood"], entry.get("note", ""))
+
+    @property
+    def date(self) -> str:
+        return format_ts(self.ts)
+
+    @property
+    def size(self) -> int:
+        return RECORD_OVERHEAD + sys.getsizeof(self.note)
+
+
+class SessionLog:
+    """A session's newest records, capped by count and by approximate size
+
+    The newest record is always kept, however large.
+    """
+
+    def __init__(self, records: Iterable = (), max_records: int = 50, max_bytes: int = SESSION_MEMORY_BYTES):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self._records: Deque = deque()
+        self.bytes = 0
+        self.evicted = 0
+        for record in records:
+            self.append(record)
+
+    def append(self, record):
+        self._records.append(record)
+        self.bytes += record.size
+        while len(self._records) > 1 and (len(self._records) > self.max_records or self.bytes > self.max_bytes):
+            self.bytes -= self._records.popleft().size
+            self.evicted += 1
+
+    def clear(self):
+        self._records.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._records)[index]
+        return self._records[index]
+
+
+def chat_log(messages: Iterable = (), max_records: int = 50) -> SessionLog:
+    return SessionLog((ChatRecord.from_message(message) for message in messages), max_records)
+
+
+def mood_log(entries: Iterable = (), max_records: int = 10) -> SessionLog:
+    return SessionLog((MoodRecord.from_entry(entry) for entry in entries), max_records)
@@ -0,0 +1,283 @@
+"""Client-side rate limiting, retries and circuit breaking for model calls"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from heartmend.agent_registry import hash_api_key
+from heartmend.fake_backend import is_fake_model
+
+T = TypeVar("T")
+
+MAX_QUEUE_WAIT = float(os.getenv("HEARTMEND_MAX_QUEUE_WAIT", "10"))
+MAX_RETRIES = int(os.getenv("HEARTMEND_MAX_RETRIES", "3"))
+BREAKER_FAILURES = int(os.getenv("HEARTMEND_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("HEARTMEND_BREAKER_RESET", "30"))
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_NAMES = ("RateLimit", "Timeout", "APIConnection", "InternalServer", "ServiceUnavailable")
+_MODEL_UNAVAILABLE_CODES = ("model_not_found", "model_decommissioned")
+
+
+class UpstreamUnavailable(RuntimeError):
+    """The request was not sent because the upstream is saturated or degraded"""
+
+
+class RateLimited(UpstreamUnavailable):
+    pass
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+def default_rpm(model_id: str) -> float:
+    """Requests per minute allowed per API key; 0 disables the limiter"""
+    configured = os.getenv("HEARTMEND_RATE_LIMIT_RPM")
+    if configured is not None:
+        return float(configured)
+    # Groq's free tier allows 30 requests/minute; the fake backend is unlimited
+    return 0.0 if is_fake_model(model_id) else 30.0
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_model_unavailable(error: Exception) -> bool:
+    """The provider doesn't serve this model id (unknown or decommissioned); no retry on it can succeed
+
+    Only the provider's own error code or message counts: a bare 404 can
+    come from a proxy or a passing misroute and says nothing about the model.
+    """
+    if getattr(error, "code", None) in _MODEL_UNAVAILABLE_CODES:
+        return True
+    text = str(error).lower()
+    return any(code in text for code in _MODEL_UNAVAILABLE_CODES) or "decommissioned" in text
+
+
+def is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(name in type(error).__name__ for name in _RETRYABLE_NAMES) or "429" in str(error)
+
+
+class ResilienceMetrics:
+    """Counters and a recent sample of queue waits, shared by every guard"""
+
+    def __init__(self, sample_size: int = 2048):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=sample_size)
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.rate_limited = 0
+        self.circuit_rejected = 0
+        self.retries = 0
+        self.failures = 0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self._waits.append(seconds)
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            pick = (lambda q: waits[min(len(waits) - 1, int(q * len(waits)))]) if waits else (lambda q: 0.0)
+            return {
+                "queue_wait_count": self.wait_count,
+                "queue_wait_seconds_total": round(self.wait_total, 6),
+                "queue_wait_seconds_max": round(self.wait_max, 6),
+                "queue_wait_seconds_p50": round(pick(0.5), 6),
+                "queue_wait_seconds_p95": round(pick(0.95), 6),
+                "rejected_rate_limited_total": self.rate_limited,
+                "rejected_circuit_open_total": self.circuit_rejected,
+                "retries_total": self.retries,
+                "failures_total": self.failures,
+            }
+
+
+metrics = ResilienceMetrics()
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations in arrival order
+
+    A caller that cannot be served within ``max_wait`` is rejected at once
+    instead of queueing, which keeps tail latency bounded under overload.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float, amount: float = 1.0) -> Optional[float]:
+        """Reserve ``amount`` tokens; return the seconds to wait, or ``None`` if that exceeds ``max_wait``"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= amount else (amount - self._tokens) / self.rate
+            if wait > max_wait:
+                return None
+            self._tokens -= amount
+            return wait
+
+    def available(self) -> float:
+        """Tokens in the bucket right now, without reserving any"""
+        with self._lock:
+            return min(self.capacity, self._tokens + (time.monotonic() - self._updated) * self.rate)
+
+    def expected_wait(self) -> float:
+        """Seconds the next caller would wait, without reserving anything"""
+        tokens = self.available()
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def acquire(self, max_wait: float = MAX_QUEUE_WAIT):
+        wait = self.reserve(max_wait)
+        if wait is None:
+            metrics.incr("rate_limited")
+            raise RateLimited("We're getting a lot of messages right now. Please try again in a moment.")
+        metrics.record_wait(wait)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Closed → open after consecutive failures → half-open probe after a cooldown"""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    metrics.incr("circuit_rejected")
+                    raise CircuitOpen("Our AI provider is having trouble right now. Please try again shortly.")
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probing:
+                    metrics.incr("circuit_rejected")
+                    raise CircuitOpen("Our AI provider is having trouble right now. Please try again shortly.")
+                self._probing = True
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be rejected outright"""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def cancel_probe(self):
+        """Release a half-open probe slot taken by a call that never went out"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class CallGuard:
+    """Rate limit, retry and circuit-break calls for one API key and model"""
+
+    def __init__(self, bucket: Optional[TokenBucket], breaker: CircuitBreaker, max_retries: int = MAX_RETRIES, base_delay: float = 0.5, max_delay: float = 8.0, max_queue_wait: float = MAX_QUEUE_WAIT):
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_queue_wait = max_queue_wait
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def for_failover(self, max_queue_wait: float) -> "CallGuard":
+        """Same limiter and breaker, but no retries and a short queue, for callers with another model to try"""
+        return CallGuard(
+            self.bucket, self.breaker, max_retries=0, base_delay=self.base_delay, max_delay=self.max_delay,
+            max_queue_wait=min(max_queue_wait, self.max_queue_wait),
+        )
+
+    def call(self, fn: Callable[[], T], can_retry: Callable[[], bool] = lambda: True) -> T:
+        """Run ``fn`` with retries on retryable errors
+
+        ``can_retry`` lets streaming callers refuse a retry once output has
+        already reached the user.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            if self.bucket is not None:
+                try:
+                    self.bucket.acquire(self.max_queue_wait)
+                except RateLimited:
+                    self.breaker.cancel_probe()
+                    raise
+            try:
+                result = fn()
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    # Caller errors (bad request, auth) say nothing about upstream health,
+                    # so the breaker is left as it was, only freeing a half-open probe
+                    self.breaker.cancel_probe()
+                metrics.incr("failures")
+                if not retryable or attempt >= self.max_retries or not can_retry():
+                    raise
+                attempt += 1
+                metrics.incr("retries")
+                # Full jitter keeps concurrent sessions from retrying in lockstep
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                continue
+            self.breaker.record_success()
+            return result
+
+
+_guards: Dict[Tuple[str, str], CallGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(api_key: str, model_id: str) -> CallGuard:
+    """Guard for this key and model; Groq limits each model on a key separately"""
+    key = (hash_api_key(api_key or ""), model_id)
+    with _guards_lock:
+        guard = _guards.get(key)
+        if guard is None:
+            rpm = default_rpm(model_id)
+            bucket = TokenBucket(rate=rpm / 60.0, capacity=max(1.0, rpm / 6.0)) if rpm > 0 else None
+            guard = _guards[key] = CallGuard(bucket, CircuitBreaker())
+        return guard
@@ -0,0 +1,238 @@
+"""Opt-in cache of companion replies for repeated prompts"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+DEFAULT_TTL = float(os.getenv("HEARTMEND_RESPONSE_CACHE_TTL", str(24 * 3600)))
+DEFAULT_MAX_BYTES = int(os.getenv("HEARTMEND_RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?…]+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Fold case, unicode forms, whitespace and trailing punctuation"""
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def instructions_hash(instructions: Optional[Iterable[str]]) -> str:
+    if instructions is None:
+        return ""
+    if isinstance(instructions, str):
+        instructions = [instructions]
+    return hashlib.sha256("\n".join(instructions).encode("utf-8")).hexdigest()[:16]
+
+
+def make_cache_key(agent_key: str, model_id: str, instructions: Optional[Iterable[str]], prompt: str) -> str:
+    raw = "\x1f".join([agent_key, model_id, instructions_hash(instructions), normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_size(key: str, value: str) -> int:
+    return len(key) + len(value.encode("utf-8"))
+
+
+class MemoryBackend:
+    """In-process LRU bounded by total bytes, with per-entry TTL"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, size = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        size = _entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (time.time() + self.ttl, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """On-disk LRU shared by every Streamlit worker pointing at the same file
+
+    WAL mode lets readers in other processes proceed while one writer
+    evicts. Recency is tracked in ``last_access`` and trimmed on write.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache(last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        with conn:
+            if expires_at < now:
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: str):
+        size = _entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now + self.ttl, now),
+            )
+            conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn, total - self.max_bytes)
+
+    def _evict(self, conn: sqlite3.Connection, excess: int):
+        freed = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM response_cache ORDER BY last_access"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM response_cache WHERE key = ?", stale)
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM response_cache")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Front for a cache backend that counts hits and misses"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self.backend.get(key)
+        except sqlite3.Error:
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        if not value:
+            return
+        try:
+            self.backend.set(key, value)
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.backend),
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide cache, or ``None`` unless enabled
+
+    Set ``HEARTMEND_RESPONSE_CACHE`` to ``memory`` or ``sqlite`` to opt in;
+    the SQLite file defaults to ``.cache/responses.sqlite3`` and can be moved
+    with ``HEARTMEND_RESPONSE_CACHE_PATH``.
+    """
+    global _cache
+    mode = os.getenv("HEARTMEND_RESPONSE_CACHE", "").lower()
+    if mode not in ("memory", "sqlite"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            if mode == "sqlite":
+                path = os.getenv("HEARTMEND_RESPONSE_CACHE_PATH", os.path.join(".cache", "responses.sqlite3"))
+                _cache = ResponseCache(SQLiteBackend(path))
+            else:
+                _cache = ResponseCache(MemoryBackend())
+        return _cache
@@ -0,0 +1,221 @@
+"""Per-message model routing across the Groq models
+
+Each message gets a route: ``vision`` for images and long messages,
+``fast`` for short small talk, otherwise ``default``. The route's models are
+tried in order of expected queue wait plus recent latency, inflated by their
+recent error rate. A model that is rate limited, has its circuit open or
+fails before anything was shown is skipped for the next one. A model the
+provider says it doesn't serve (unknown or decommissioned) is dropped from
+the pool for ``MODEL_REMOVAL_SECONDS`` and then tried again.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from heartmend.resilience import CallGuard, UpstreamUnavailable, is_model_unavailable, is_retryable
+from heartmend.tokens import estimate_tokens
+
+T = TypeVar("T")
+
+SMALL_TALK_TOKENS = int(os.getenv("HEARTMEND_ROUTE_SMALL_TALK_TOKENS", "24"))
+LONG_MESSAGE_TOKENS = int(os.getenv("HEARTMEND_ROUTE_LONG_TOKENS", "400"))
+
+# Queue wait tolerated on a model before moving on to the next candidate
+FAILOVER_QUEUE_WAIT = 1.0
+
+# Models failing this often are tried only after every healthy one, until
+# RECOVERY_SECONDS pass without a failure and they get another chance
+UNHEALTHY_ERROR_RATE = 0.5
+RECOVERY_SECONDS = 30.0
+
+# How long a model the provider says it doesn't serve stays out of the pool
+MODEL_REMOVAL_SECONDS = float(os.getenv("HEARTMEND_MODEL_REMOVAL_SECONDS", "3600"))
+
+ROUTES = ("fast", "default", "vision")
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    model_id: str
+    fast: bool = False
+    vision: bool = False
+
+
+class ModelStats:
+    """Exponentially weighted latency and error rate for one model"""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_failure = 0.0
+
+    @property
+    def unhealthy(self) -> bool:
+        return self.error_rate >= UNHEALTHY_ERROR_RATE and time.monotonic() - self.last_failure < RECOVERY_SECONDS
+
+    def observe(self, seconds: Optional[float], ok: bool):
+        self.calls += 1
+        if not ok:
+            self.failures += 1
+            self.last_failure = time.monotonic()
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok and seconds is not None:
+            self.latency = seconds if self.latency is None else self.latency + self.alpha * (seconds - self.latency)
+
+
+def classify(message: str, images: bool = False) -> str:
+    if images:
+        return "vision"
+    tokens = estimate_tokens(message)
+    if tokens >= LONG_MESSAGE_TOKENS:
+        return "vision"
+    if tokens <= SMALL_TALK_TOKENS:
+        return "fast"
+    return "default"
+
+
+class ModelRouter:
+    def __init__(
+        self, profiles: Iterable[ModelProfile], default_model: str, error_penalty: float = 4.0,
+        removal_seconds: float = MODEL_REMOVAL_SECONDS,
+    ):
+        self.profiles: Dict[str, ModelProfile] = {profile.model_id: profile for profile in profiles}
+        if default_model not in self.profiles:
+            raise ValueError(f"Default model {default_model!r} is not one of the routed models")
+        self.default_model = default_model
+        self.error_penalty = error_penalty
+        self._stats = {model_id: ModelStats() for model_id in self.profiles}
+        self._routed = {route: 0 for route in ROUTES}
+        self.removal_seconds = removal_seconds
+        # Model id -> when it was dropped from the pool
+        self._removed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _is_removed(self, model_id: str) -> bool:
+        removed_at = self._removed.get(model_id)
+        if removed_at is None:
+            return False
+        if time.monotonic() - removed_at >= self.removal_seconds:
+            del self._removed[model_id]
+            return False
+        return True
+
+    def _tiers(self, route: str) -> Tuple[List[str], List[str]]:
+        """Preferred and fallback models for a route"""
+        with self._lock:
+            models = [p for p in self.profiles.values() if not self._is_removed(p.model_id)]
+        if route == "vision":
+            vision = [p.model_id for p in models if p.vision]
+            return (vision, []) if vision else ([p.model_id for p in models], [])
+        if route == "fast":
+            return [p.model_id for p in models if p.fast], [p.model_id for p in models if not p.fast]
+        return [p.model_id for p in models if not p.fast], [p.model_id for p in models if p.fast]
+
+    def score(self, model_id: str, guard: Optional[CallGuard] = None) -> float:
+        """Expected seconds until a reply; untried models score 0 so they get sampled"""
+        with self._lock:
+            stats = self._stats[model_id]
+            latency = (stats.latency or 0.0) * (1 + self.error_penalty * stats.error_rate)
+        if guard is not None:
+            if guard.breaker.is_open:
+                return float("inf")
+            if guard.bucket is not None:
+                latency += guard.bucket.expected_wait()
+        return latency
+
+    def candidates(self, route: str, guard_for: Callable[[str], CallGuard]) -> List[str]:
+        """Healthy models first, preferred tier before fallback, then by score"""
+        keys = {}
+        for tier_index, tier in enumerate(self._tiers(route)):
+            for model_id in tier:
+                score = self.score(model_id, guard_for(model_id))
+                with self._lock:
+                    unhealthy = score == float("inf") or self._stats[model_id].unhealthy
+                keys[model_id] = (unhealthy, tier_index, score, model_id != self.default_model)
+        return sorted(keys, key=keys.get)
+
+    def pick(self, route: str, guard_for: Callable[[str], CallGuard]) -> str:
+        candidates = self.candidates(route, guard_for)
+        if not candidates:
+            raise UpstreamUnavailable("No model available")
+        return candidates[0]
+
+    def record(self, model_id: str, seconds: Optional[float], ok: bool):
+        with self._lock:
+            self._stats[model_id].observe(seconds, ok)
+
+    def remove(self, model_id: str):
+        """Stop routing to a model the provider no longer serves, for ``removal_seconds``"""
+        with self._lock:
+            self._removed[model_id] = time.monotonic()
+
+    def call(
+        self,
+        route: str,
+        guard_for: Callable[[str], CallGuard],
+        fn: Callable[[str, CallGuard], T],
+        can_failover: Callable[[], bool] = lambda: True,
+    ) -> Tuple[str, T]:
+        """Run ``fn(model_id, guard)`` on the best candidate, failing over down the list
+
+        Every candidate but the last gets a guard without retries and with a
+        short queue, so a saturated model hands over quickly. Returns the
+        model that answered and ``fn``'s result.
+        """
+        with self._lock:
+            self._routed[route] += 1
+        candidates = self.candidates(route, guard_for)
+        last_error: Optional[Exception] = None
+        for index, model_id in enumerate(candidates):
+            final = index == len(candidates) - 1
+            guard = guard_for(model_id)
+            if not final:
+                guard = guard.for_failover(FAILOVER_QUEUE_WAIT)
+            started = time.perf_counter()
+            try:
+                result = fn(model_id, guard)
+            except UpstreamUnavailable as e:
+                # Turned away before anything was sent
+                with self._lock:
+                    self._stats[model_id].skipped += 1
+                if final or not can_failover():
+                    raise
+                last_error = e
+                continue
+            except Exception as e:
+                self.record(model_id, None, ok=False)
+                unavailable = is_model_unavailable(e)
+                if unavailable:
+                    self.remove(model_id)
+                if final or not (unavailable or is_retryable(e)) or not can_failover():
+                    raise
+                last_error = e
+                continue
+            self.record(model_id, time.perf_counter() - started, ok=True)
+            return model_id, result
+        raise last_error or UpstreamUnavailable("No model available")
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "model": model_id,
+                    "calls": stats.calls,
+                    "failures": stats.failures,
+                    "skipped": stats.skipped,
+                    "latency_ms": round(stats.latency * 1000, 1) if stats.latency is not None else None,
+                    "error_rate": round(stats.error_rate, 3),
+                    "removed": self._is_removed(model_id),
+                }
+                for model_id, stats in self._stats.items()
+            ]
+
+    def route_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._routed)
@@ -0,0 +1,156 @@
+"""Two-tier, single-flight cache for the Straight Talker's web searches
+
+Installed as an agno tool hook, so it wraps ``web_search`` and
+``search_news`` without touching the toolkit itself. Results are kept in an
+in-process LRU and, when ``HEARTMEND_SEARCH_CACHE_PATH`` is set, in a SQLite
+file shared by every worker. Identical searches already in flight are
+awaited rather than sent again.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from heartmend.response_cache import MemoryBackend, SQLiteBackend, normalize_prompt
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TTL = float(os.getenv("HEARTMEND_SEARCH_CACHE_TTL", str(6 * 3600)))
+SEARCH_MAX_BYTES = int(os.getenv("HEARTMEND_SEARCH_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+SEARCH_CACHE_PATH = os.getenv("HEARTMEND_SEARCH_CACHE_PATH", "")
+CACHED_TOOLS = ("web_search", "search_news", "duckduckgo_search", "duckduckgo_news")
+
+
+def search_key(function_name: str, arguments: dict) -> str:
+    query = normalize_prompt(str(arguments.get("query", "")))
+    raw = "\x1f".join([function_name, query, str(arguments.get("max_results", ""))])
+    return "search:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    def __init__(self, memory: Optional[MemoryBackend] = None, disk: Optional[SQLiteBackend] = None):
+        self.memory = memory or MemoryBackend(SEARCH_MAX_BYTES, SEARCH_TTL)
+        self.disk = disk
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.shared = 0
+        self.misses = 0
+        self.errors = 0
+        self.fetch_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def _count(self, name: str, saved: float = 0.0):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self.saved_seconds += saved
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        value = self.memory.get(key)
+        if value is not None:
+            entry = json.loads(value)
+            self._count("memory_hits", entry["latency"])
+            return entry
+        if self.disk is None:
+            return None
+        try:
+            value = self.disk.get(key)
+        except sqlite3.Error:
+            logger.exception("Search cache read failed")
+            return None
+        if value is None:
+            return None
+        self.memory.set(key, value)
+        entry = json.loads(value)
+        self._count("disk_hits", entry["latency"])
+        return entry
+
+    def _store(self, key: str, result, latency: float):
+        value = json.dumps({"result": result, "latency": latency})
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error:
+                logger.exception("Search cache write failed")
+
+    def fetch(self, key: str, call: Callable[[], object]):
+        """Return the cached result for ``key``, or run ``call`` once for everyone asking"""
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry["result"]
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            started = time.perf_counter()
+            result = future.result()
+            self._count("shared")
+            with self._lock:
+                self.saved_seconds += max(0.0, future.latency - (time.perf_counter() - started))
+            return result
+
+        started = time.perf_counter()
+        try:
+            result = call()
+        except BaseException as e:
+            self._count("errors")
+            future.set_exception(e)
+            raise
+        else:
+            future.latency = time.perf_counter() - started
+            with self._lock:
+                self.misses += 1
+                self.fetch_seconds += future.latency
+            # Empty results are usually a transient failure; don't pin them
+            if result:
+                self._store(key, result, future.latency)
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def tool_hook(self, function_name: str, function_call: Callable, arguments: dict):
+        """agno tool hook that serves the search tools through the cache"""
+        if function_name not in CACHED_TOOLS:
+            return function_call(**arguments)
+        return self.fetch(search_key(function_name, arguments), lambda: function_call(**arguments))
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits + self.shared
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "shared": self.shared,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self.memory),
+                "fetch_seconds": round(self.fetch_seconds, 3),
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            disk = SQLiteBackend(SEARCH_CACHE_PATH, SEARCH_MAX_BYTES * 8, SEARCH_TTL) if SEARCH_CACHE_PATH else None
+            _search_cache = SearchCache(disk=disk)
+        return _search_cache
@@ -0,0 +1,319 @@
+"""Hashed n-gram embeddings and brute-force NumPy nearest-neighbour search
+
+Two users of the same index type:
+
+- ``SemanticCache``: an opt-in "similar answer" fast path that reuses a
+  companion's earlier reply to the same user's near-identical message
+  (``HEARTMEND_SEMANTIC_CACHE_THRESHOLD``, cosine similarity, off when unset)
+- ``RecallIndex``: a user's own earlier exchanges, searched so the most
+  relevant few can ground the reply without replaying the whole history
+  (``HEARTMEND_RECALL_TURNS``, 0 disables)
+"""
+import os
+import re
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from heartmend.memory import clip_tokens
+
+DIM = int(os.getenv("HEARTMEND_EMBEDDING_DIM", "256"))
+CACHE_THRESHOLD = float(os.getenv("HEARTMEND_SEMANTIC_CACHE_THRESHOLD", "0") or 0)
+CACHE_MAX_ENTRIES = int(os.getenv("HEARTMEND_SEMANTIC_CACHE_SIZE", "20000"))
+CACHE_SCOPE_ENTRIES = int(os.getenv("HEARTMEND_SEMANTIC_CACHE_USER_SIZE", "200"))
+RECALL_TURNS = int(os.getenv("HEARTMEND_RECALL_TURNS", "3"))
+RECALL_MIN_SIMILARITY = float(os.getenv("HEARTMEND_RECALL_MIN_SIMILARITY", "0.3"))
+RECALL_REPLY_TOKENS = 60
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by do for from i i'm im is it it's its me my of on or so that the this to was were with you".split()
+)
+
+
+class HashingVectorizer:
+    """Signed feature hashing of word unigrams, bigrams and in-word character trigrams
+
+    No vocabulary or model to load; vectors are L2-normalized float32, so a
+    dot product is the cosine similarity.
+    """
+
+    def __init__(self, dim: int = DIM):
+        self.dim = dim
+
+    def features(self, text: str) -> List[str]:
+        words = [w.replace("'", "") for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            if len(word) > 4:
+                padded = f"<{word}>"
+                features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self.features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                columns.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if rows:
+            np.add.at(matrix, (np.array(rows), np.array(columns)), np.array(signs, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def vector(self, text: str) -> np.ndarray:
+        return self.transform([text])[0]
+
+
+vectorizer = HashingVectorizer()
+
+
+class VectorIndex:
+    """Rows of unit vectors with a payload each, in a geometrically grown float32 matrix
+
+    With ``max_size`` the index becomes a ring: once full, each new row
+    overwrites the oldest.
+    """
+
+    def __init__(self, dim: int = DIM, capacity: int = 64, max_size: Optional[int] = None):
+        self.dim = dim
+        self.max_size = max_size
+        self._vectors = np.empty((min(capacity, max_size or capacity), dim), dtype=np.float32)
+        self.payloads: List[object] = []
+        self._size = 0
+        self._next = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    def add(self, vectors: np.ndarray, payloads: Sequence[object]):
+        count = len(vectors)
+        if self.max_size is not None and self._size + count > self.max_size:
+            self._overwrite(vectors, payloads)
+            return
+        needed = self._size + count
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors))
+            if self.max_size is not None:
+                capacity = min(capacity, self.max_size)
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+        self._vectors[self._size:needed] = vectors
+        self.payloads.extend(payloads)
+        self._size = needed
+
+    def _overwrite(self, vectors: np.ndarray, payloads: Sequence[object]):
+        if len(self._vectors) < self.max_size:
+            grown = np.empty((self.max_size, self.dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+        for vector, payload in zip(vectors, payloads):
+            # Fill the free rows first, then replace the oldest
+            row = self._size if self._size < self.max_size else self._next
+            self._vectors[row] = vector
+            if row < len(self.payloads):
+                self.payloads[row] = payload
+            else:
+                self.payloads.append(payload)
+            if self._size < self.max_size:
+                self._size += 1
+            else:
+                self._next = (self._next + 1) % self.max_size
+
+    def search(self, query: np.ndarray, k: int = 1, min_score: float = -1.0, skip: Optional[Callable[[int], bool]] = None) -> List[Tuple[float, object]]:
+        """Up to ``k`` ``(similarity, payload)`` pairs at or above ``min_score``, best first"""
+        if not self._size or k <= 0:
+            return []
+        # One matrix-vector product; memory bandwidth bound, so about 0.1 s per million rows
+        scores = self.vectors @ query
+        # Take a few extra candidates so skipped rows don't leave the result short
+        take = min(self._size, k + 8 if skip else k)
+        if take == 1:
+            top = np.array([int(np.argmax(scores))])
+        elif take < self._size:
+            top = np.argpartition(scores, self._size - take)[self._size - take:]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        results = []
+        for row in top:
+            score = float(scores[row])
+            if score < min_score:
+                break
+            if skip is not None and skip(int(row)):
+                continue
+            results.append((score, self.payloads[row]))
+            if len(results) == k:
+                break
+        return results
+
+
+class SemanticCache:
+    """Rings of (message vector, reply) per user and agent, answering near-identical messages
+
+    A reply was written with one user's private conversation as context, so
+    it is only ever reused for that same user. Least recently used scopes
+    are dropped once the cache holds more than ``max_entries`` replies.
+    """
+
+    def __init__(self, threshold: float = CACHE_THRESHOLD, max_entries: int = CACHE_MAX_ENTRIES, scope_entries: int = CACHE_SCOPE_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.scope_entries = scope_entries
+        self._indexes: "OrderedDict[Tuple[str, str], VectorIndex]" = OrderedDict()
+        self._entries = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, scope: str, message: str) -> Optional[Tuple[float, str]]:
+        """``(similarity, reply)`` for the user's closest earlier message in ``scope`` above the threshold"""
+        query = vectorizer.vector(message)
+        with self._lock:
+            index = self._indexes.get((user_id, scope))
+            found = index.search(query, 1, self.threshold) if index is not None else []
+            if found:
+                self._indexes.move_to_end((user_id, scope))
+                self.hits += 1
+                return found[0]
+            self.misses += 1
+            return None
+
+    def add(self, user_id: str, scope: str, message: str, reply: str):
+        if not reply:
+            return
+        vector = vectorizer.transform([message])
+        key = (user_id, scope)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = VectorIndex(capacity=8, max_size=self.scope_entries)
+            self._entries -= len(index)
+            index.add(vector, [reply])
+            self._entries += len(index)
+            self._indexes.move_to_end(key)
+            while self._entries > self.max_entries and len(self._indexes) > 1:
+                _, evicted = self._indexes.popitem(last=False)
+                self._entries -= len(evicted)
+
+    def drop(self, user_id: str):
+        with self._lock:
+            for key in [key for key in self._indexes if key[0] == user_id]:
+                self._entries -= len(self._indexes.pop(key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": self._entries,
+                "scopes": len(self._indexes),
+            }
+
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """The process-wide similar-answer cache, or None unless a threshold is configured"""
+    global _semantic_cache
+    if CACHE_THRESHOLD <= 0:
+        return None
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache()
+        return _semantic_cache
+
+
+class UserRecall:
+    """One user's earlier (message, reply) exchanges, topped up from the store by row id"""
+
+    def __init__(self):
+        self.index = VectorIndex(capacity=16)
+        self.last_rowid = 0
+        self._pending: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def refresh(self, user_id: str, store):
+        rows = store.messages_after(user_id, self.last_rowid)
+        if not rows:
+            return
+        exchanges = []
+        for rowid, role, agent, content in rows:
+            if role == "user":
+                self._pending = content
+            elif self._pending is not None:
+                # Only the clipped reply is ever shown, so only that is kept
+                exchanges.append((self._pending, sys.intern(agent or ""), clip_tokens(content, RECALL_REPLY_TOKENS)))
+                self._pending = None
+        self.last_rowid = rows[-1][0]
+        if exchanges:
+            self.index.add(vectorizer.transform([message for message, _, _ in exchanges]), exchanges)
+
+
+class RecallIndex:
+    """Per-user recall indexes in a bounded LRU, rebuilt from the store after eviction"""
+
+    def __init__(self, max_users: int = 256, turns: int = RECALL_TURNS, min_similarity: float = RECALL_MIN_SIMILARITY):
+        self.max_users = max_users
+        self.turns = turns
+        self.min_similarity = min_similarity
+        self._users: "OrderedDict[str, UserRecall]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _user(self, user_id: str) -> UserRecall:
+        with self._lock:
+            recall = self._users.get(user_id)
+            if recall is None:
+                recall = self._users[user_id] = UserRecall()
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user_id)
+            return recall
+
+    def recall(self, user_id: str, message: str, store, exclude: Set[str] = frozenset(), labels: Optional[Dict[str, str]] = None) -> List[str]:
+        """Prompt lines for the user's earlier exchanges most similar to ``message``
+
+        Exchanges whose message is in ``exclude`` (typically the turns still
+        in the conversation window) are skipped.
+        """
+        if self.turns <= 0:
+            return []
+        recall = self._user(user_id)
+        with recall.lock:
+            recall.refresh(user_id, store)
+            payloads = recall.index.payloads
+            found = recall.index.search(
+                vectorizer.vector(message), self.turns, self.min_similarity,
+                skip=lambda row: payloads[row][0] in exclude or payloads[row][0] == message,
+            )
+        lines = []
+        for _, (earlier, agent, reply) in found:
+            label = (labels or {}).get(agent, agent or "Companion")
+            lines.append(f"User: {clip_tokens(earlier, RECALL_REPLY_TOKENS)}\n{label}: {reply}")
+        return lines
+
+    def drop(self, user_id: str):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+
+recall_index = RecallIndex()
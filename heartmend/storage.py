@@ -0,0 +1,509 @@
+"""Persistent SQLite storage for chat, mood, check-in and progress data"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("HEARTMEND_DB_PATH", os.path.join(".data", "heartmend.sqlite3"))
+DISPLAY_FORMAT = "%Y-%m-%d %H:%M"
+# Longest wait between retries of a batch that failed to commit
+MAX_RETRY_DELAY = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    role TEXT NOT NULL,
+    agent TEXT NOT NULL DEFAULT '',
+    content TEXT NOT NULL,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_user_ts ON messages(user_id, ts);
+
+CREATE TABLE IF NOT EXISTS moods (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    mood TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_moods_user_ts ON moods(user_id, ts);
+
+CREATE TABLE IF NOT EXISTS checkins (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    score INTEGER NOT NULL,
+    items TEXT NOT NULL,
+    gratitude TEXT NOT NULL DEFAULT '',
+    accomplishment TEXT NOT NULL DEFAULT '',
+    tomorrow TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_checkins_user_ts ON checkins(user_id, ts);
+
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    recovery_day INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS claimed_links (
+    user_id TEXT PRIMARY KEY,
+    claimed_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    day INTEGER NOT NULL,
+    agent TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    latency_ms INTEGER NOT NULL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    estimated INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_usage_user_day ON usage(user_id, day);
+CREATE INDEX IF NOT EXISTS idx_usage_day ON usage(day);
+"""
+
+USAGE_GROUPS = ("agent", "model", "day", "user_id")
+
+
+def new_message_id() -> str:
+    return uuid.uuid4().hex
+
+
+def format_ts(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime(DISPLAY_FORMAT)
+
+
+# OperationalError messages for a database that's busy or briefly unavailable,
+# rather than a statement that can never succeed
+_TRANSIENT_MESSAGES = ("locked", "busy", "disk i/o", "disk is full", "unable to open")
+
+
+def _is_transient(error: sqlite3.Error) -> bool:
+    """True for errors that go away on retry, e.g. another connection holding the lock"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and any(part in message for part in _TRANSIENT_MESSAGES)
+
+
+class HistoryStore:
+    """SQLite store in WAL mode with write-behind batching
+
+    Writes are queued and committed by a background thread every
+    ``flush_interval`` seconds or once ``batch_size`` statements are
+    pending, whichever comes first. Reads flush the queue first so they
+    always see this process's own writes.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, batch_size: int = 64, flush_interval: float = 0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.dropped_writes = 0
+        self._connect().executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._run_writer, name="heartmend-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # Write-behind queue
+
+    def _enqueue(self, sql: str, params: tuple):
+        with self._pending_lock:
+            self._pending.append((sql, params))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _run_writer(self):
+        delay = 0.0
+        retry_at = 0.0
+        while not self._closed:
+            self._wake.wait(max(retry_at - time.monotonic(), 0.0) if delay else self.flush_interval)
+            self._wake.clear()
+            # A full queue doesn't cut a backoff short; closing does
+            if delay and time.monotonic() < retry_at and not self._closed:
+                continue
+            if self.flush():
+                delay = 0.0
+            else:
+                # flush() put the uncommitted writes back in front of the queue
+                delay = min(max(delay * 2, self.flush_interval), MAX_RETRY_DELAY)
+                retry_at = time.monotonic() + delay
+
+    def flush(self) -> bool:
+        """Commit every queued write, preserving order; False if some had to wait
+
+        Writes normally commit in one transaction. If the database is
+        locked, busy or briefly unavailable, whatever hasn't committed goes back in front of
+        anything queued since and the writer retries it later. Any other
+        error means a bad statement, so the batch is split until the
+        failing writes are found; those are logged and dropped and the rest
+        commit. Errors are never raised, so reads that flush first don't
+        fail because of someone else's write.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            # Contiguous slices still to commit, next one last
+            slices = [(0, len(batch))] if batch else []
+            while slices:
+                start, end = slices.pop()
+                try:
+                    self._commit(batch[start:end])
+                except sqlite3.Error as e:
+                    if _is_transient(e):
+                        with self._pending_lock:
+                            self._pending[:0] = batch[start:]
+                        logger.warning(f"History store busy, {len(batch) - start} writes queued for retry: {str(e)}")
+                        return False
+                    if end - start == 1:
+                        self.dropped_writes += 1
+                        logger.error(f"Dropped a history write that can't be committed ({batch[start][0].split('(')[0].strip()}): {str(e)}")
+                    else:
+                        middle = (start + end) // 2
+                        slices.extend([(middle, end), (start, middle)])
+            return True
+
+    def _commit(self, batch: list):
+        conn = self._connect()
+        with conn:
+            start = 0
+            # executemany over runs of the same statement
+            for end in range(1, len(batch) + 1):
+                if end == len(batch) or batch[end][0] != batch[start][0]:
+                    conn.executemany(batch[start][0], [params for _, params in batch[start:end]])
+                    start = end
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+    # Chat
+
+    def add_message(self, user_id: str, message: dict, skip_duplicates: bool = False):
+        """Insert or replace the message with this id; with ``skip_duplicates`` an existing id is left alone"""
+        metrics = message.get("metrics")
+        self._enqueue(
+            f"INSERT OR {'IGNORE' if skip_duplicates else 'REPLACE'} INTO messages "
+            "(id, user_id, ts, role, agent, content, metrics) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                message["id"],
+                user_id,
+                message["ts"],
+                message["role"],
+                message.get("agent", ""),
+                message["content"],
+                json.dumps(metrics) if metrics else None,
+            ),
+        )
+
+    def _message_from_row(self, row: sqlite3.Row) -> dict:
+        message = {
+            "id": row["id"],
+            "role": row["role"],
+            "content": row["content"],
+            "ts": row["ts"],
+            "timestamp": format_ts(row["ts"]),
+        }
+        if row["agent"]:
+            message["agent"] = row["agent"]
+        if row["metrics"]:
+            message["metrics"] = json.loads(row["metrics"])
+        return message
+
+    def recent_messages(self, user_id: str, limit: int, before_ts: Optional[float] = None) -> List[dict]:
+        """Return up to ``limit`` messages older than ``before_ts``, oldest first"""
+        self.flush()
+        if before_ts is None:
+            before_ts = float("inf")
+        rows = self._connect().execute(
+            "SELECT * FROM messages WHERE user_id = ? AND ts < ? ORDER BY ts DESC LIMIT ?",
+            (user_id, before_ts, limit),
+        ).fetchall()
+        return [self._message_from_row(row) for row in reversed(rows)]
+
+    def message_page(self, user_id: str, page: int, page_size: int) -> List[dict]:
+        """Return page ``page`` (1 = newest) of ``page_size`` messages, oldest first"""
+        self.flush()
+        rows = self._connect().execute(
+            "SELECT * FROM messages WHERE user_id = ? ORDER BY ts DESC LIMIT ? OFFSET ?",
+            (user_id, page_size, (page - 1) * page_size),
+        ).fetchall()
+        return [self._message_from_row(row) for row in reversed(rows)]
+
+    def messages_after(self, user_id: str, after_rowid: int = 0) -> List[tuple]:
+        """``(rowid, role, agent, content)`` in insertion order, only those after ``after_rowid``"""
+        self.flush()
+        return self._connect().execute(
+            "SELECT rowid, role, agent, content FROM messages WHERE user_id = ? AND rowid > ? ORDER BY rowid",
+            (user_id, after_rowid),
+        ).fetchall()
+
+    def iter_messages(self, user_id: str, batch_size: int = 500) -> Iterator[dict]:
+        """Yield all of a user's messages oldest first, ``batch_size`` rows at a time"""
+        self.flush()
+        after_ts, after_id = float("-inf"), ""
+        while True:
+            # Keyset pagination on (ts, id) so equal timestamps are never skipped
+            rows = self._connect().execute(
+                "SELECT * FROM messages WHERE user_id = ? AND (ts > ? OR (ts = ? AND id > ?)) "
+                "ORDER BY ts, id LIMIT ?",
+                (user_id, after_ts, after_ts, after_id, batch_size),
+            ).fetchall()
+            for row in rows:
+                yield self._message_from_row(row)
+            if len(rows) < batch_size:
+                return
+            after_ts, after_id = rows[-1]["ts"], rows[-1]["id"]
+
+    def last_message_id(self, user_id: str) -> Optional[str]:
+        self.flush()
+        row = self._connect().execute(
+            "SELECT id FROM messages WHERE user_id = ? ORDER BY ts DESC LIMIT 1", (user_id,)
+        ).fetchone()
+        return row["id"] if row else None
+
+    def count_messages(self, user_id: str) -> int:
+        self.flush()
+        return self._connect().execute("SELECT COUNT(*) FROM messages WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    def clear_messages(self, user_id: str):
+        self._enqueue("DELETE FROM messages WHERE user_id = ?", (user_id,))
+        self.flush()
+
+    # Moods
+
+    def add_mood(self, user_id: str, ts: float, mood: str, note: str = "", skip_duplicates: bool = False):
+        if skip_duplicates:
+            # Moods have no natural id, so re-imports match on the entry itself
+            self._enqueue(
+                "INSERT INTO moods (user_id, ts, mood, note) SELECT ?, ?, ?, ? WHERE NOT EXISTS "
+                "(SELECT 1 FROM moods WHERE user_id = ? AND ts = ? AND mood = ?)",
+                (user_id, ts, mood, note, user_id, ts, mood),
+            )
+            return
+        self._enqueue(
+            "INSERT INTO moods (user_id, ts, mood, note) VALUES (?, ?, ?, ?)",
+            (user_id, ts, mood, note),
+        )
+
+    def recent_moods(self, user_id: str, limit: int) -> List[dict]:
+        self.flush()
+        rows = self._connect().execute(
+            "SELECT ts, mood, note FROM moods WHERE user_id = ? ORDER BY ts DESC LIMIT ?",
+            (user_id, limit),
+        ).fetchall()
+        return [
+            {"date": format_ts(row["ts"]), "mood": row["mood"], "note": row["note"], "ts": row["ts"]}
+            for row in reversed(rows)
+        ]
+
+    def mood_points(self, user_id: str, after_id: int = 0) -> List[tuple]:
+        """``(id, ts, mood)`` rows in insertion order, optionally only those after row ``after_id``"""
+        self.flush()
+        return self._connect().execute(
+            "SELECT id, ts, mood FROM moods WHERE user_id = ? AND id > ? ORDER BY id",
+            (user_id, after_id),
+        ).fetchall()
+
+    def iter_moods(self, user_id: str, batch_size: int = 500) -> Iterator[dict]:
+        """Yield all of a user's moods in insertion order, ``batch_size`` rows at a time"""
+        for row in self._iter_rows("moods", user_id, batch_size):
+            yield {"ts": row["ts"], "mood": row["mood"], "note": row["note"]}
+
+    # Daily check-ins
+
+    def add_checkin(
+        self, user_id: str, ts: float, items: dict, gratitude: str = "", accomplishment: str = "", tomorrow: str = "",
+        skip_duplicates: bool = False,
+    ):
+        params = (user_id, ts, sum(bool(done) for done in items.values()), json.dumps(items), gratitude, accomplishment, tomorrow)
+        if skip_duplicates:
+            self._enqueue(
+                "INSERT INTO checkins (user_id, ts, score, items, gratitude, accomplishment, tomorrow) "
+                "SELECT ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM checkins WHERE user_id = ? AND ts = ?)",
+                params + (user_id, ts),
+            )
+            return
+        self._enqueue(
+            "INSERT INTO checkins (user_id, ts, score, items, gratitude, accomplishment, tomorrow) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            params,
+        )
+
+    def recent_checkins(self, user_id: str, limit: int) -> List[dict]:
+        self.flush()
+        rows = self._connect().execute(
+            "SELECT * FROM checkins WHERE user_id = ? ORDER BY ts DESC LIMIT ?",
+            (user_id, limit),
+        ).fetchall()
+        return [
+            {
+                "ts": row["ts"],
+                "date": format_ts(row["ts"]),
+                "score": row["score"],
+                "items": json.loads(row["items"]),
+                "gratitude": row["gratitude"],
+                "accomplishment": row["accomplishment"],
+                "tomorrow": row["tomorrow"],
+            }
+            for row in reversed(rows)
+        ]
+
+    def checkin_points(self, user_id: str, after_id: int = 0) -> List[tuple]:
+        """``(id, ts, score)`` rows in insertion order, optionally only those after row ``after_id``"""
+        self.flush()
+        return self._connect().execute(
+            "SELECT id, ts, score FROM checkins WHERE user_id = ? AND id > ? ORDER BY id",
+            (user_id, after_id),
+        ).fetchall()
+
+    def iter_checkins(self, user_id: str, batch_size: int = 500) -> Iterator[dict]:
+        """Yield all of a user's check-ins in insertion order, ``batch_size`` rows at a time"""
+        for row in self._iter_rows("checkins", user_id, batch_size):
+            yield {
+                "ts": row["ts"],
+                "items": json.loads(row["items"]),
+                "gratitude": row["gratitude"],
+                "accomplishment": row["accomplishment"],
+                "tomorrow": row["tomorrow"],
+            }
+
+    def _iter_rows(self, table: str, user_id: str, batch_size: int) -> Iterator[sqlite3.Row]:
+        self.flush()
+        after_id = 0
+        while True:
+            rows = self._connect().execute(
+                f"SELECT * FROM {table} WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (user_id, after_id, batch_size),
+            ).fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]["id"]
+
+    # Token usage
+
+    def add_usage(
+        self, user_id: str, ts: float, day: int, agent: str, model: str,
+        prompt_tokens: int, completion_tokens: int, latency_ms: int, cached: bool = False, estimated: bool = False,
+    ):
+        self._enqueue(
+            "INSERT INTO usage (user_id, ts, day, agent, model, prompt_tokens, completion_tokens, latency_ms, cached, estimated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, ts, day, agent, model, prompt_tokens, completion_tokens, latency_ms, int(cached), int(estimated)),
+        )
+
+    def usage_totals(self, user_id: Optional[str] = None, since_day: Optional[int] = None, group_by: str = "agent") -> List[dict]:
+        """Turns, token sums and mean latency per ``group_by`` value, optionally for one user and from a local day on"""
+        if group_by not in USAGE_GROUPS:
+            raise ValueError(f"Cannot group usage by {group_by!r}")
+        self.flush()
+        where, params = [], []
+        if user_id is not None:
+            where.append("user_id = ?")
+            params.append(user_id)
+        if since_day is not None:
+            where.append("day >= ?")
+            params.append(since_day)
+        rows = self._connect().execute(
+            f"SELECT {group_by} AS key, COUNT(*) AS turns, SUM(prompt_tokens) AS prompt_tokens, "
+            "SUM(completion_tokens) AS completion_tokens, SUM(cached) AS cached_turns, AVG(latency_ms) AS mean_latency_ms "
+            f"FROM usage {'WHERE ' + ' AND '.join(where) if where else ''} GROUP BY {group_by} ORDER BY {group_by}",
+            params,
+        ).fetchall()
+        return [
+            {
+                group_by: row["key"],
+                "turns": row["turns"],
+                "prompt_tokens": row["prompt_tokens"],
+                "completion_tokens": row["completion_tokens"],
+                "total_tokens": row["prompt_tokens"] + row["completion_tokens"],
+                "cached_turns": row["cached_turns"],
+                "mean_latency_ms": round(row["mean_latency_ms"], 1),
+            }
+            for row in rows
+        ]
+
+    # Identity
+
+    def claim_link(self, user_id: str) -> bool:
+        """Claim a user id from an old ``?uid=`` link; True only for the first caller"""
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO claimed_links (user_id, claimed_at) VALUES (?, ?)", (user_id, time.time())
+                )
+        return cursor.rowcount == 1
+
+    # Recovery progress
+
+    def get_recovery_day(self, user_id: str) -> int:
+        self.flush()
+        row = self._connect().execute("SELECT recovery_day FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        return row["recovery_day"] if row else 0
+
+    def set_recovery_day(self, user_id: str, day: int):
+        self._enqueue(
+            "INSERT INTO profiles (user_id, recovery_day, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET recovery_day = excluded.recovery_day, updated_at = excluded.updated_at",
+            (user_id, day, time.time()),
+        )
+
+    def user_ids(self) -> List[str]:
+        """Every user with chat, mood, check-in or progress data"""
+        self.flush()
+        rows = self._connect().execute(
+            "SELECT user_id FROM messages UNION SELECT user_id FROM moods "
+            "UNION SELECT user_id FROM checkins UNION SELECT user_id FROM profiles ORDER BY user_id"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+
+_store: Optional[HistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> HistoryStore:
+    """Return the process-wide store, opening it on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
@@ -0,0 +1,193 @@
+"""Incremental rendering of agent replies with latency stats"""
+import json
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional, Tuple
+
+from heartmend.tokens import estimate_tokens
+
+
+class ReplyCancelled(Exception):
+    """Raised when a streamed reply is stopped before it finishes"""
+
+
+class ModelRunError(RuntimeError):
+    """A model run that agno reported as failed
+
+    agno returns failed runs (a ``RunOutput`` with ``status=error``, or a
+    ``RunError`` event in a stream) instead of raising. ``status_code`` is
+    recovered from the provider's error body so retries, failover and the
+    circuit breaker can tell a rate limit from a bad request.
+    """
+
+    def __init__(self, message: str, status_code: int, code: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+
+# Groq error codes whose HTTP status agno drops along the way
+_ERROR_CODES = {
+    "rate_limit_exceeded": 429,
+    "invalid_api_key": 401,
+    "model_not_found": 404,
+    "model_decommissioned": 400,
+    "context_length_exceeded": 400,
+    "request_too_large": 413,
+}
+
+
+def run_error(content, error_type: Optional[str] = None) -> ModelRunError:
+    """Build the exception for a failed run from its error text and agno error type"""
+    message = str(content or "Model run failed")
+    try:
+        error = json.loads(message).get("error") or {}
+    except (ValueError, AttributeError):
+        error = {}
+    if not isinstance(error, dict):
+        error = {}
+    code = error.get("code")
+    if code in _ERROR_CODES:
+        status = _ERROR_CODES[code]
+    elif error.get("type") == "invalid_request_error":
+        status = 400
+    elif error_type == "model_authentication_error":
+        status = 401
+    elif error_type in ("input_check_error", "output_check_error"):
+        status = 400
+    else:
+        # Connection failures and unclassified provider errors; agno reports these as 502
+        status = 502
+    return ModelRunError(error.get("message") or message, status, code)
+
+
+def _failed(output) -> bool:
+    # RunStatus is a str enum, so this also avoids importing agno here
+    return getattr(output, "status", None) == "ERROR"
+
+
+@dataclass
+class StreamStats:
+    ttft: Optional[float]
+    total: float
+    tokens: int
+    # Token counts reported by the model, when it reports them
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+    @property
+    def tokens_per_sec(self) -> float:
+        return self.tokens / self.total if self.total > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        stats["tokens_per_sec"] = round(self.tokens_per_sec, 1)
+        return stats
+
+
+def reported_usage(output) -> Tuple[Optional[int], Optional[int]]:
+    """``(input_tokens, output_tokens)`` from a run output's metrics, None where not reported"""
+    metrics = getattr(output, "metrics", None)
+    if metrics is None:
+        return None, None
+    return getattr(metrics, "input_tokens", None) or None, getattr(metrics, "output_tokens", None) or None
+
+
+def _chunk_text(chunk) -> str:
+    """Extract the content delta from an agno run event, skipping non-content events
+
+    ``RunError`` events are raised by the caller before getting here.
+    """
+    if not hasattr(chunk, "event"):
+        # The final run output, yielded for its metrics; its content repeats the reply
+        return ""
+    event = str(chunk.event or "")
+    # Completion events repeat the full reply and intermediate content is
+    # superseded by the final output (agno's "RunIntermediateContent"); only
+    # deltas are appended
+    if event.endswith("Completed") or "IntermediateContent" in event:
+        return ""
+    content = getattr(chunk, "content", None)
+    return content if isinstance(content, str) else ""
+
+
+def stream_agent_reply(
+    agent,
+    message: str,
+    on_delta: Callable[[str], None],
+    render_interval: float = 0.05,
+    should_stop: Optional[Callable[[], bool]] = None,
+    **run_kwargs,
+) -> Tuple[str, StreamStats]:
+    """Run ``agent`` in streaming mode, calling ``on_delta`` with the text so far
+
+    Redraws are throttled to ``render_interval`` seconds; the final text is
+    always flushed once the stream ends. If ``should_stop`` returns true
+    between chunks the stream is closed and ``ReplyCancelled`` is raised.
+    """
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    last_render = 0.0
+    usage = (None, None)
+
+    stream = agent.run(message, stream=True, yield_run_output=True, **run_kwargs)
+    for chunk in stream:
+        if should_stop is not None and should_stop():
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            raise ReplyCancelled()
+        if not hasattr(chunk, "event"):
+            if _failed(chunk):
+                raise run_error(chunk.content)
+            usage = reported_usage(chunk)
+        elif chunk.event == "RunError":
+            raise run_error(chunk.content, getattr(chunk, "error_type", None))
+        delta = _chunk_text(chunk)
+        if not delta:
+            continue
+        now = time.perf_counter()
+        if ttft is None:
+            ttft = now - start
+        parts.append(delta)
+        if now - last_render >= render_interval:
+            on_delta("".join(parts))
+            last_render = now
+
+    text = "".join(parts)
+    on_delta(text)
+    stats = StreamStats(ttft=ttft, total=time.perf_counter() - start, tokens=estimate_tokens(text))
+    stats.input_tokens, stats.output_tokens = usage
+    return text, stats
+
+
+def run_agent_reply(agent, message: str, **run_kwargs) -> Tuple[str, StreamStats]:
+    """Blocking counterpart of ``stream_agent_reply`` with the same stats shape"""
+    start = time.perf_counter()
+    response = agent.run(message, **run_kwargs)
+    total = time.perf_counter() - start
+    if _failed(response):
+        raise run_error(response.content)
+    text = response.content or ""
+    input_tokens, output_tokens = reported_usage(response)
+    return text, StreamStats(
+        ttft=total, total=total, tokens=estimate_tokens(text), input_tokens=input_tokens, output_tokens=output_tokens
+    )
+
+
+# The metrics format_stats reads, all a session needs to keep in memory
+STATS_FIELDS = ("ttft", "total", "tokens_per_sec", "prompt_tokens", "cached", "prefetched", "saved_seconds")
+
+
+def format_stats(stats: dict) -> str:
+    if not stats:
+        return ""
+    if stats.get("cached"):
+        return "♻️ served from reply cache"
+    if stats.get("prefetched"):
+        return f"🔮 prepared ahead · {stats.get('saved_seconds', 0):.2f}s saved"
+    ttft = stats.get("ttft")
+    first = f"first token {ttft:.2f}s · " if ttft is not None else ""
+    prompt = f" · {stats['prompt_tokens']} prompt tok" if stats.get("prompt_tokens") else ""
+    return f"⚡ {first}{stats.get('total', 0):.2f}s total · {stats.get('tokens_per_sec', 0):.0f} tok/s{prompt}"
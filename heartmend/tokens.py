@@ -0,0 +1,15 @@
+"""Cheap token estimates for budgeting and throughput numbers"""
+import re
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count without loading a tokenizer
+
+    Llama-family tokenizers average roughly four characters per token on
+    English prose; words and punctuation give a floor for short strings.
+    """
+    if not text:
+        return 0
+    return max(len(_TOKEN_PATTERN.findall(text)), (len(text) + 3) // 4)
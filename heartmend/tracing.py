@@ -0,0 +1,180 @@
+"""Lightweight per-stage latency tracing
+
+``span(stage, agent=...)`` times a block and records it into an in-process
+histogram keyed by stage and agent. Histograms export as Prometheus text;
+set ``HEARTMEND_TRACE_FILE`` to also append every span as an
+OpenTelemetry-shaped JSON line (trace id, span id, parent, start/end in ns).
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+TRACE_FILE = os.getenv("HEARTMEND_TRACE_FILE", "")
+
+# Upper bounds in seconds; covers cache hits through slow streamed replies
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current: contextvars.ContextVar[Optional[Tuple[str, str]]] = contextvars.ContextVar("heartmend_span", default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts for export plus a recent sample for percentiles"""
+
+    def __init__(self, sample_size: int = 512):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=sample_size)
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class SpanFileExporter:
+    """Appends finished spans as JSON lines, written in batches or at least every ``flush_interval`` seconds"""
+
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[str] = []
+        self._written = time.monotonic()
+        self._lock = threading.Lock()
+
+    def export(self, span: dict):
+        line = json.dumps(span, separators=(",", ":"))
+        with self._lock:
+            self._pending.append(line)
+            if len(self._pending) >= self.batch_size or time.monotonic() - self._written >= self.flush_interval:
+                self._write_locked()
+
+    def flush(self):
+        with self._lock:
+            self._write_locked()
+
+    def _write_locked(self):
+        if not self._pending:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(self._pending) + "\n")
+        self._pending.clear()
+        self._written = time.monotonic()
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[SpanFileExporter] = None):
+        self.exporter = exporter
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, agent: str = ""):
+        """Add a duration measured elsewhere, e.g. time to first token
+
+        ``None`` (a duration that was never measured, like the first token
+        of a stream that produced no text) is ignored.
+        """
+        if seconds is None:
+            return
+        key = (stage, agent)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, stage: str, agent: str = "", **attributes) -> Iterator[dict]:
+        """Time the enclosed block; yields a dict callers may add attributes to"""
+        parent = _current.get()
+        trace_id = parent[0] if parent else uuid.uuid4().hex
+        span_id = uuid.uuid4().hex[:16]
+        token = _current.set((trace_id, span_id))
+        start_ns = time.time_ns()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attributes
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            self.record(stage, elapsed, agent)
+            if self.exporter is not None:
+                if agent:
+                    attributes["agent"] = agent
+                self.exporter.export({
+                    "name": stage,
+                    "trace_id": trace_id,
+                    "span_id": span_id,
+                    "parent_span_id": parent[1] if parent else None,
+                    "start_time_unix_nano": start_ns,
+                    "end_time_unix_nano": start_ns + int(elapsed * 1e9),
+                    "status": {"code": "ERROR", "message": error} if error else {"code": "OK"},
+                    "attributes": attributes,
+                })
+
+    def snapshot(self) -> List[dict]:
+        """Recent p50/p95 per stage and agent, slowest p95 first"""
+        with self._lock:
+            rows = [
+                {
+                    "stage": stage,
+                    "agent": agent,
+                    "count": histogram.count,
+                    "p50_ms": round(histogram.percentile(0.5) * 1000, 2),
+                    "p95_ms": round(histogram.percentile(0.95) * 1000, 2),
+                    "mean_ms": round(histogram.total / histogram.count * 1000, 2),
+                }
+                for (stage, agent), histogram in self._histograms.items()
+            ]
+        return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP heartmend_stage_seconds Time spent per request stage",
+            "# TYPE heartmend_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (stage, agent), histogram in sorted(self._histograms.items()):
+                labels = f'stage="{stage}",agent="{agent}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'heartmend_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"heartmend_stage_seconds_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"heartmend_stage_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+tracer = Tracer(SpanFileExporter(TRACE_FILE) if TRACE_FILE else None)
+span = tracer.span
+
+if tracer.exporter is not None:
+    atexit.register(tracer.exporter.flush)
@@ -0,0 +1,101 @@
+"""Per-turn token usage ledger and daily per-session token budgets
+
+Every reply's prompt/completion tokens, latency and model are written to the
+store's ``usage`` table. With ``HEARTMEND_SESSION_TOKEN_BUDGET`` set, a
+session (one ``uid``) that nears its daily budget gets a shorter context,
+and once over it a smaller model, rather than being refused.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from heartmend.fake_backend import is_fake_model
+from heartmend.storage import HistoryStore, get_store
+
+# Tokens per session per local day; 0 disables budgeting
+SESSION_TOKEN_BUDGET = int(os.getenv("HEARTMEND_SESSION_TOKEN_BUDGET", "0"))
+
+# Share of the budget after which the context is cut down
+REDUCE_AT = 0.75
+REDUCED_CONTEXT_TOKENS = 600
+MINIMAL_CONTEXT_TOKENS = 150
+
+
+def local_day(ts: float) -> int:
+    """Days since the epoch in local time, the ``day`` column of the usage table"""
+    return int((ts + time.localtime(ts).tm_gmtoff) // 86400)
+
+
+@dataclass
+class BudgetPlan:
+    level: str                      # "normal", "reduced" or "minimal"
+    model_id: str
+    context_tokens: Optional[int]   # cap passed to ``ConversationMemory.build_prompt``
+    used: int
+    budget: int
+
+    @property
+    def degraded(self) -> bool:
+        return self.level != "normal"
+
+
+class UsageLedger:
+    """Records usage and keeps each recent session's running total for today in memory"""
+
+    def __init__(self, budget: int = SESSION_TOKEN_BUDGET, budget_model: str = "", max_users: int = 4096):
+        self.budget = budget
+        self.budget_model = budget_model
+        self.max_users = max_users
+        self._today: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def used_today(self, user_id: str, store: Optional[HistoryStore] = None) -> int:
+        """Tokens charged to ``user_id`` since local midnight, read from the store once per day"""
+        today = local_day(time.time())
+        with self._lock:
+            entry = self._today.get(user_id)
+            if entry is not None and entry[0] == today:
+                self._today.move_to_end(user_id)
+                return entry[1]
+        rows = (store or get_store()).usage_totals(user_id, since_day=today, group_by="day")
+        used = sum(row["total_tokens"] for row in rows)
+        with self._lock:
+            self._today[user_id] = (today, used)
+            self._today.move_to_end(user_id)
+            while len(self._today) > self.max_users:
+                self._today.popitem(last=False)
+        return used
+
+    def record(self, user_id: str, agent: str, metrics: dict, store: Optional[HistoryStore] = None):
+        """Write one reply's usage; cached replies cost nothing and are logged with zero tokens"""
+        store = store or get_store()
+        self.used_today(user_id, store)
+        now = time.time()
+        day = local_day(now)
+        cached = bool(metrics.get("cached"))
+        prompt_tokens = 0 if cached else int(metrics.get("prompt_tokens") or 0)
+        completion_tokens = 0 if cached else int(metrics.get("completion_tokens") or metrics.get("tokens") or 0)
+        store.add_usage(
+            user_id, now, day, agent, metrics.get("model", ""), prompt_tokens, completion_tokens,
+            int(round(metrics.get("total", 0.0) * 1000)), cached=cached, estimated=not metrics.get("usage_reported"),
+        )
+        with self._lock:
+            entry = self._today.get(user_id)
+            if entry is not None and entry[0] == day:
+                self._today[user_id] = (day, entry[1] + prompt_tokens + completion_tokens)
+
+    def plan(self, user_id: str, model_id: str, images: bool = False, store: Optional[HistoryStore] = None) -> BudgetPlan:
+        """How the next turn should run given what the session has used today"""
+        if self.budget <= 0:
+            return BudgetPlan("normal", model_id, None, 0, 0)
+        used = self.used_today(user_id, store)
+        if used >= self.budget:
+            # Image turns already run on the vision model; the offline backend is never switched
+            keep = images or is_fake_model(model_id) or not self.budget_model
+            return BudgetPlan("minimal", model_id if keep else self.budget_model, MINIMAL_CONTEXT_TOKENS, used, self.budget)
+        if used >= self.budget * REDUCE_AT:
+            return BudgetPlan("reduced", model_id, REDUCED_CONTEXT_TOKENS, used, self.budget)
+        return BudgetPlan("normal", model_id, None, used, self.budget)
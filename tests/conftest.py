@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the process-wide store out of the working tree
+os.environ.setdefault("HEARTMEND_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="heartmend-tests-"), "heartmend.sqlite3"))
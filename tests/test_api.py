@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from heartmend import api
+from heartmend.auth import user_token
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("HEARTMEND_API_SECRET", "test-secret")
+    return TestClient(api.app)
+
+
+def bearer(user_id):
+    return {"Authorization": f"Bearer {user_token(user_id, 'test-secret')}"}
+
+
+def test_user_endpoints_need_a_token(client):
+    response = client.get("/v1/users/alice/messages")
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_token_only_opens_its_own_user(client):
+    assert client.get("/v1/users/alice/messages", headers=bearer("alice")).status_code == 200
+    assert client.get("/v1/users/alice/messages", headers=bearer("mallory")).status_code == 403
+    assert client.delete("/v1/users/alice/messages", headers=bearer("mallory")).status_code == 403
+    assert client.post("/v1/users/alice/archive", content=b"", headers=bearer("mallory")).status_code == 403
+
+
+def test_user_endpoints_are_refused_without_a_secret(client, monkeypatch):
+    monkeypatch.delenv("HEARTMEND_API_SECRET")
+    assert client.get("/v1/users/alice/messages", headers=bearer("alice")).status_code == 503
+
+
+def test_public_endpoints_stay_open(client):
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/v1/agents").status_code == 200
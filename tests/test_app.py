@@ -0,0 +1,36 @@
+import os
+
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+OLD_LINK_ID = "0123456789abcdef0123456789abcdef"
+
+
+def open_app(uid=None):
+    at = AppTest.from_file(APP, default_timeout=60)
+    if uid is not None:
+        at.query_params["uid"] = uid
+    at.run()
+    return at
+
+
+def test_new_visitor_gets_an_id_that_stays_out_of_the_url():
+    at = open_app()
+    assert len(at.session_state.user_id) == 32
+    assert "uid" not in at.query_params
+
+
+def test_old_link_is_kept_by_the_first_browser_only():
+    first = open_app(OLD_LINK_ID)
+    assert first.session_state.user_id == OLD_LINK_ID
+    assert "uid" not in first.query_params
+
+    # Anyone opening the same link later doesn't get that history
+    second = open_app(OLD_LINK_ID)
+    assert second.session_state.user_id != OLD_LINK_ID
+    assert "uid" not in second.query_params
+
+
+def test_malformed_link_id_is_ignored():
+    at = open_app("../../etc/passwd")
+    assert at.session_state.user_id != "../../etc/passwd"
@@ -0,0 +1,82 @@
+import io
+import json
+
+import pytest
+
+from heartmend import archive
+from heartmend.storage import HistoryStore, new_message_id
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    yield store
+    store.close()
+
+
+def add_history(store, user_id, messages=3):
+    for i in range(messages):
+        store.add_message(user_id, {"id": new_message_id(), "ts": 1000.0 + i, "role": "user", "content": f"message {i}"})
+    store.add_mood(user_id, 1000.0, "Sad", "rough day")
+    store.add_checkin(user_id, 1000.0, {"sleep": True, "walk": False}, "my sister")
+    store.set_recovery_day(user_id, 4)
+
+
+def exported(store, user_ids):
+    out = io.BytesIO()
+    archive.export_archive(out, user_ids, store)
+    out.seek(0)
+    return out
+
+
+def test_round_trip_into_empty_store(store, tmp_path):
+    add_history(store, "alice")
+    target = HistoryStore(str(tmp_path / "target.sqlite3"))
+    counts = archive.import_archive(exported(store, ["alice"]), target)
+    assert counts == {"users": 1, "profile": 1, "message": 3, "mood": 1, "checkin": 1}
+    assert list(target.iter_messages("alice")) == list(store.iter_messages("alice"))
+    assert list(target.iter_moods("alice")) == list(store.iter_moods("alice"))
+    assert list(target.iter_checkins("alice")) == list(store.iter_checkins("alice"))
+    assert target.get_recovery_day("alice") == 4
+    target.close()
+
+
+def test_import_as_another_user_leaves_the_source_intact(store):
+    add_history(store, "alice")
+    alice = list(store.iter_messages("alice"))
+
+    archive.import_archive(exported(store, ["alice"]), store, user_id="bob")
+    archive.import_archive(exported(store, ["alice"]), store, user_id="bob")
+
+    assert list(store.iter_messages("alice")) == alice
+    bob = list(store.iter_messages("bob"))
+    assert [m["content"] for m in bob] == [m["content"] for m in alice]
+    assert not {m["id"] for m in bob} & {m["id"] for m in alice}
+    assert len(list(store.iter_moods("bob"))) == 1
+    assert len(list(store.iter_checkins("bob"))) == 1
+
+
+def test_import_never_overwrites_existing_messages(store):
+    add_history(store, "alice")
+    alice = list(store.iter_messages("alice"))
+    # An archive claiming bob's history but reusing alice's message ids
+    lines = [{"type": "header", "format": archive.FORMAT, "version": archive.VERSION}]
+    lines += [{"type": "message", "user": "bob", "id": m["id"], "ts": m["ts"], "role": "user", "content": "mine now"} for m in alice]
+    forged = io.BytesIO("".join(json.dumps(line) + "\n" for line in lines).encode("utf-8"))
+
+    archive.import_archive(forged, store, user_id="bob")
+    assert list(store.iter_messages("alice")) == alice
+    assert store.count_messages("bob") == 0
+
+
+def test_rejects_multi_user_archive_for_import_as(store):
+    add_history(store, "alice")
+    add_history(store, "carol")
+    with pytest.raises(archive.ArchiveError):
+        archive.import_archive(exported(store, ["alice", "carol"]), store, user_id="bob")
+
+
+@pytest.mark.parametrize("data", [b"", b"not json\n", b'{"type": "message"}\n'])
+def test_rejects_malformed_archives(store, data):
+    with pytest.raises(archive.ArchiveError):
+        archive.import_archive(io.BytesIO(data), store)
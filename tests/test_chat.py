@@ -0,0 +1,65 @@
+import pytest
+from agno.run.agent import RunCompletedEvent, RunOutput
+from agno.run.base import RunStatus
+
+from heartmend.chat import run_turn
+from heartmend.memory import ConversationMemory
+from heartmend.response_cache import MemoryBackend, ResponseCache
+from heartmend.streaming import ModelRunError
+
+
+class StubAgent:
+    instructions = ["Be kind"]
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.calls = 0
+
+    def run(self, message, stream=False, yield_run_output=False, **kwargs):
+        self.calls += 1
+        return self.outputs.pop(0)
+
+
+def test_failed_turn_is_not_cached_or_remembered():
+    cache = ResponseCache(MemoryBackend())
+    memory = ConversationMemory()
+    agent = StubAgent([
+        RunOutput(status=RunStatus.error, content="Connection error."),
+        RunOutput(status=RunStatus.completed, content="I'm here for you"),
+    ])
+
+    with pytest.raises(ModelRunError):
+        run_turn(agent, "Therapist", "m", "hello", memory, response_cache=cache)
+    assert not memory.turns
+
+    reply, metrics = run_turn(agent, "Therapist", "m", "hello", memory, response_cache=cache)
+    assert reply == "I'm here for you"
+    assert not metrics["cached"]
+    assert agent.calls == 2
+
+    reply, metrics = run_turn(agent, "Therapist", "m", "hello", ConversationMemory(), response_cache=cache)
+    assert metrics["cached"]
+    assert reply == "I'm here for you"
+
+
+def test_empty_reply_is_not_cached():
+    cache = ResponseCache(MemoryBackend())
+    agent = StubAgent([RunOutput(status=RunStatus.completed, content=""), RunOutput(status=RunStatus.completed, content="ok")])
+    run_turn(agent, "Therapist", "m", "hello", ConversationMemory(), response_cache=cache)
+    reply, metrics = run_turn(agent, "Therapist", "m", "hello", ConversationMemory(), response_cache=cache)
+    assert (reply, metrics["cached"]) == ("ok", False)
+
+
+class SilentAgent:
+    """Streams a run that completes without any content"""
+
+    instructions = ["Be kind"]
+
+    def run(self, message, stream=False, yield_run_output=False, **kwargs):
+        return iter([RunCompletedEvent(content="")])
+
+
+def test_streamed_turn_without_a_first_token():
+    reply, metrics = run_turn(SilentAgent(), "Therapist", "m", "hi", ConversationMemory(), on_delta=lambda _text: None)
+    assert reply == ""
+    assert metrics["ttft"] is None
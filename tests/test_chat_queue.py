@@ -0,0 +1,30 @@
+import threading
+
+from heartmend.chat_queue import ChatQueue
+
+
+def test_cancelled_running_job_finishes_marked_dropped():
+    queue = ChatQueue(workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def answer(job):
+        started.set()
+        release.wait(5)
+        return "reply"
+
+    running = queue.submit("alice", answer)
+    waiting = queue.submit("bob", lambda job: "reply")
+    assert started.wait(5)
+
+    assert queue.cancel(waiting)
+    assert waiting.future.cancelled()
+    assert not waiting.dropped
+
+    assert not queue.cancel(running)
+    assert running.dropped
+    release.set()
+    assert running.future.result(5) == "reply"
+
+    # Cancelling a job that has already finished changes nothing
+    assert not queue.cancel(running)
+    assert running.dropped
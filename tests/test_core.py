@@ -0,0 +1,84 @@
+import pytest
+from agno.run.agent import RunOutput
+from agno.run.base import RunStatus
+
+from heartmend import core
+from heartmend.chat import new_message
+from heartmend.storage import HistoryStore
+
+
+@pytest.fixture
+def workers(tmp_path):
+    # Two workers: each with its own connection to the same database
+    path = str(tmp_path / "history.sqlite3")
+    stores = HistoryStore(path), HistoryStore(path)
+    yield stores
+    for store in stores:
+        store.close()
+
+
+def contents(memory):
+    return [turn.content for turn in memory.turns]
+
+
+def test_memory_picks_up_turns_written_by_another_worker(workers):
+    store_a, store_b = workers
+    registry = core.MemoryRegistry()
+    store_a.add_message("alice", new_message("user", "hello"))
+    assert contents(registry.get("alice", store_a)) == ["hello"]
+
+    store_b.add_message("alice", new_message("user", "are you there?"))
+    store_b.flush()
+    assert contents(registry.get("alice", store_a)) == ["hello", "are you there?"]
+
+
+def test_memory_is_emptied_when_another_worker_clears_it(workers):
+    store_a, store_b = workers
+    registry = core.MemoryRegistry()
+    store_a.add_message("alice", new_message("user", "hello"))
+    assert contents(registry.get("alice", store_a)) == ["hello"]
+
+    store_b.clear_messages("alice")
+    store_b.flush()
+    assert contents(registry.get("alice", store_a)) == []
+
+
+def test_memory_is_reused_while_the_store_is_unchanged(workers):
+    store_a, _ = workers
+    registry = core.MemoryRegistry()
+    store_a.add_message("alice", new_message("user", "hello"))
+    memory = registry.get("alice", store_a)
+    memory.add_turn("assistant", "hi")
+    reply = new_message("assistant", "hi")
+    store_a.add_message("alice", reply)
+    registry.mark("alice", memory, reply["id"])
+    assert registry.get("alice", store_a) is memory
+
+
+class ClearingAgent:
+    """Replies after the user clears the conversation mid-turn"""
+
+    instructions = ["Be kind"]
+
+    def __init__(self, store):
+        self.store = store
+        self.cleared = False
+
+    def run(self, message, stream=False, yield_run_output=False, **kwargs):
+        core.clear_conversation("alice", self.store)
+        self.cleared = True
+        return RunOutput(status=RunStatus.completed, content="I'm here for you")
+
+
+def test_reply_is_not_saved_after_the_conversation_is_cleared(workers):
+    store, _ = workers
+    agent = ClearingAgent(store)
+    shown = []
+    reply = core.send_message(
+        {"Therapist": agent}, "Therapist", "m", "alice", "is anyone listening?",
+        memory=core.new_memory(), on_message=shown.append, store=store, cancelled=lambda: agent.cleared
+    )
+    assert reply is None
+    assert [message["role"] for message in shown] == ["user"]
+    store.flush()
+    assert store.count_messages("alice") == 0
@@ -0,0 +1,64 @@
+import pytest
+
+from heartmend.crisis import CrisisScreen, detect_crisis, expand_phrase, load_phrases
+
+
+@pytest.mark.parametrize("text, category", [
+    ("I want to kill myself", "suicide"),
+    ("i keep thinking about KILLING MYSELF", "suicide"),
+    ("I almost killed myself last year", "suicide"),
+    ("I've been thinking about ending my life", "suicide"),
+    ("he took his pills and I nearly took my own life", "suicide"),
+    ("I feel suicidal tonight", "suicide"),
+    ("i dont want to live anymore", "suicide"),
+    ("I don’t want to be alive", "suicide"),
+    ("some days I just wanted to die", "suicide"),
+    ("everyone would be better off without me", "suicide"),
+    ("I keep self harming", "self_harm"),
+    ("I've been self-harming again", "self_harm"),
+    ("I selfharm when it gets bad", "self_harm"),
+    ("I overdosed in March", "self_harm"),
+    ("thinking about overdosing", "self_harm"),
+    ("I've been cutting myself", "self_harm"),
+    ("I burned myself on purpose", "self_harm"),
+    ("I hurt myself again", "self_harm"),
+    ("She threatened to kill me if I leave", "danger"),
+    ("I'm afraid for my life", "danger"),
+])
+def test_crisis_language_is_caught(text, category):
+    match = detect_crisis(text)
+    assert match is not None, text
+    assert match.category == category
+
+
+@pytest.mark.parametrize("text", [
+    "This traffic is killing me",
+    "I could kill for a coffee right now",
+    "My phone battery died again",
+    "The library book is overdue",
+    "I need to upskill myself at work",
+    "I cut my hair short after the breakup",
+    "He said he will call me later",
+    "She was so selfish in that relationship",
+    "I'm done with the endless texting",
+    "That's odd, I feel okay today",
+    "",
+])
+def test_everyday_language_is_not_flagged(text):
+    assert detect_crisis(text) is None
+
+
+def test_starred_words_expand_to_their_inflections():
+    assert expand_phrase("cut* myself") == [
+        "cut myself", "cuts myself", "cuted myself", "cuting myself", "cutted myself", "cutting myself",
+    ]
+    assert expand_phrase("overdose*") == ["overdose", "overdoses", "overdosed", "overdosing"]
+    assert expand_phrase("want* to die")[-1] == "wanting to die"
+
+
+def test_every_listed_phrase_matches_itself():
+    phrases = load_phrases()
+    screen = CrisisScreen(phrases)
+    for category, phrase in phrases:
+        match = screen.screen(f"lately {phrase} and more")
+        assert match is not None and match.category == category, phrase
@@ -0,0 +1,47 @@
+from heartmend.memory import ConversationMemory
+from heartmend.tokens import estimate_tokens
+
+SENTENCE = "I keep replaying our last conversation and wondering what I could have said differently. "
+
+
+def chat(memory, turns):
+    for i in range(turns):
+        memory.add_turn("user", f"Turn {i}. " + SENTENCE * 3)
+        memory.add_turn("assistant", "That sounds painful. " + SENTENCE * 4, agent="Therapist")
+
+
+def test_prompt_size_stays_flat_as_the_session_grows():
+    memory = ConversationMemory(window_tokens=400, summary_tokens=80)
+    sizes = []
+    for _ in range(10):
+        chat(memory, 10)
+        sizes.append(estimate_tokens(memory.build_prompt("Therapist", "hello")))
+    assert max(sizes) <= 400 + 80 + 60
+    assert max(sizes[2:]) - min(sizes[2:]) < 100
+
+
+def test_summary_is_only_updated_when_the_window_overflows():
+    calls = []
+
+    def summarizer(previous, turns, max_tokens, labels):
+        calls.append(len(turns))
+        return f"{previous} +{len(turns)}".strip()
+
+    memory = ConversationMemory(window_tokens=300, summarizer=summarizer)
+    chat(memory, 1)
+    assert not calls
+    chat(memory, 20)
+    assert calls and all(count >= 1 for count in calls)
+    assert memory.summarized_turns == sum(calls)
+    assert memory.window_used <= 300
+    assert memory.summary.startswith("+")
+
+
+def test_other_companions_replies_are_clipped_in_each_view():
+    memory = ConversationMemory(window_tokens=2000, other_agent_tokens=10)
+    memory.add_turn("user", "hi")
+    memory.add_turn("assistant", SENTENCE * 5, agent="Coach")
+    coach, therapist = memory.view("Coach"), memory.view("Therapist")
+    assert coach[1] == f"You (Coach): {SENTENCE * 5}"
+    assert therapist[1].startswith("Coach: ")
+    assert estimate_tokens(therapist[1]) < estimate_tokens(coach[1])
@@ -0,0 +1,35 @@
+from agno.run.agent import RunCompletedEvent
+
+from heartmend import panel
+from heartmend.panel import Panel
+
+
+class SilentAgent:
+    """Streams a run that completes without any content"""
+
+    instructions = ["Be kind"]
+
+    def run(self, message, stream=False, yield_run_output=False, **kwargs):
+        return iter([RunCompletedEvent(content="")])
+
+
+def test_panel_accepts_a_reply_without_a_first_token():
+    replies = list(Panel({"Therapist": SilentAgent()}, ["Therapist"]).run({"Therapist": "hi"}))
+    assert len(replies) == 1
+    assert replies[0].ok
+    assert replies[0].stats.ttft is None
+
+
+def test_replies_finishing_at_the_timeout_are_not_lost(monkeypatch):
+    def late_as_completed(futures, timeout=None):
+        # Every reply lands just after the panel's deadline has passed
+        for future in futures:
+            future.result()
+        raise TimeoutError()
+        yield
+
+    monkeypatch.setattr(panel, "as_completed", late_as_completed)
+    agents = {"Therapist": SilentAgent(), "Coach": SilentAgent()}
+    replies = list(Panel(agents, agents).run({"Therapist": "hi", "Coach": "hi"}))
+    assert sorted(reply.agent_key for reply in replies) == ["Coach", "Therapist"]
+    assert all(reply.ok for reply in replies)
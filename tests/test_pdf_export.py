@@ -0,0 +1,49 @@
+import json
+import os
+
+from heartmend.pdf_export import PdfExporter
+
+MESSAGES = [{"role": "user", "content": "hello"}, {"role": "assistant", "agent": "Therapist", "content": "**hi**"}]
+
+
+def test_export_started_on_one_worker_is_served_by_another(tmp_path):
+    first, second = PdfExporter(str(tmp_path)), PdfExporter(str(tmp_path))
+    job = first.submit("digest", lambda: iter(MESSAGES), "2026-01-01 10:00", total=len(MESSAGES))
+    assert job.done.wait(30)
+    assert job.ready
+
+    served = second.get("digest")
+    assert served is not None and served.ready
+    assert served.read_bytes().startswith(b"%PDF")
+    # The second worker reuses the finished export instead of building it again
+    assert second.submit("digest", lambda: iter(()), "2026-01-01 10:00").path == job.path
+
+
+def test_failed_export_is_reported_to_other_workers(tmp_path):
+    def broken():
+        raise RuntimeError("store unavailable")
+
+    job = PdfExporter(str(tmp_path)).submit("digest", broken, "2026-01-01 10:00")
+    assert job.done.wait(30)
+    served = PdfExporter(str(tmp_path)).get("digest")
+    assert served.done.is_set() and served.error == "store unavailable"
+
+
+def test_running_export_from_a_dead_worker_is_restarted(tmp_path):
+    with open(tmp_path / "digest.json", "w") as f:
+        json.dump({"status": "running", "progress": 0.2, "error": None}, f)
+    exporter = PdfExporter(str(tmp_path), stale_after=60)
+    assert not exporter.get("digest").done.is_set()
+
+    os.utime(tmp_path / "digest.json", (0, 0))
+    assert exporter.get("digest") is None
+    job = exporter.submit("digest", lambda: iter(MESSAGES), "2026-01-01 10:00")
+    assert job.done.wait(30) and job.ready
+
+
+def test_oldest_finished_exports_are_evicted(tmp_path):
+    exporter = PdfExporter(str(tmp_path), max_cached=1)
+    for key in ("first", "second"):
+        assert exporter.submit(key, lambda: iter(MESSAGES), "2026-01-01 10:00").done.wait(30)
+    assert exporter.get("first") is None
+    assert exporter.get("second").ready
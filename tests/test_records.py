@@ -0,0 +1,33 @@
+import pytest
+
+from heartmend.chat import new_message
+from heartmend.chat_view import message_html
+from heartmend.memory import ConversationMemory
+from heartmend.records import ChatRecord, MoodRecord, chat_log
+
+AGENTS = {"Therapist": {"name": "Therapist", "emoji": "🧠", "description": ""}}
+
+
+def test_empty_reply_is_still_content():
+    record = ChatRecord.from_message(new_message("assistant", "", agent="Therapist"))
+    assert record["content"] == ""
+    assert "content" in record
+    assert message_html(record, AGENTS)
+    memory = ConversationMemory.from_messages(chat_log([record]))
+    assert memory.turns[-1].content == ""
+
+
+def test_blank_agent_reads_as_missing_like_the_store_dicts():
+    record = ChatRecord.from_message(new_message("user", "hi"))
+    assert record.get("agent") is None
+    assert "agent" not in record
+    with pytest.raises(KeyError):
+        record["agent"]
+    assert record.get("metrics") is None
+
+
+def test_mood_note_may_be_empty():
+    record = MoodRecord(1000.0, "Okay")
+    assert record["note"] == ""
+    assert record["mood"] == "Okay"
+    assert record["date"]
@@ -0,0 +1,49 @@
+import pytest
+
+from heartmend.resilience import CallGuard, CircuitBreaker, CircuitOpen
+from heartmend.streaming import ModelRunError
+
+
+def fail(status_code):
+    def call():
+        raise ModelRunError("upstream said no", status_code=status_code)
+    return call
+
+
+def guard(breaker):
+    return CallGuard(None, breaker, max_retries=0)
+
+
+def test_caller_errors_keep_failures_counting_towards_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    calls = guard(breaker)
+    with pytest.raises(ModelRunError):
+        calls.call(fail(503))
+    with pytest.raises(ModelRunError):
+        calls.call(fail(400))
+    with pytest.raises(ModelRunError):
+        calls.call(fail(503))
+    assert breaker.state == "open"
+
+
+def test_caller_error_during_a_probe_leaves_the_breaker_half_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    calls = guard(breaker)
+    with pytest.raises(ModelRunError):
+        calls.call(fail(503))
+    assert breaker.state == "open"
+
+    with pytest.raises(ModelRunError):
+        calls.call(fail(401))
+    assert breaker.state == "half_open"
+    # The probe slot was freed, so the next call still gets through
+    assert calls.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_rejects_calls():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    with pytest.raises(ModelRunError):
+        guard(breaker).call(fail(503))
+    with pytest.raises(CircuitOpen):
+        guard(breaker).call(lambda: "ok")
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from heartmend import core, routing
+from heartmend.resilience import CallGuard, CircuitBreaker, UpstreamUnavailable, is_model_unavailable
+from heartmend.routing import ModelProfile, ModelRouter
+from heartmend.streaming import ModelRunError, run_error
+
+NOT_FOUND = json.dumps({
+    "error": {"message": "The model `old` does not exist", "type": "invalid_request_error", "code": "model_not_found"}
+})
+DECOMMISSIONED = json.dumps({
+    "error": {"message": "The model `old` has been decommissioned", "type": "invalid_request_error", "code": "model_decommissioned"}
+})
+BAD_REQUEST = json.dumps({"error": {"message": "messages: too long", "type": "invalid_request_error"}})
+
+
+def make_router():
+    profiles = [ModelProfile("old", fast=True), ModelProfile("current", fast=True), ModelProfile("big")]
+    guards = {}
+
+    def guard_for(model_id):
+        return guards.setdefault(model_id, CallGuard(None, CircuitBreaker(), max_retries=0))
+
+    return ModelRouter(profiles, default_model="big"), guard_for
+
+
+@pytest.mark.parametrize("body", [NOT_FOUND, DECOMMISSIONED])
+def test_unavailable_model_fails_over_and_leaves_the_pool(body):
+    router, guard_for = make_router()
+    calls = []
+
+    def fn(model_id, guard):
+        calls.append(model_id)
+        if model_id == "old":
+            raise run_error(body)
+        return "ok"
+
+    # Put the stale model first
+    router.record("current", 1.0, ok=True)
+    assert router.call("fast", guard_for, fn) == ("current", "ok")
+    assert calls == ["old", "current"]
+    assert "old" not in router.candidates("fast", guard_for)
+    assert router.call("fast", guard_for, fn) == ("current", "ok")
+    assert calls == ["old", "current", "current"]
+
+
+def test_bad_request_is_not_failed_over():
+    router, guard_for = make_router()
+
+    def fn(model_id, guard):
+        raise run_error(BAD_REQUEST)
+
+    with pytest.raises(RuntimeError):
+        router.call("default", guard_for, fn)
+    assert len(router.candidates("default", guard_for)) == 3
+
+
+def test_pick_with_every_model_removed():
+    router, guard_for = make_router()
+    for model_id in ("old", "current", "big"):
+        router.remove(model_id)
+    with pytest.raises(UpstreamUnavailable):
+        router.pick("fast", guard_for)
+
+
+def test_default_model_is_pinned():
+    assert core.GROQ_MODELS["Llama 3.3 70B"] == "llama-3.3-70b-versatile"
+    assert core.VISION_MODEL in {profile.model_id for profile in core.MODEL_PROFILES if profile.vision}
+    assert core.router.default_model == "llama-3.3-70b-versatile"
+
+
+def test_bare_404_does_not_remove_the_model():
+    router, guard_for = make_router()
+    error = ModelRunError("Not Found", status_code=404)
+    assert not is_model_unavailable(error)
+
+    def fn(model_id, guard):
+        if model_id == "old":
+            raise error
+        return "ok"
+
+    router.record("current", 1.0, ok=True)
+    with pytest.raises(ModelRunError):
+        router.call("fast", guard_for, fn)
+    assert "old" in router.candidates("fast", guard_for)
+
+
+def test_removed_model_comes_back_after_the_cooldown(monkeypatch):
+    router, guard_for = make_router()
+    now = [1000.0]
+    monkeypatch.setattr(routing.time, "monotonic", lambda: now[0])
+    router.remove("old")
+    assert "old" not in router.candidates("fast", guard_for)
+    now[0] += router.removal_seconds
+    assert "old" in router.candidates("fast", guard_for)
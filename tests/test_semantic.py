@@ -0,0 +1,58 @@
+from agno.run.agent import RunOutput
+from agno.run.base import RunStatus
+
+from heartmend.chat import run_turn
+from heartmend.memory import ConversationMemory
+from heartmend.semantic import SemanticCache
+
+
+class EchoAgent:
+    instructions = ["Be kind"]
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, message, stream=False, yield_run_output=False, **kwargs):
+        self.calls += 1
+        return RunOutput(status=RunStatus.completed, content=f"reply {self.calls}")
+
+
+def turn(agent, cache, user_id, message):
+    return run_turn(agent, "Therapist", "m", message, ConversationMemory(), semantic_cache=cache, user_id=user_id)
+
+
+def test_similar_answers_are_never_shared_between_users():
+    cache = SemanticCache(threshold=0.8)
+    agent = EchoAgent()
+    assert turn(agent, cache, "alice", "I keep thinking about my ex every night")[0] == "reply 1"
+
+    reply, metrics = turn(agent, cache, "bob", "I keep thinking about my ex every night")
+    assert reply == "reply 2"
+    assert not metrics["cached"]
+
+    reply, metrics = turn(agent, cache, "alice", "I keep thinking about my ex every night")
+    assert reply == "reply 1"
+    assert metrics["cached"]
+
+
+def test_no_user_means_no_semantic_cache():
+    cache = SemanticCache(threshold=0.8)
+    agent = EchoAgent()
+    turn(agent, cache, None, "hello there")
+    turn(agent, cache, None, "hello there")
+    assert agent.calls == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_drop_and_eviction():
+    cache = SemanticCache(threshold=0.8, max_entries=3, scope_entries=2)
+    for i in range(3):
+        cache.add("alice", "Therapist", f"message number {i}", f"reply {i}")
+    assert cache.stats()["entries"] == 2
+    cache.add("bob", "Therapist", "bob's message", "bob's reply")
+    cache.add("carol", "Therapist", "carol's message", "carol's reply")
+    # alice was least recently used
+    assert cache.get("alice", "Therapist", "message number 2") is None
+    cache.drop("bob")
+    assert cache.get("bob", "Therapist", "bob's message") is None
+    assert cache.get("carol", "Therapist", "carol's message")[1] == "carol's reply"
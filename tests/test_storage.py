@@ -0,0 +1,88 @@
+import sqlite3
+import time
+
+import pytest
+
+from heartmend.storage import HistoryStore
+
+
+class LockedConnection:
+    """Stands in for a connection whose commits fail, e.g. on a locked database"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def executemany(self, sql, params):
+        raise sqlite3.OperationalError("database is locked")
+
+
+@pytest.fixture
+def store(tmp_path):
+    # A long interval keeps the background writer out of the way
+    store = HistoryStore(str(tmp_path / "history.sqlite3"), flush_interval=60)
+    yield store
+    store.close()
+
+
+def add(store, text, ts):
+    store.add_message("alice", {"id": text, "ts": ts, "role": "user", "content": text})
+
+
+def test_failed_flush_keeps_the_batch_in_order(store, monkeypatch):
+    connect = store._connect
+    add(store, "first", 1.0)
+    add(store, "second", 2.0)
+    monkeypatch.setattr(store, "_connect", lambda: LockedConnection())
+    assert store.flush() is False
+
+    add(store, "third", 3.0)
+    monkeypatch.setattr(store, "_connect", connect)
+    assert [m["content"] for m in store.iter_messages("alice")] == ["first", "second", "third"]
+
+
+def test_writer_retries_a_failed_batch(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"), flush_interval=0.01)
+    connect = store._connect
+    failures = []
+
+    def flaky_connect():
+        if len(failures) < 3:
+            failures.append(1)
+            return LockedConnection()
+        return connect()
+
+    monkeypatch.setattr(store, "_connect", flaky_connect)
+    add(store, "hello", 1.0)
+    deadline = time.monotonic() + 5
+    while store._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(failures) == 3 and not store._pending
+    monkeypatch.setattr(store, "_connect", connect)
+    assert store.count_messages("alice") == 1
+    store.close()
+
+
+def test_bad_write_is_dropped_without_blocking_the_store(store):
+    add(store, "first", 1.0)
+    store.add_message("alice", {"id": "bad", "ts": 2.0, "role": "user", "content": None})
+    add(store, "third", 3.0)
+    store.add_mood("alice", 4.0, "Okay")
+
+    assert store.flush() is True
+    assert store.dropped_writes == 1
+    assert [m["content"] for m in store.iter_messages("alice")] == ["first", "third"]
+    assert [m["mood"] for m in store.recent_moods("alice", 5)] == ["Okay"]
+
+    # Later writes and closing aren't stuck behind it
+    add(store, "fourth", 5.0)
+    assert store.count_messages("alice") == 3
+    store.close()
+
+
+def test_link_ids_are_claimed_once(store):
+    assert store.claim_link("abc") is True
+    assert store.claim_link("abc") is False
+    assert store.claim_link("def") is True
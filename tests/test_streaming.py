@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from agno.run.agent import (
+    IntermediateRunContentEvent, RunCompletedEvent, RunContentEvent, RunErrorEvent, RunOutput,
+)
+from agno.run.base import RunStatus
+
+from heartmend.chat import run_turn
+from heartmend.memory import ConversationMemory
+from heartmend.resilience import CallGuard, CircuitBreaker, is_retryable
+from heartmend.streaming import ModelRunError, run_agent_reply, run_error, stream_agent_reply
+
+RATE_LIMITED = json.dumps({"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}})
+NOT_FOUND = json.dumps({
+    "error": {"message": "The model `x` does not exist", "type": "invalid_request_error", "code": "model_not_found"}
+})
+
+
+class StubAgent:
+    """Returns agno's own result types, the way a failing Groq call does"""
+
+    instructions = ["Be kind"]
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.calls = 0
+
+    def run(self, message, stream=False, yield_run_output=False, **kwargs):
+        self.calls += 1
+        output = self.outputs.pop(0)
+        return iter(output) if stream else output
+
+
+def failed_run(content):
+    return RunOutput(status=RunStatus.error, content=content)
+
+
+def test_blocking_error_output_raises_with_status():
+    with pytest.raises(ModelRunError) as info:
+        run_agent_reply(StubAgent([failed_run(RATE_LIMITED)]), "hello")
+    assert info.value.status_code == 429
+    assert str(info.value) == "Rate limit reached"
+    assert is_retryable(info.value)
+
+
+def test_stream_error_event_raises_instead_of_becoming_a_delta():
+    deltas = []
+    events = [RunErrorEvent(content="Connection error.", error_type="model_provider_error")]
+    with pytest.raises(ModelRunError) as info:
+        stream_agent_reply(StubAgent([events]), "hello", deltas.append)
+    assert info.value.status_code == 502
+    assert deltas == []
+
+
+def test_status_recovered_from_error_body():
+    assert run_error(NOT_FOUND).status_code == 404
+    assert not is_retryable(run_error(NOT_FOUND))
+    assert run_error("Connection error.", "model_provider_error").status_code == 502
+    assert run_error("bad key", "model_authentication_error").status_code == 401
+
+
+def test_guard_retries_and_trips_breaker_on_failed_runs():
+    agent = StubAgent([failed_run("Connection error.")] * 3 + [RunOutput(status=RunStatus.completed, content="ok")])
+    breaker = CircuitBreaker(failure_threshold=10)
+    guard = CallGuard(None, breaker, max_retries=3, base_delay=0.0)
+    reply, _ = run_turn(agent, "Therapist", "m", "hello", ConversationMemory(), guard=guard)
+    assert reply == "ok"
+    assert agent.calls == 4
+
+    agent = StubAgent([failed_run("Connection error.")] * 2)
+    guard = CallGuard(None, CircuitBreaker(failure_threshold=2), max_retries=1, base_delay=0.0)
+    with pytest.raises(ModelRunError):
+        run_turn(agent, "Therapist", "m", "hello", ConversationMemory(), guard=guard)
+    assert guard.breaker.is_open
+
+
+def test_successful_stream_still_streams():
+    events = [RunContentEvent(content="Hi"), RunContentEvent(content=" there")]
+    text, stats = stream_agent_reply(StubAgent([events]), "hello", lambda _text: None)
+    assert text == "Hi there"
+    assert stats.ttft is not None
+
+
+def test_intermediate_content_is_not_streamed():
+    events = [
+        IntermediateRunContentEvent(content="draft"),
+        RunContentEvent(content="Hi"),
+        IntermediateRunContentEvent(content="another draft"),
+        RunContentEvent(content=" there"),
+        RunCompletedEvent(content="Hi there"),
+    ]
+    deltas = []
+    text, _ = stream_agent_reply(StubAgent([events]), "hello", deltas.append)
+    assert text == "Hi there"
+    assert all("draft" not in delta for delta in deltas)
@@ -0,0 +1,12 @@
+from heartmend.tracing import Tracer
+
+
+def test_missing_durations_are_not_recorded():
+    tracer = Tracer()
+    tracer.record("first_token", None, "Therapist")
+    assert tracer.snapshot() == []
+
+    tracer.record("first_token", 0.25, "Therapist")
+    tracer.record("first_token", None, "Therapist")
+    [row] = tracer.snapshot()
+    assert row["count"] == 1 and row["p50_ms"] == 250.0